@@ -0,0 +1,78 @@
+"""
+Compares the regret and per-pull latency of the bandit algorithms.
+
+Each algorithm plays simulated Bernoulli arms with its counts held in memory,
+so the timings cover the decision itself rather than the database. Run from
+the repository root:
+
+    python -m benchmarks.bench_bandits --pulls 10000 --runs 5
+"""
+import argparse
+import os
+import time
+
+import django
+import numpy as np
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+django.setup()
+
+from django_bandits.models import (  # noqa: E402
+    EpsilonDecayModel,
+    EpsilonGreedyModel,
+    ThompsonSamplingModel,
+    UCB1Model,
+)
+from django_bandits.rng import uniforms  # noqa: E402
+
+ALGORITHMS = {
+    "Epsilon Greedy": lambda: EpsilonGreedyModel(epsilon=0.1),
+    "Epsilon Decay": EpsilonDecayModel,
+    "UCB1": lambda: UCB1Model(c=2.0),
+    "Thompson Sampling": ThompsonSamplingModel,
+}
+
+
+def simulate(model, rates, n_pulls, rng) -> tuple:
+    """Returns the cumulative regret and the latency of every pull in seconds"""
+    views = np.zeros(len(rates), dtype=np.int64)
+    convs = np.zeros(len(rates), dtype=np.int64)
+    best_rate = max(rates)
+    regret = 0.0
+    latencies = np.empty(n_pulls)
+    for i in range(n_pulls):
+        model._arm_stats = (views, convs)
+        start = time.perf_counter()
+        arm = int(model.pull())
+        latencies[i] = time.perf_counter() - start
+        views[arm] += 1
+        convs[arm] += rng.random() < rates[arm]
+        regret += best_rate - rates[arm]
+    return regret, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pulls", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rates", type=float, nargs=2, default=[0.05, 0.07])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    uniforms.seed(args.seed)
+    print(f"{args.runs} runs of {args.pulls} pulls, conversion rates {args.rates}")
+    print(f"{'algorithm':<20}{'regret':>10}{'p50 us':>10}{'p99 us':>10}")
+    for name, make_model in ALGORITHMS.items():
+        regrets, latencies = [], []
+        for _ in range(args.runs):
+            regret, run_latencies = simulate(make_model(), args.rates, args.pulls, rng)
+            regrets.append(regret)
+            latencies.append(run_latencies)
+        latencies = np.concatenate(latencies) * 1e6
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{name:<20}{np.mean(regrets):>10.1f}{p50:>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compares the throughput of concurrent view increments on a single FlagUrl row
+with increments spread over FlagCounterShard rows.
+
+Each thread records views of the same flag through its own database
+connection. SQLite locks the whole database for every write, so shards only
+pay off on databases with row-level locks. Set BENCH_DATABASE_URL to run
+against PostgreSQL. Run from the repository root:
+
+    python -m benchmarks.bench_counters --threads 16 --increments 200
+"""
+import argparse
+import os
+import threading
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from django_bandits.models import BanditFlag, FlagUrl  # noqa: E402
+
+BACKENDS = {
+    "single row": "django_bandits.counters.DatabaseCounterBackend",
+    "sharded": "django_bandits.counters.ShardedCounterBackend",
+}
+
+
+def run(flag_url, n_threads, n_increments) -> float:
+    """Returns the increments per second of n_threads concurrent threads"""
+    barrier = threading.Barrier(n_threads + 1)
+
+    def worker():
+        barrier.wait()
+        try:
+            for _ in range(n_increments):
+                flag_url.record_view(True)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return n_threads * n_increments / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--increments", type=int, default=200)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        print(
+            f"{connection.vendor}: {args.threads} threads x {args.increments} "
+            f"increments, {args.shards} shards"
+        )
+        print(f"{'counters':<12}{'incr/s':>10}")
+        for name, backend in BACKENDS.items():
+            with override_settings(
+                BANDITS_COUNTER_BACKEND=backend, BANDITS_COUNTER_SHARDS=args.shards
+            ):
+                flag = BanditFlag.objects.create(name=f"bench_{name}")
+                flag_url = FlagUrl.objects.create(flag=flag)
+                rate = run(flag_url, args.threads, args.increments)
+                views = BanditFlag.objects.get(pk=flag.pk).get_arm_counts()[0][1]
+                assert views == args.threads * args.increments, views
+            print(f"{name:<12}{rate:>10.0f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares the per-path cost of the compiled exclusion matcher with the
+startswith() loop and uncompiled re.search() it replaced.
+
+Paths are drawn from a pool of --paths distinct URLs, so the LRU cache of the
+matcher sees repeats as a site would. "compiled" disables the cache to show
+the matching alone. Run from the repository root:
+
+    python -m benchmarks.bench_exclusions --patterns 10 1000 5000
+"""
+import argparse
+import os
+import re
+import time
+
+import django
+import numpy as np
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+django.setup()
+
+from django_bandits.exclusions import ExclusionMatcher  # noqa: E402
+
+REGEX = r"\.php|wordpress|\/wp-"
+
+
+def loop_is_excluded(prefixes, regex, path) -> bool:
+    """The exclusion check before the compiled matcher"""
+    if any(path.startswith(prefix) for prefix in prefixes):
+        return True
+    if regex and re.search(regex, path):
+        return True
+    return False
+
+
+def make_prefixes(n_patterns, rng) -> list:
+    words = ["admin", "api", "static", "media", "internal", "health", "debug"]
+    return [
+        f"/{rng.choice(words)}{i}/{rng.integers(10**6)}/" for i in range(n_patterns)
+    ]
+
+
+def time_paths(is_excluded, paths) -> float:
+    """Returns the mean time per path in microseconds"""
+    start = time.perf_counter()
+    for path in paths:
+        is_excluded(path)
+    return (time.perf_counter() - start) / len(paths) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patterns", type=int, nargs="+", default=[10, 1000, 5000])
+    parser.add_argument("--paths", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    pool = [f"/blog/{i}/post-{rng.integers(10**6)}/" for i in range(args.paths)]
+    paths = [pool[i] for i in rng.integers(len(pool), size=args.lookups)]
+
+    print(f"{args.lookups} lookups of {args.paths} distinct paths")
+    print(f"{'patterns':>10}{'loop us':>10}{'compiled us':>13}{'cached us':>11}")
+    for n_patterns in args.patterns:
+        prefixes = make_prefixes(n_patterns, rng)
+        loop = time_paths(lambda path: loop_is_excluded(prefixes, REGEX, path), paths)
+        uncached = ExclusionMatcher(prefixes, REGEX, cache_size=0)
+        compiled = time_paths(uncached.is_excluded, paths)
+        cached = time_paths(ExclusionMatcher(prefixes, REGEX).is_excluded, paths)
+        print(f"{n_patterns:>10}{loop:>10.2f}{compiled:>13.2f}{cached:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Measures the per-call latency, queries and allocations of the request hot
+paths as the number of flags and activity rows grows.
+
+Cases cover UserActivityMiddleware on a flag's source page (a new visitor
+pulling the bandit), on its target page (a conversion) and on a page without
+flags, waffle.flag_is_active() on a BanditFlag, and looking up the active
+bandit of a flag and pulling it for each algorithm. Every case runs with warm
+caches and with cold ones, where the process-local caches and Django's cache
+are cleared before each call.
+
+Latencies are wall times of the call alone, with the requests, sessions and
+prior source visits prepared beforehand. Allocations are the peak traced by
+tracemalloc during a separate run of --alloc-calls calls. Results can be saved
+as JSON and compared with a saved baseline, exiting with status 1 if a median
+latency grew by more than --tolerance or a case runs more queries. Set
+BENCH_DATABASE_URL to run against PostgreSQL. Run from the repository root:
+
+    python -m benchmarks.bench_hot_paths --flags 1 50 500 --rows 10000
+    python -m benchmarks.bench_hot_paths --rows 10000 10000000 --save base.json
+    python -m benchmarks.bench_hot_paths --baseline base.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import django
+import numpy as np
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+django.setup()
+
+import waffle  # noqa: E402
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.contrib.sessions.backends.db import SessionStore  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from django_bandits.cache import clear_caches  # noqa: E402
+from django_bandits.middleware import UserActivityMiddleware  # noqa: E402
+from django_bandits.models import (  # noqa: E402
+    BanditFlag,
+    EpsilonDecayModel,
+    EpsilonGreedyModel,
+    FlagUrl,
+    ThompsonSamplingModel,
+    UCB1Model,
+    UserActivity,
+)
+
+ALGORITHMS = {
+    "Epsilon Greedy": EpsilonGreedyModel,
+    "Epsilon Decay": EpsilonDecayModel,
+    "UCB1": UCB1Model,
+    "Thompson Sampling": ThompsonSamplingModel,
+}
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101 Firefox/120.0"
+
+factory = RequestFactory()
+
+
+def make_request(path, session=None):
+    if session is None:
+        session = SessionStore()
+        session.create()
+    request = factory.get(path, HTTP_USER_AGENT=USER_AGENT)
+    request.session = session
+    request.user = AnonymousUser()
+    return request
+
+
+def reset_caches():
+    clear_caches()
+    # Waffle keeps flags in Django's cache
+    cache.clear()
+
+
+def fill_activity(n_rows, batch_size=10000):
+    """Tops the UserActivity table up to n_rows rows of other sessions"""
+    for start in range(UserActivity.objects.count(), n_rows, batch_size):
+        UserActivity.objects.bulk_create(
+            UserActivity(session_key=f"history_{i % 100000}", url=f"/history/{i}/")
+            for i in range(start, min(start + batch_size, n_rows))
+        )
+
+
+def create_flags(n_flags):
+    """Replaces the routed flags with n_flags flags with an active bandit"""
+    BanditFlag.objects.filter(name__startswith="flag_").delete()
+    for i in range(n_flags):
+        flag = BanditFlag.objects.create(name=f"flag_{i}")
+        FlagUrl.objects.create(
+            flag=flag, source_url=f"/flag_{i}/", target_url=f"/flag_{i}/target/"
+        )
+        EpsilonGreedyModel.objects.create(flag=flag, is_active=True)
+
+
+def create_pull_flags() -> dict:
+    flags = {}
+    for i, (name, bandit_model) in enumerate(ALGORITHMS.items()):
+        flag = BanditFlag.objects.create(name=f"pull_{i}")
+        FlagUrl.objects.create(flag=flag, source_url=f"/pull_{i}/")
+        bandit_model.objects.create(flag=flag, is_active=True)
+        flags[name] = flag
+    return flags
+
+
+def get_cases(pull_flags) -> dict:
+    """Maps case names to (setup, call), where call(*setup()) is timed"""
+    middleware = UserActivityMiddleware(lambda request: HttpResponse())
+
+    def source_page():
+        return (make_request("/flag_0/"),)
+
+    def target_page():
+        request = make_request("/flag_0/")
+        middleware(request)
+        return (make_request("/flag_0/target/", request.session),)
+
+    def other_page():
+        return (make_request("/page/"),)
+
+    cases = {
+        "middleware, source page": (source_page, middleware),
+        "middleware, target page": (target_page, middleware),
+        "middleware, other page": (other_page, middleware),
+        "flag_is_active": (
+            other_page,
+            lambda request: waffle.flag_is_active(request, "flag_0"),
+        ),
+    }
+    for name, flag in pull_flags.items():
+        cases[f"{name} pull"] = (
+            tuple,
+            lambda flag=flag: flag.get_active_bandit().pull(),
+        )
+    return cases
+
+
+def measure(setup, call, n_calls, n_alloc_calls, cold) -> dict:
+    if not cold:
+        call(*setup())
+    latencies = np.empty(n_calls)
+    n_queries = 0
+    for i in range(n_calls):
+        args = setup()
+        if cold:
+            reset_caches()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            call(*args)
+            latencies[i] = time.perf_counter() - start
+        n_queries += len(queries)
+
+    peaks = np.empty(n_alloc_calls)
+    tracemalloc.start()
+    for i in range(n_alloc_calls):
+        args = setup()
+        if cold:
+            reset_caches()
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        else:
+            # reset_peak() is new in Python 3.9, and restarting also resets it
+            tracemalloc.stop()
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        call(*args)
+        peaks[i] = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(latencies * 1e6, [50, 95, 99])
+    return {
+        "p50_us": p50,
+        "p95_us": p95,
+        "p99_us": p99,
+        "queries": n_queries / n_calls,
+        "alloc_kib": peaks.mean() / 1024 if n_alloc_calls else float("nan"),
+    }
+
+
+def compare(results, baseline, tolerance) -> list:
+    """Returns descriptions of the cases that got slower or run more queries"""
+    previous = {(r["case"], r["flags"], r["rows"], r["cache"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        key = (result["case"], result["flags"], result["rows"], result["cache"])
+        old = previous.get(key)
+        if old is None:
+            continue
+        label = f"{key[0]} ({key[1]} flags, {key[2]} rows, {key[3]})"
+        if result["p50_us"] > old["p50_us"] * (1 + tolerance):
+            regressions.append(
+                f"{label}: p50 {old['p50_us']:.0f} -> {result['p50_us']:.0f} us"
+            )
+        # Periodic significance tests make the mean count fractional
+        if round(result["queries"]) > round(old["queries"]):
+            regressions.append(
+                f"{label}: {old['queries']:.2f} -> {result['queries']:.2f} queries"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flags", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--alloc-calls", type=int, default=20)
+    parser.add_argument("--save", metavar="PATH", help="Write the results as JSON.")
+    parser.add_argument(
+        "--baseline", metavar="PATH", help="Compare with saved results."
+    )
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = []
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        pull_flags = create_pull_flags()
+        cases = get_cases(pull_flags)
+        print(f"{args.calls} calls per case, {args.alloc_calls} traced")
+        print(
+            f"{'case':<28}{'flags':>6}{'rows':>10}{'cache':>6}"
+            f"{'p50 us':>9}{'p95 us':>9}{'p99 us':>9}{'queries':>9}{'KiB':>8}"
+        )
+        for n_rows in sorted(args.rows):
+            fill_activity(n_rows)
+            for n_flags in args.flags:
+                create_flags(n_flags)
+                for name, (setup, call) in cases.items():
+                    for cache_state in ["warm", "cold"]:
+                        result = measure(
+                            setup,
+                            call,
+                            args.calls,
+                            args.alloc_calls,
+                            cold=cache_state == "cold",
+                        )
+                        print(
+                            f"{name:<28}{n_flags:>6}{n_rows:>10}{cache_state:>6}"
+                            f"{result['p50_us']:>9.0f}{result['p95_us']:>9.0f}"
+                            f"{result['p99_us']:>9.0f}{result['queries']:>9.2f}"
+                            f"{result['alloc_kib']:>8.1f}"
+                        )
+                        results.append(
+                            {
+                                "case": name,
+                                "flags": n_flags,
+                                "rows": n_rows,
+                                "cache": cache_state,
+                                **result,
+                            }
+                        )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Compares the per-request latency of UserActivityMiddleware under WSGI and
+ASGI test clients.
+
+Requests either view the source page of a flag with an Epsilon Greedy bandit,
+recording a view and the activity rows, or a page without flags. "ASGI" runs
+the middleware async, as with BANDITS_ASYNC_MIDDLEWARE = True. "ASGI, sync
+middleware" lets Django adapt it, together with the session and auth
+middleware, in a single thread hop. Run from the repository root:
+
+    python -m benchmarks.bench_middleware --requests 500
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import django
+import numpy as np
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.sessions.backends.db import SessionStore  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import AsyncClient, Client  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from django.urls import path  # noqa: E402
+
+from django_bandits.middleware import UserActivityMiddleware  # noqa: E402
+from django_bandits.models import (  # noqa: E402
+    BanditFlag,
+    EpsilonGreedyModel,
+    FlagUrl,
+)
+
+
+def view(request):
+    return HttpResponse()
+
+
+async def async_view(request):
+    return HttpResponse()
+
+
+urlpatterns = [
+    path("source/", view),
+    path("page/", view),
+    path("async/source/", async_view),
+    path("async/page/", async_view),
+]
+
+MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django_bandits.middleware.UserActivityMiddleware",
+]
+
+
+def make_client(client_class):
+    session = SessionStore()
+    session.create()
+    client = client_class()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    return client
+
+
+def time_sync(url, n_requests) -> np.ndarray:
+    latencies = np.empty(n_requests)
+    for i in range(n_requests):
+        client = make_client(Client)
+        start = time.perf_counter()
+        client.get(url)
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def time_async(url, n_requests) -> np.ndarray:
+    latencies = np.empty(n_requests)
+    clients = [make_client(AsyncClient) for _ in range(n_requests)]
+
+    async def run():
+        for i, client in enumerate(clients):
+            start = time.perf_counter()
+            await client.get(url)
+            latencies[i] = time.perf_counter() - start
+
+    asyncio.run(run())
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(ROOT_URLCONF=__name__, MIDDLEWARE=MIDDLEWARE):
+            for name, url in [("sync", "/source/"), ("async", "/async/source/")]:
+                flag = BanditFlag.objects.create(name=f"bench_{name}")
+                FlagUrl.objects.create(flag=flag, source_url=url)
+                EpsilonGreedyModel.objects.create(flag=flag, is_active=True)
+
+            print(f"{args.requests} requests per page")
+            print(f"{'page':<8}{'client':<24}{'p50 us':>10}{'p99 us':>10}")
+            for page in ["source", "page"]:
+                runs = [
+                    ("WSGI", time_sync, f"/{page}/"),
+                    ("ASGI, sync middleware", time_async, f"/async/{page}/"),
+                    ("ASGI", time_async, f"/async/{page}/"),
+                ]
+                latencies = {name: [] for name, _, _ in runs}
+                # Interleave the clients so the growing tables slow all alike
+                for _ in range(args.rounds):
+                    for name, run, url in runs:
+                        UserActivityMiddleware.async_capable = name == "ASGI"
+                        latencies[name].append(
+                            run(url, args.requests // args.rounds) * 1e6
+                        )
+                for name, _, _ in runs:
+                    p50, p99 = np.percentile(np.concatenate(latencies[name]), [50, 99])
+                    print(f"{page:<8}{name:<24}{p50:>10.0f}{p99:>10.0f}")
+            UserActivityMiddleware.async_capable = False
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
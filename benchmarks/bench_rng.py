@@ -0,0 +1,53 @@
+"""
+Compares the pooled per-flag uniforms with per-call draws from NumPy's RNGs.
+
+Times one uniform variate from NumPy's legacy global state, from a Generator
+called once per variate, and from django_bandits.rng's pre-drawn blocks, as
+well as a whole epsilon greedy pull. Run from the repository root:
+
+    python -m benchmarks.bench_rng --calls 200000 --runs 5
+"""
+import argparse
+import os
+import timeit
+
+import django
+import numpy as np
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+django.setup()
+
+from django_bandits.models import EpsilonGreedyModel  # noqa: E402
+from django_bandits.rng import UniformPool  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--flags", type=int, default=50)
+    args = parser.parse_args()
+
+    generator = np.random.default_rng(0)
+    pool = UniformPool(seed=0)
+    flag_ids = iter(np.arange(args.calls * args.runs * 2) % args.flags)
+    bandit = EpsilonGreedyModel(flag_id=1, epsilon=0.1)
+    bandit._arm_stats = (np.array([1000, 1000]), np.array([50, 70]))
+    cases = {
+        "np.random.random()": np.random.random,
+        "np.random.randint()": lambda: np.random.randint(0, 2),
+        "Generator.random()": generator.random,
+        "pool, one flag": lambda: pool.random(1),
+        f"pool, {args.flags} flags": lambda: pool.random(next(flag_ids)),
+        "EG pull_arm()": bandit.pull_arm,
+    }
+
+    print(f"Best of {args.runs} runs of {args.calls} calls")
+    print(f"{'case':<24}{'ns/call':>10}")
+    for name, call in cases.items():
+        best = min(timeit.repeat(call, number=args.calls, repeat=args.runs))
+        print(f"{name:<24}{best / args.calls * 1e9:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,13 @@ from django.contrib import admin
 from .models import (
     UserActivity,
     FlagUrl,
+    FlagArm,
     UserActivityFlag,
     BanditFlag,
     EpsilonGreedyModel,
     EpsilonDecayModel,
     UCB1Model,
+    ThompsonSamplingModel,
 )
 from .forms import BanditAdminForm  # Deprecated? Delete?
 
@@ -16,6 +18,12 @@ class FlagUrlInline(admin.StackedInline):
     extra = 0
 
 
+class FlagArmInline(admin.TabularInline):
+    model = FlagArm
+    extra = 0
+    fields = ["index", "name", "views", "conversions"]
+
+
 class BaseBanditInline(admin.TabularInline):
     extra = 0
     fk_name = "flag"
@@ -23,6 +31,7 @@ class BaseBanditInline(admin.TabularInline):
     fields = [
         "is_active",
         "significance_level",
+        "significance_test",
         "min_views",
         "winning_arm",
         "display_conversion_rate",
@@ -71,13 +80,21 @@ class UCB1ModelInline(BaseBanditInline):
     new_field_positions = [1]
 
 
+class ThompsonSamplingModelInline(BaseBanditInline):
+    model = ThompsonSamplingModel
+    new_fields = ["alpha_prior", "beta_prior"]
+    new_field_positions = [1, 2]
+
+
 # Define the admin interface for Flag
 class FlagAdmin(admin.ModelAdmin):
     inlines = [
         FlagUrlInline,
+        FlagArmInline,
         EpsilonGreedyModelInline,
         EpsilonDecayModelInline,
         UCB1ModelInline,
+        ThompsonSamplingModelInline,
     ]
 
 
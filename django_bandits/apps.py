@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DjangoBanditsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "django_bandits"
+
+    def ready(self):
+        from . import signals  # noqa: F401
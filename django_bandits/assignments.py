@@ -0,0 +1,79 @@
+"""
+Sticky arm assignments.
+
+The arm a bandit picks for a flag is stored in the visitor's session, so
+repeat views of the source URL show the same variant without pulling the bandit
+again. Each assignment counts one view, on the first tracked response of the
+source URL after it was made, however often it was decided before. Assignments
+expire after
+``BANDITS_STICKY_ASSIGNMENT_TTL`` seconds; set it to 0 or None to pull on
+every view. With Django's signed cookie session backend the assignments live
+in the cookie itself.
+"""
+import time
+
+from django.conf import settings
+from django.http import HttpRequest
+
+SESSION_KEY = "django_bandits_arms"
+
+
+def get_ttl() -> float:
+    return getattr(settings, "BANDITS_STICKY_ASSIGNMENT_TTL", 24 * 60 * 60)
+
+
+def _get_session(request: HttpRequest):
+    if not get_ttl():
+        return None
+    return getattr(request, "session", None)
+
+
+def _get_assignment(request: HttpRequest, flag) -> list:
+    session = _get_session(request)
+    if session is None:
+        return None
+    assignment = session.get(SESSION_KEY, {}).get(str(flag.pk))
+    if assignment is None or assignment[1] < time.time():
+        return None
+    return assignment
+
+
+def get_assigned_arm(request: HttpRequest, flag) -> int:
+    """Returns the unexpired arm assigned to the visitor for a flag, or None"""
+    assignment = _get_assignment(request, flag)
+    return None if assignment is None else assignment[0]
+
+
+def is_view_counted(request: HttpRequest, flag) -> bool:
+    """Returns whether the view of the visitor's assigned arm was counted"""
+    assignment = _get_assignment(request, flag)
+    if assignment is None:
+        return False
+    # Assignments stored without the marker were counted when they were made
+    return len(assignment) < 3 or assignment[2]
+
+
+def mark_view_counted(request: HttpRequest, flag) -> None:
+    """Records that the view of the visitor's assigned arm was counted"""
+    assignment = _get_assignment(request, flag)
+    if assignment is None:
+        return
+    session = request.session
+    assignments = dict(session[SESSION_KEY])
+    assignments[str(flag.pk)] = [assignment[0], assignment[1], True]
+    session[SESSION_KEY] = assignments
+
+
+def assign_arm(request: HttpRequest, flag, arm: int) -> None:
+    """Stores the arm shown to the visitor for a flag"""
+    session = _get_session(request)
+    if session is None:
+        return
+    now = time.time()
+    assignments = {
+        flag_id: assignment
+        for flag_id, assignment in session.get(SESSION_KEY, {}).items()
+        if assignment[1] >= now
+    }
+    assignments[str(flag.pk)] = [int(arm), now + get_ttl(), False]
+    session[SESSION_KEY] = assignments
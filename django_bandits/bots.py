@@ -0,0 +1,160 @@
+"""
+Filter for requests that shouldn't count towards bandit statistics.
+
+Checked before the middleware touches the session or the database, it skips:
+
+* ``BANDITS_UNTRACKED_METHODS`` requests (default HEAD and OPTIONS),
+* static assets, by ``STATIC_URL``/``MEDIA_URL`` prefix or one of the
+  ``BANDITS_STATIC_EXTENSIONS``,
+* user agents matching any of the ``BANDITS_BOT_USER_AGENTS`` patterns, which
+  are compiled into one case-insensitive regex, and requests without a user
+  agent if ``BANDITS_FILTER_EMPTY_USER_AGENT`` is set.
+
+Set ``BANDITS_FILTER_BOTS = False`` to track everything.
+"""
+import functools
+import re
+
+from django.conf import settings
+from django.http import HttpRequest
+
+BOT_SETTINGS = frozenset(
+    [
+        "BANDITS_FILTER_BOTS",
+        "BANDITS_BOT_USER_AGENTS",
+        "BANDITS_FILTER_EMPTY_USER_AGENT",
+        "BANDITS_UNTRACKED_METHODS",
+        "BANDITS_STATIC_EXTENSIONS",
+        "STATIC_URL",
+        "MEDIA_URL",
+    ]
+)
+
+DEFAULT_BOT_USER_AGENTS = [
+    r"bot\b",
+    r"bot/",
+    r"crawl",
+    r"spider",
+    r"slurp",
+    r"archiver",
+    r"facebookexternalhit",
+    r"embedly",
+    r"preview",
+    r"headless",
+    r"lighthouse",
+    r"monitor",
+    r"curl/",
+    r"wget/",
+    r"python-requests",
+    r"python-urllib",
+    r"aiohttp",
+    r"go-http-client",
+    r"java/",
+    r"okhttp",
+    r"httpclient",
+    r"scrapy",
+]
+
+DEFAULT_STATIC_EXTENSIONS = [
+    ".css",
+    ".js",
+    ".map",
+    ".ico",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".webp",
+    ".woff",
+    ".woff2",
+    ".ttf",
+    ".txt",
+    ".xml",
+]
+
+
+class BotFilter:
+    def __init__(
+        self,
+        user_agents=DEFAULT_BOT_USER_AGENTS,
+        methods=("HEAD", "OPTIONS"),
+        static_extensions=DEFAULT_STATIC_EXTENSIONS,
+        static_prefixes=(),
+        filter_empty_user_agent=False,
+        enabled=True,
+    ):
+        self.enabled = enabled
+        self.methods = frozenset(method.upper() for method in methods)
+        self.static_extensions = tuple(ext.lower() for ext in static_extensions)
+        self.static_prefixes = tuple(prefix for prefix in static_prefixes if prefix)
+        self.filter_empty_user_agent = filter_empty_user_agent
+        self._user_agent_pattern = (
+            re.compile("|".join(f"(?:{ua})" for ua in user_agents), re.IGNORECASE)
+            if user_agents
+            else None
+        )
+        # A handful of user agents make up most traffic
+        self.is_bot_user_agent = functools.lru_cache(maxsize=1024)(
+            self._is_bot_user_agent
+        )
+
+    @classmethod
+    def from_settings(cls):
+        static_prefixes = []
+        for setting in ["STATIC_URL", "MEDIA_URL"]:
+            prefix = getattr(settings, setting, None)
+            # Only site-relative URLs can show up in request.path, and an unset
+            # MEDIA_URL reads as "/"
+            if prefix and prefix.strip("/") and "://" not in prefix:
+                static_prefixes.append("/" + prefix.lstrip("/"))
+        return cls(
+            user_agents=getattr(
+                settings, "BANDITS_BOT_USER_AGENTS", DEFAULT_BOT_USER_AGENTS
+            ),
+            methods=getattr(settings, "BANDITS_UNTRACKED_METHODS", ("HEAD", "OPTIONS")),
+            static_extensions=getattr(
+                settings, "BANDITS_STATIC_EXTENSIONS", DEFAULT_STATIC_EXTENSIONS
+            ),
+            static_prefixes=static_prefixes,
+            filter_empty_user_agent=getattr(
+                settings, "BANDITS_FILTER_EMPTY_USER_AGENT", False
+            ),
+            enabled=getattr(settings, "BANDITS_FILTER_BOTS", True),
+        )
+
+    def _is_bot_user_agent(self, user_agent: str) -> bool:
+        if not user_agent:
+            return self.filter_empty_user_agent
+        if self._user_agent_pattern is None:
+            return False
+        return self._user_agent_pattern.search(user_agent) is not None
+
+    def is_filtered(self, request: HttpRequest) -> bool:
+        """Returns whether the request should be left untracked"""
+        if not self.enabled:
+            return False
+        if request.method in self.methods:
+            return True
+        path = request.path
+        if self.static_prefixes and path.startswith(self.static_prefixes):
+            return True
+        if path.lower().endswith(self.static_extensions):
+            return True
+        return self.is_bot_user_agent(request.META.get("HTTP_USER_AGENT", ""))
+
+
+_bot_filter = None
+
+
+def get_bot_filter() -> BotFilter:
+    global _bot_filter
+    bot_filter = _bot_filter
+    if bot_filter is None:
+        bot_filter = _bot_filter = BotFilter.from_settings()
+    return bot_filter
+
+
+def reset_bot_filter() -> None:
+    global _bot_filter
+    _bot_filter = None
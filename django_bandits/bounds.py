@@ -0,0 +1,27 @@
+"""
+Relative bounds on the counts a cached decision was computed from.
+
+The decision tables and the Thompson Sampling batches stay valid while every
+count or posterior parameter is within a relative tolerance of the value they
+were computed from, and are recomputed once any of them leaves its bounds.
+"""
+
+
+def get_bounds(values: list, tolerance: float) -> tuple:
+    """Returns the (lower, upper) bounds within tolerance of each value"""
+    return (
+        [value * (1 - tolerance) for value in values],
+        [value * (1 + tolerance) for value in values],
+    )
+
+
+def within_bounds(bounds: tuple, values: list) -> bool:
+    """Returns whether every value is within the bounds"""
+    lower, upper = bounds
+    if len(values) != len(lower):
+        return False
+    # Plain float comparisons beat NumPy on a handful of arms
+    for low, value, high in zip(lower, values, upper):
+        if not low <= value <= high:
+            return False
+    return True
@@ -0,0 +1,93 @@
+"""
+Write-behind buffer for UserActivity and UserActivityFlag rows.
+
+When ``BANDITS_ACTIVITY_WRITE_BEHIND`` is enabled the middleware hands each
+tracked request to ``activity_buffer`` instead of inserting it on the request
+thread. The buffer is written with ``bulk_create`` once it holds
+``BANDITS_ACTIVITY_BUFFER_SIZE`` requests, after
+``BANDITS_ACTIVITY_FLUSH_INTERVAL`` milliseconds, and at interpreter exit.
+Conversions are attributed from ``FlagExposure`` rows, which the middleware
+writes right away so that every worker sees them.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from .models import UserActivity, UserActivityFlag
+from .timers import FlushTimer
+
+
+class ActivityBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._timer = FlushTimer(
+            self.flush, self.get_flush_interval, "buffered user activity"
+        )
+        if hasattr(os, "register_at_fork"):
+            # Rows queued before a fork belong to the parent process
+            os.register_at_fork(after_in_child=self._reset)
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return getattr(settings, "BANDITS_ACTIVITY_WRITE_BEHIND", False)
+
+    @staticmethod
+    def get_batch_size() -> int:
+        return getattr(settings, "BANDITS_ACTIVITY_BUFFER_SIZE", 500)
+
+    @staticmethod
+    def get_flush_interval() -> float:
+        """Returns the maximum time in seconds a row waits in the buffer"""
+        return getattr(settings, "BANDITS_ACTIVITY_FLUSH_INTERVAL", 1000) / 1000
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+
+    def add(self, user_activity: UserActivity, ua_flags=()) -> None:
+        """Queues an unsaved UserActivity with its unsaved UserActivityFlags"""
+        with self._lock:
+            self._pending.append((user_activity, list(ua_flags)))
+            is_full = len(self._pending) >= self.get_batch_size()
+            if not is_full:
+                self._timer.start()
+        if is_full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes every queued row and returns the number of activities saved"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._timer.cancel()
+            if not pending:
+                return 0
+
+            activities = [user_activity for user_activity, _ in pending]
+            for user_activity in activities:
+                # bulk_create() bypasses URLSanitizationMixin.save()
+                user_activity.sanitize_urls()
+            if connection.features.can_return_rows_from_bulk_insert:
+                UserActivity.objects.bulk_create(activities)
+            else:
+                for user_activity in activities:
+                    user_activity.save()
+
+            ua_flags = []
+            for user_activity, activity_flags in pending:
+                for ua_flag in activity_flags:
+                    ua_flag.user_activity = user_activity
+                    ua_flags.append(ua_flag)
+            UserActivityFlag.objects.bulk_create(ua_flags)
+            return len(activities)
+
+
+activity_buffer = ActivityBuffer()
@@ -0,0 +1,182 @@
+"""
+Process-local caches used by the middleware and the bandit models.
+
+The caches are rebuilt lazily on first use and invalidated by the receivers in
+``django_bandits.signals`` whenever the underlying rows change. Because other
+worker processes do not see those signals, every cache also expires after a
+configurable TTL so changes made elsewhere are picked up eventually.
+"""
+import copy
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import BANDIT_MODELS, FlagUrl, URLSanitizationMixin
+
+
+def normalize_url(url: str) -> str:
+    """Normalizes a URL the same way FlagUrl and UserActivity store it"""
+    if url is None:
+        return None
+    return URLSanitizationMixin.ensure_trailing_slash(url)
+
+
+class ProcessLocalCache:
+    """
+    Holds a value built from the database until it is invalidated or expires.
+
+    Subclasses implement _build() and name the setting holding their TTL in
+    seconds, where None disables expiry.
+    """
+
+    ttl_setting = None
+    default_ttl = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._built_at = 0.0
+        self._generation = 0
+
+    def get_ttl(self):
+        return getattr(settings, self.ttl_setting, self.default_ttl)
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._generation += 1
+
+    def _is_expired(self) -> bool:
+        ttl = self.get_ttl()
+        return ttl is not None and time.monotonic() - self._built_at > ttl
+
+    def _build(self):
+        raise NotImplementedError("_build method not implemented.")
+
+    def get_value(self):
+        value = self._value
+        if value is not None and not self._is_expired():
+            return value
+        generation = self._generation
+        value = self._build()
+        with self._lock:
+            # Don't keep a value that was invalidated while it was being built
+            if generation == self._generation:
+                self._value = value
+                self._built_at = time.monotonic()
+        return value
+
+    async def aget_value(self):
+        value = self._value
+        if value is not None and not self._is_expired():
+            return value
+        return await sync_to_async(self.get_value)()
+
+
+class FlagRouteIndex(ProcessLocalCache):
+    """
+    Maps normalized source and target URLs to the flags tracked on them.
+
+    The index is built with a single query and lets the middleware skip every
+    flag that does not care about the current URL.
+    """
+
+    ttl_setting = "BANDITS_ROUTE_CACHE_TTL"
+
+    def _build(self) -> dict:
+        routes = {}
+        for flag_url in FlagUrl.objects.select_related("flag").order_by("flag_id"):
+            urls = {
+                normalize_url(url)
+                for url in (flag_url.source_url, flag_url.target_url)
+                if url is not None
+            }
+            for url in urls:
+                routes.setdefault(url, []).append((flag_url.flag, flag_url))
+        return {url: tuple(pairs) for url, pairs in routes.items()}
+
+    def lookup(self, url: str) -> tuple:
+        """Returns the (flag, flag_url) pairs whose source or target is url"""
+        return self.get_value().get(normalize_url(url), ())
+
+    async def alookup(self, url: str) -> tuple:
+        """Async version of lookup(), which only hits the database to rebuild"""
+        return (await self.aget_value()).get(normalize_url(url), ())
+
+
+class ActiveBanditCache(ProcessLocalCache):
+    """
+    Maps flag ids to their active bandit model instance.
+
+    Every registered bandit model is queried once for its active rows when the
+    cache is built, so finding the bandit behind a flag costs no queries.
+    """
+
+    ttl_setting = "BANDITS_BANDIT_CACHE_TTL"
+
+    def _build(self) -> dict:
+        bandits = {}
+        for bandit_model in BANDIT_MODELS:
+            for bandit in bandit_model.objects.filter(is_active=True).select_related(
+                "flag"
+            ):
+                # Earlier registered models win, as in the old related set loop
+                bandits.setdefault(bandit.flag_id, bandit)
+        return bandits
+
+    def lookup(self, flag_id: int):
+        """
+        Returns a private copy of the flag's active bandit with its arm
+        statistics loaded, or None if the flag has no active bandit.
+        """
+        bandit = self.get_value().get(flag_id)
+        if bandit is None:
+            return None
+        # The cached instance is shared between threads
+        bandit = copy.copy(bandit)
+        bandit.load_arm_stats()
+        return bandit
+
+    def lookup_many(self, flags) -> dict:
+        """
+        Returns {flag id: bandit} like lookup() for the flags with an active
+        bandit, loading their arm statistics together
+        """
+        from .stats import arm_stats
+
+        bandits = self.get_value()
+        found = {flag.pk: bandits[flag.pk] for flag in flags if flag.pk in bandits}
+        stats = arm_stats.get_many([flag for flag in flags if flag.pk in found])
+        for flag_id, bandit in found.items():
+            bandit = found[flag_id] = copy.copy(bandit)
+            bandit._arm_stats = stats[flag_id]
+        return found
+
+    def update_fields(self, bandit, field_names) -> None:
+        """Copies saved bookkeeping fields onto the cached instance of bandit"""
+        bandits = self._value
+        cached = bandits.get(bandit.flag_id) if bandits is not None else None
+        if cached is None or type(cached) is not type(bandit):
+            return
+        if cached.pk == bandit.pk:
+            for field_name in field_names:
+                setattr(cached, field_name, getattr(bandit, field_name))
+
+
+flag_routes = FlagRouteIndex()
+active_bandits = ActiveBanditCache()
+
+
+def clear_caches():
+    """Drops every process-local cache, e.g. between tests"""
+    from .policies import decision_tables
+    from .sampling import posterior_samples
+    from .stats import arm_stats
+
+    flag_routes.invalidate()
+    active_bandits.invalidate()
+    arm_stats.invalidate()
+    posterior_samples.clear()
+    decision_tables.clear()
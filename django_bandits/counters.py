@@ -0,0 +1,317 @@
+"""
+Pluggable storage for view and conversion counters.
+
+``BANDITS_COUNTER_BACKEND`` selects where ``FlagUrl.record_view()`` and
+``record_conversion()`` count:
+
+* ``django_bandits.counters.DatabaseCounterBackend`` (the default) updates
+  FlagUrl or FlagArm on every increment.
+* ``django_bandits.counters.CacheCounterBackend`` increments keys in the
+  ``BANDITS_COUNTER_CACHE`` cache.
+* ``django_bandits.counters.RedisCounterBackend`` increments a hash per flag
+  on the Redis server at ``BANDITS_COUNTER_REDIS_URL`` with one pipelined
+  round trip.
+* ``django_bandits.counters.ShardedCounterBackend`` increments one of
+  ``BANDITS_COUNTER_SHARDS`` FlagCounterShard rows per arm, chosen at random.
+
+The cache and Redis backends move the counts into the database every
+``BANDITS_COUNTER_FLUSH_INTERVAL`` milliseconds and at interpreter exit, so hot
+flags no longer contend for the same rows. Shards are folded into FlagUrl or
+FlagArm whenever ``evaluate_bandits`` runs. Counts that haven't been flushed
+are included by ``BanditFlag.get_arm_counts()``.
+"""
+import os
+import random
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models, transaction
+from django.utils.module_loading import import_string
+
+from .models import BanditFlag, FlagCounterShard, increment_counters
+from .timers import FlushTimer
+
+VIEWS = "views"
+CONVERSIONS = "conversions"
+COUNTERS = (VIEWS, CONVERSIONS)
+
+
+class DatabaseCounterBackend:
+    """Writes every increment straight to the database"""
+
+    def increment(self, flag: BanditFlag, arm: int, counter: str) -> None:
+        flag.add_arm_counts({(counter, arm): 1})
+
+    def get_pending(self, flag_id: int, number_of_arms: int) -> np.ndarray:
+        """Returns the (views, conversions) counts of each arm not yet flushed"""
+        return np.zeros((2, number_of_arms), dtype=np.int64)
+
+    def flush(self) -> int:
+        """Writes pending counts to the database and returns how many flags changed"""
+        return 0
+
+
+class BufferedCounterBackend(DatabaseCounterBackend):
+    """Base class of backends that count elsewhere and flush periodically"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = FlushTimer(self.flush, self.get_flush_interval, "bandit counters")
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    @staticmethod
+    def get_flush_interval() -> float:
+        """Returns the maximum time in seconds a count waits to be flushed"""
+        return getattr(settings, "BANDITS_COUNTER_FLUSH_INTERVAL", 5000) / 1000
+
+    def _reset(self):
+        self._lock = threading.Lock()
+
+    def increment(self, flag: BanditFlag, arm: int, counter: str) -> None:
+        self._increment(flag.pk, arm, counter)
+        self._timer.start()
+
+    def _increment(self, flag_id: int, arm: int, counter: str) -> None:
+        raise NotImplementedError
+
+    def _take_pending(self) -> dict:
+        """Removes and returns {flag_id: {(counter, arm): amount}}"""
+        raise NotImplementedError
+
+    def flush(self) -> int:
+        pending = self._take_pending()
+        flags = BanditFlag.objects.in_bulk(list(pending))
+        for flag_id, counts in pending.items():
+            if flag_id in flags:
+                flags[flag_id].add_arm_counts(counts)
+        return len(flags)
+
+    @staticmethod
+    def _to_array(counts: dict, number_of_arms: int) -> np.ndarray:
+        pending = np.zeros((2, number_of_arms), dtype=np.int64)
+        for (counter, arm), amount in counts.items():
+            if arm < number_of_arms:
+                pending[COUNTERS.index(counter), arm] += amount
+        return pending
+
+
+class CacheCounterBackend(BufferedCounterBackend):
+    """
+    Counts in a Django cache. Each process flushes the keys it incremented,
+    taking whatever other processes have added to them as well. A key is
+    locked while it is taken, so concurrent flushes never count it twice.
+    """
+
+    key_prefix = "django_bandits:counter"
+    lock_timeout = 60
+
+    def __init__(self):
+        super().__init__()
+        self._keys = set()
+
+    def _reset(self):
+        super()._reset()
+        self._keys = set()
+
+    @staticmethod
+    def get_cache():
+        return caches[getattr(settings, "BANDITS_COUNTER_CACHE", "default")]
+
+    def get_key(self, flag_id: int, arm: int, counter: str) -> str:
+        return f"{self.key_prefix}:{flag_id}:{arm}:{counter}"
+
+    def _increment(self, flag_id: int, arm: int, counter: str) -> None:
+        cache = self.get_cache()
+        key = self.get_key(flag_id, arm, counter)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # First increment since the last flush, unless another process
+            # just created the key
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+        with self._lock:
+            self._keys.add((flag_id, arm, counter))
+
+    def _take_pending(self) -> dict:
+        with self._lock:
+            keys, self._keys = self._keys, set()
+        cache = self.get_cache()
+        pending = {}
+        for flag_id, arm, counter in keys:
+            key = self.get_key(flag_id, arm, counter)
+            # get() and decr() aren't atomic together, so only the process
+            # holding the key's lock takes it. The lock expires in case its
+            # holder dies before releasing it.
+            lock_key = f"{key}:lock"
+            if not cache.add(lock_key, 1, timeout=self.lock_timeout):
+                with self._lock:
+                    self._keys.add((flag_id, arm, counter))
+                continue
+            try:
+                amount = cache.get(key)
+                if not amount:
+                    continue
+                try:
+                    # decr() keeps increments made since get()
+                    cache.decr(key, amount)
+                except ValueError:
+                    # Evicted, along with anything added since get()
+                    pass
+                pending.setdefault(flag_id, {})[(counter, arm)] = amount
+            finally:
+                cache.delete(lock_key)
+        return pending
+
+    def get_pending(self, flag_id: int, number_of_arms: int) -> np.ndarray:
+        keys = {
+            self.get_key(flag_id, arm, counter): (counter, arm)
+            for arm in range(number_of_arms)
+            for counter in COUNTERS
+        }
+        counts = {
+            keys[key]: amount
+            for key, amount in self.get_cache().get_many(list(keys)).items()
+        }
+        return self._to_array(counts, number_of_arms)
+
+
+class RedisCounterBackend(BufferedCounterBackend):
+    """
+    Counts in a Redis hash per flag, with a set of the flags that have
+    pending counts so any process can flush them
+    """
+
+    key_prefix = "django_bandits:counter"
+    lock_timeout = 60
+
+    def __init__(self, client=None):
+        super().__init__()
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImproperlyConfigured(
+                    "RedisCounterBackend requires the redis package"
+                )
+            client = redis.Redis.from_url(
+                getattr(
+                    settings, "BANDITS_COUNTER_REDIS_URL", "redis://localhost:6379/0"
+                )
+            )
+        self.client = client
+        self.dirty_key = f"{self.key_prefix}:dirty"
+
+    def get_key(self, flag_id: int) -> str:
+        return f"{self.key_prefix}:{flag_id}"
+
+    def _increment(self, flag_id: int, arm: int, counter: str) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hincrby(self.get_key(flag_id), f"{counter}:{arm}", 1)
+        pipe.sadd(self.dirty_key, flag_id)
+        pipe.execute()
+
+    @staticmethod
+    def _parse(hash_counts: dict) -> dict:
+        counts = {}
+        for field, amount in hash_counts.items():
+            if isinstance(field, bytes):
+                field = field.decode()
+            counter, arm = field.split(":")
+            counts[(counter, int(arm))] = int(amount)
+        return counts
+
+    def _take_pending(self) -> dict:
+        pending = {}
+        for flag_id in self.client.smembers(self.dirty_key):
+            flag_id = int(flag_id)
+            key = self.get_key(flag_id)
+            # Increments made after this transaction mark the flag dirty again
+            pipe = self.client.pipeline(transaction=True)
+            pipe.srem(self.dirty_key, flag_id)
+            pipe.hgetall(key)
+            pipe.delete(key)
+            _, hash_counts, _ = pipe.execute()
+            if hash_counts:
+                pending[flag_id] = self._parse(hash_counts)
+        return pending
+
+    def get_pending(self, flag_id: int, number_of_arms: int) -> np.ndarray:
+        counts = self._parse(self.client.hgetall(self.get_key(flag_id)))
+        return self._to_array(counts, number_of_arms)
+
+
+class ShardedCounterBackend(DatabaseCounterBackend):
+    """
+    Spreads each arm's counts over several FlagCounterShard rows so that
+    concurrent increments rarely wait on the same row lock
+    """
+
+    @staticmethod
+    def get_number_of_shards() -> int:
+        return getattr(settings, "BANDITS_COUNTER_SHARDS", 8)
+
+    def increment(self, flag: BanditFlag, arm: int, counter: str) -> None:
+        shard = random.randrange(self.get_number_of_shards())
+        increment_counters(
+            FlagCounterShard, {counter: 1}, flag_id=flag.pk, arm=arm, shard=shard
+        )
+
+    def get_pending(self, flag_id: int, number_of_arms: int) -> np.ndarray:
+        pending = np.zeros((2, number_of_arms), dtype=np.int64)
+        shard_sums = (
+            FlagCounterShard.objects.filter(flag_id=flag_id, arm__lt=number_of_arms)
+            .values("arm")
+            .annotate(views=models.Sum("views"), conversions=models.Sum("conversions"))
+            .values_list("arm", "views", "conversions")
+        )
+        for arm, views, conversions in shard_sums:
+            pending[:, arm] = views, conversions
+        return pending
+
+    def flush(self) -> int:
+        """Folds the shards into FlagUrl or FlagArm"""
+        pending = {}
+        with transaction.atomic():
+            # Locking the shards makes overlapping flushes wait, then read
+            # what the first one left instead of folding the same counts
+            shards = FlagCounterShard.objects.select_for_update().filter(
+                models.Q(views__gt=0) | models.Q(conversions__gt=0)
+            )
+            for shard in shards:
+                # Subtracting what was read keeps increments made since
+                FlagCounterShard.objects.filter(pk=shard.pk).update(
+                    views=models.F("views") - shard.views,
+                    conversions=models.F("conversions") - shard.conversions,
+                )
+                counts = pending.setdefault(shard.flag_id, {})
+                for counter in COUNTERS:
+                    if getattr(shard, counter):
+                        key = (counter, shard.arm)
+                        counts[key] = counts.get(key, 0) + getattr(shard, counter)
+            flags = BanditFlag.objects.in_bulk(list(pending))
+            for flag_id, counts in pending.items():
+                flags[flag_id].add_arm_counts(counts)
+        return len(pending)
+
+
+_backend = None
+_backend_path = None
+
+
+def get_counter_backend() -> DatabaseCounterBackend:
+    """Returns the instance of the BANDITS_COUNTER_BACKEND class"""
+    global _backend, _backend_path
+    path = getattr(
+        settings,
+        "BANDITS_COUNTER_BACKEND",
+        "django_bandits.counters.DatabaseCounterBackend",
+    )
+    if path != _backend_path:
+        _backend = import_string(path)()
+        _backend_path = path
+    return _backend
@@ -0,0 +1,119 @@
+"""
+Helpers for reading bandit decisions in views and templates.
+"""
+from django.http import HttpRequest
+from waffle.models import CACHE_EMPTY
+from waffle.utils import get_cache
+
+from . import assignments
+from .memo import RequestDecisions, get_request_decisions
+from .models import BanditFlag
+
+
+def flag_arm(request: HttpRequest, flag_name: str) -> int:
+    """
+    Returns the index of the flag's variant to show for a request, 0 being the
+    control. Unlike waffle.flag_is_active, this supports flags with more than
+    two arms.
+    """
+    decisions = get_request_decisions(request)
+    if decisions is not None:
+        flag = decisions.get_flag(flag_name)
+    else:
+        flag = BanditFlag.get(flag_name)
+    if not flag.pk:
+        return 0
+    return flag.choose_arm(request)
+
+
+def get_flags(flag_names) -> dict:
+    """
+    Returns {name: flag} like BanditFlag.get() for every name, with a single
+    cache round trip and at most one query for the flags that aren't cached
+    """
+    cache = get_cache()
+    keys = {BanditFlag._cache_key(name): name for name in flag_names}
+    cached = cache.get_many(list(keys))
+    flags = {}
+    missing = []
+    for key, name in keys.items():
+        value = cached.get(key)
+        if value == CACHE_EMPTY:
+            flags[name] = BanditFlag(name=name)
+        elif value:
+            flags[name] = value
+        else:
+            missing.append(name)
+    if missing:
+        found = {
+            flag.name: flag for flag in BanditFlag.objects.filter(name__in=missing)
+        }
+        for name in missing:
+            flags[name] = found.get(name, BanditFlag(name=name))
+        cache.set_many(
+            {
+                BanditFlag._cache_key(name): found.get(name, CACHE_EMPTY)
+                for name in missing
+            }
+        )
+    return flags
+
+
+def pull_many(bandits) -> list:
+    """
+    Returns an arm for each bandit. Each is pulled like a single pull(), from
+    its flag's random stream and its cached decision table or posterior batch,
+    so a batched decision matches the one flag_is_active() would make.
+    """
+    return [bandit.pull_arm() for bandit in bandits]
+
+
+def decide_flags(request: HttpRequest, flag_names) -> dict:
+    """
+    Returns {name: arm} for several flags at once, deciding each like
+    flag_arm(). Flags, active bandits and their arm statistics are loaded
+    together, so new visitors' pulls need no further queries.
+    """
+    from .cache import active_bandits
+
+    memo = get_request_decisions(request) or RequestDecisions()
+    names = list(dict.fromkeys(flag_names))
+    memo.flags.update(get_flags([name for name in names if name not in memo.flags]))
+    flags = {name: memo.flags[name] for name in names}
+    unseen = [
+        flag for flag in flags.values() if flag.pk and flag.pk not in memo.bandits
+    ]
+    found = active_bandits.lookup_many(unseen)
+    memo.bandits.update({flag.pk: found.get(flag.pk) for flag in unseen})
+
+    decisions = {}
+    pulling = []
+    for name, flag in flags.items():
+        if not flag.pk:
+            decisions[name] = 0
+            continue
+        bandit = memo.bandits[flag.pk]
+        if bandit is None:
+            decisions[name] = int(bool(flag.is_active(request)))
+            continue
+        # Waffle's overrides come before the bandit, as in choose_arm()
+        override = flag.get_waffle_override(request)
+        if override is not None:
+            decisions[name] = int(override)
+        elif bandit.winning_arm is not None:
+            decisions[name] = bandit.winning_arm
+        elif name in memo.arms:
+            decisions[name] = memo.arms[name]
+        else:
+            arm = assignments.get_assigned_arm(request, flag)
+            if arm is None or arm >= flag.number_of_arms:
+                pulling.append((name, flag, bandit))
+            else:
+                decisions[name] = memo.arms[name] = arm
+
+    if pulling:
+        arms = pull_many([bandit for _, _, bandit in pulling])
+        for (name, flag, _), arm in zip(pulling, arms):
+            assignments.assign_arm(request, flag, arm)
+            decisions[name] = memo.arms[name] = arm
+    return {name: decisions[name] for name in flags}
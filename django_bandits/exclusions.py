@@ -0,0 +1,105 @@
+"""
+Compiled matcher for the URLs excluded from tracking.
+
+``EXCLUDE_FROM_TRACKING`` prefixes are compiled into a single anchored regex
+shaped like a prefix trie, so matching costs one pass over the path however
+many prefixes there are. ``EXCLUDE_FROM_TRACKING_GLOBS`` (e.g. ``"*.php"``)
+are combined into one regex too, and ``EXCLUDE_FROM_TRACKING_REGEX`` is
+compiled once. Recent decisions are kept in an LRU cache of
+``BANDITS_EXCLUSION_CACHE_SIZE`` paths. The matcher is rebuilt when any of
+these settings change through Django's ``setting_changed`` signal.
+"""
+import fnmatch
+import functools
+import re
+
+from django.conf import settings
+
+EXCLUSION_SETTINGS = frozenset(
+    [
+        "EXCLUDE_FROM_TRACKING",
+        "EXCLUDE_FROM_TRACKING_REGEX",
+        "EXCLUDE_FROM_TRACKING_GLOBS",
+        "BANDITS_EXCLUSION_CACHE_SIZE",
+    ]
+)
+
+
+def _trie_pattern(node: dict) -> str:
+    if "" in node:
+        # A shorter prefix already matches every longer one
+        return ""
+    alternatives = [
+        re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items())
+    ]
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:" + "|".join(alternatives) + ")"
+
+
+def compile_prefixes(prefixes) -> re.Pattern:
+    """Returns a regex matching any of the prefixes at the start of a string"""
+    trie = {}
+    for prefix in prefixes:
+        node = trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    if not trie:
+        return None
+    return re.compile(_trie_pattern(trie))
+
+
+def compile_globs(globs) -> re.Pattern:
+    """Returns a regex matching a whole string against any of the globs"""
+    if not globs:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(glob)})" for glob in globs))
+
+
+class ExclusionMatcher:
+    def __init__(self, prefixes=(), regex="", globs=(), cache_size=1024):
+        self.prefixes = [
+            prefix if prefix.startswith("/") else "/" + prefix for prefix in prefixes
+        ]
+        self.regex = regex
+        self.globs = list(globs)
+        self._prefix_pattern = compile_prefixes(self.prefixes)
+        self._regex_pattern = re.compile(regex) if regex else None
+        self._glob_pattern = compile_globs(self.globs)
+        self.is_excluded = functools.lru_cache(maxsize=cache_size)(self._is_excluded)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            prefixes=getattr(settings, "EXCLUDE_FROM_TRACKING", ["/admin"]),
+            regex=getattr(settings, "EXCLUDE_FROM_TRACKING_REGEX", ""),
+            globs=getattr(settings, "EXCLUDE_FROM_TRACKING_GLOBS", ()),
+            cache_size=getattr(settings, "BANDITS_EXCLUSION_CACHE_SIZE", 1024),
+        )
+
+    def _is_excluded(self, path: str) -> bool:
+        """Returns whether the path is excluded from tracking"""
+        if self._prefix_pattern is not None and self._prefix_pattern.match(path):
+            return True
+        if self._regex_pattern is not None and self._regex_pattern.search(path):
+            return True
+        if self._glob_pattern is not None and self._glob_pattern.match(path):
+            return True
+        return False
+
+
+_matcher = None
+
+
+def get_exclusion_matcher() -> ExclusionMatcher:
+    global _matcher
+    matcher = _matcher
+    if matcher is None:
+        matcher = _matcher = ExclusionMatcher.from_settings()
+    return matcher
+
+
+def reset_exclusion_matcher() -> None:
+    global _matcher
+    _matcher = None
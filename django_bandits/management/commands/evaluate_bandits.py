@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from django_bandits.counters import get_counter_backend
+from django_bandits.models import BANDIT_MODELS
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the significance tests of active bandits that have no winning arm "
+        "yet. Use with BANDITS_TEST_ARMS_IN_REQUEST = False to keep the tests "
+        "out of the request cycle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Test every bandit, even if its counts haven't changed.",
+        )
+        parser.add_argument(
+            "--loop",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running, evaluating the bandits every SECONDS seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.evaluate(options["force"])
+            if not options["loop"]:
+                break
+            time.sleep(options["loop"])
+
+    def evaluate(self, force: bool) -> None:
+        # Test against counts still held by a shared counter backend
+        get_counter_backend().flush()
+        n_tested = 0
+        for bandit_model in BANDIT_MODELS:
+            bandits = bandit_model.objects.filter(
+                is_active=True,
+                winning_arm__isnull=True,
+                flag__flagurl__isnull=False,
+            ).select_related("flag__flagurl")
+            for bandit in bandits:
+                if force:
+                    bandit.test_arms()
+                elif not bandit.maybe_test_arms():
+                    continue
+                n_tested += 1
+                if bandit.winning_arm is not None:
+                    self.stdout.write(
+                        f"{bandit.flag.name}: arm {bandit.winning_arm} wins"
+                    )
+        self.stdout.write(f"Evaluated {n_tested} bandit(s)")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from django_bandits.retention import prune_activity
+
+
+class Command(BaseCommand):
+    help = (
+        "Rolls up UserActivity older than BANDITS_ACTIVITY_RETENTION_DAYS into "
+        "daily per arm FlagActivityRollup rows and deletes it in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Days of activity to keep, unless set per flag.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Rows deleted per transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            metavar="SECONDS",
+            help="Time to wait between batches.",
+        )
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+        deleted = prune_activity(
+            days=options["days"],
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            progress=self.stdout.write if verbosity > 1 else lambda message: None,
+        )
+        self.stdout.write(
+            f"Deleted {deleted['flag_views']} flag view(s), "
+            f"{deleted['activities']} activity row(s) and "
+            f"{deleted['exposures']} exposure(s)"
+        )
@@ -0,0 +1,99 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from django_bandits.models import BANDIT_MODELS, BanditFlag
+from django_bandits.simulation import load_replay_log, replay, simulate, sweep
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulates a bandit against Bernoulli arms, or replays the activity "
+        "recorded for a flag, over a grid of parameters, e.g. "
+        "--model UCB1Model --param c=0.5,1,2 --param min_views=100,1000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            default="EpsilonGreedyModel",
+            choices=[model.__name__ for model in BANDIT_MODELS],
+        )
+        parser.add_argument(
+            "--param",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE,...",
+            help="Model field values to sweep, e.g. epsilon=0.05,0.1.",
+        )
+        parser.add_argument(
+            "--rates",
+            type=float,
+            nargs="+",
+            default=[0.05, 0.06],
+            help="Conversion rate of each simulated arm.",
+        )
+        parser.add_argument(
+            "--steps", type=int, default=10000, help="Visitors per simulated run."
+        )
+        parser.add_argument(
+            "--flag",
+            help="Replay the exposures and conversions recorded for this flag.",
+        )
+        parser.add_argument("--runs", type=int, default=1000)
+        parser.add_argument("--seed", type=int)
+
+    def parse_grid(self, model_class, params) -> dict:
+        grid = {}
+        for param in params:
+            name, _, values = param.partition("=")
+            try:
+                field = model_class._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise CommandError(f"{model_class.__name__} has no field {name!r}")
+            grid[name] = [field.to_python(value) for value in values.split(",")]
+        return grid
+
+    def handle(self, *args, **options):
+        model_class = next(
+            model for model in BANDIT_MODELS if model.__name__ == options["model"]
+        )
+        grid = self.parse_grid(model_class, options["param"])
+        if options["flag"]:
+            try:
+                flag = BanditFlag.objects.get(name=options["flag"])
+            except BanditFlag.DoesNotExist:
+                raise CommandError(f"Flag {options['flag']!r} does not exist")
+            arms, rewards = load_replay_log(flag)
+            if not len(arms):
+                raise CommandError(f"No activity recorded for {flag.name}")
+            self.stdout.write(f"Replaying {len(arms)} exposures of {flag.name}")
+            kwargs = {"run": replay, "arms": arms, "rewards": rewards}
+        else:
+            self.stdout.write(
+                f"Simulating {options['steps']} visitors, rates {options['rates']}"
+            )
+            kwargs = {
+                "run": simulate,
+                "rates": options["rates"],
+                "n_steps": options["steps"],
+            }
+        results = sweep(
+            model_class,
+            grid,
+            n_runs=options["runs"],
+            seed=options["seed"],
+            **kwargs,
+        )
+
+        self.stdout.write(
+            "".join(f"{name:>14}" for name in grid)
+            + f"{'regret':>10}{'significant':>13}{'steps':>9}{'false pos':>11}"
+        )
+        for result in results:
+            steps = result["steps_to_significance"]
+            self.stdout.write(
+                "".join(f"{result[name]!s:>14}" for name in grid)
+                + f"{result['regret']:>10.1f}{result['significant_rate']:>13.1%}"
+                + f"{'-' if steps is None else f'{steps:.0f}':>9}"
+                + f"{result['false_positive_rate']:>11.1%}"
+            )
@@ -0,0 +1,49 @@
+"""
+Request-scoped memo of flag decisions.
+
+UserActivityMiddleware attaches a RequestDecisions to every request as
+``request.bandit_decisions``. For the rest of the request the middleware,
+views, templates and ``waffle.flag_is_active()`` look each flag and its active
+bandit up once, and every later check of a flag returns the first decision.
+The page stays consistent even when sticky assignments are turned off.
+"""
+from django.http import HttpRequest
+
+REQUEST_ATTRIBUTE = "bandit_decisions"
+
+
+class RequestDecisions:
+    def __init__(self):
+        # Flags by name, active bandits (or None) by flag id, and decisions by
+        # flag name: arms pulled from a bandit and is_active() results
+        self.flags = {}
+        self.bandits = {}
+        self.arms = {}
+        self.active = {}
+
+    def get_flag(self, flag_name: str):
+        """Returns BanditFlag.get(flag_name), fetched once per request"""
+        from .models import BanditFlag
+
+        if flag_name not in self.flags:
+            self.flags[flag_name] = BanditFlag.get(flag_name)
+        return self.flags[flag_name]
+
+    def get_bandit(self, flag):
+        """Returns the flag's active bandit, looked up once per request"""
+        from .cache import active_bandits
+
+        if flag.pk not in self.bandits:
+            self.bandits[flag.pk] = active_bandits.lookup(flag.pk)
+        return self.bandits[flag.pk]
+
+
+def attach(request: HttpRequest) -> RequestDecisions:
+    decisions = RequestDecisions()
+    setattr(request, REQUEST_ATTRIBUTE, decisions)
+    return decisions
+
+
+def get_request_decisions(request: HttpRequest):
+    """Returns the decisions memoized for the request, or None"""
+    return getattr(request, REQUEST_ATTRIBUTE, None)
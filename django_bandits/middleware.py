@@ -1,30 +1,46 @@
-import re
+import zlib
+
+import django
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.http import HttpRequest, HttpResponse
-from .models import UserActivity, FlagUrl, UserActivityFlag
-from .models import BanditFlag
+from . import assignments, decisions, memo
+from .models import FlagExposure, UserActivity, UserActivityFlag
+from .bots import get_bot_filter
+from .buffer import activity_buffer
+from .cache import flag_routes, normalize_url
+from .exclusions import get_exclusion_matcher
 
 import waffle
 
+if django.VERSION >= (4, 2):
+    from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
 DEBUG = settings.DEBUG if hasattr(settings, "DEBUG") else False
 
 
-class UserActivityMiddleware:
-    # TODO: Exclude 404 pages
-    exclude = (
-        settings.EXCLUDE_FROM_TRACKING
-        if hasattr(settings, "EXCLUDE_FROM_TRACKING")
-        else ["/admin"]
-    )
-    exclude = [path if path.startswith("/") else "/" + path for path in exclude]
-    exclude_regex = (
-        settings.EXCLUDE_FROM_TRACKING_REGEX
-        if hasattr(settings, "EXCLUDE_FROM_TRACKING_REGEX")
-        else ""
+def is_async_enabled() -> bool:
+    """
+    Running async makes Django run the session and auth middleware async as
+    well, which costs them a thread hop per call, so BANDITS_ASYNC_MIDDLEWARE
+    opts in
+    """
+    return django.VERSION >= (4, 2) and getattr(
+        settings, "BANDITS_ASYNC_MIDDLEWARE", False
     )
 
+
+class UserActivityMiddleware:
+    sync_capable = True
+    # Django reads this from the class when it loads the middleware, so the
+    # setting_changed receiver in signals.py keeps it in step with the setting
+    async_capable = is_async_enabled()
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = self.async_capable and iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def flag_is_active(self, request, flag_name):
         """
@@ -35,25 +51,39 @@ class UserActivityMiddleware:
         """
         return waffle.flag_is_active(request, flag_name)
 
+    def flag_arm(self, request, flag_name):
+        """
+        Returns the variant of a flag with more than two arms to show for a
+        given request
+
+        This is a wrapper around decisions.flag_arm that allows us to mock for
+        testing purposes.
+        """
+        return decisions.flag_arm(request, flag_name)
+
     def check_exclusion(self, current_url):
-        # Dynamic loading of settings for debugging
-        if DEBUG:
-            exclude = getattr(settings, "EXCLUDE_FROM_TRACKING", ["/admin"])
-            self.exclude = [
-                path if path.startswith("/") else "/" + path for path in exclude
-            ]
-            self.exclude_regex = getattr(settings, "EXCLUDE_FROM_TRACKING_REGEX", "")
-        if any(current_url.startswith(path) for path in self.exclude):
-            if DEBUG:
-                print(f"{current_url} excluded by exclusion path: {self.exclude}")
-            return True
-        if self.exclude_regex and re.search(self.exclude_regex, current_url):
-            if DEBUG:
-                print(f"{current_url} excluded by regex: {self.exclude_regex}")
-            return True
-        return False
+        excluded = get_exclusion_matcher().is_excluded(current_url)
+        if excluded and DEBUG:
+            print(f"{current_url} excluded from tracking")
+        return excluded
+
+    def check_bot(self, request: HttpRequest) -> bool:
+        filtered = get_bot_filter().is_filtered(request)
+        if filtered and DEBUG:
+            print(f"{request.method} {request.path} filtered from tracking")
+        return filtered
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.async_mode:
+            return self.__acall__(request)
+
+        # Flags checked again by the view or its templates keep their decision
+        memo.attach(request)
+
+        # Crawlers, probes and assets return before the session or ORM is used
+        if self.check_bot(request):
+            return self.get_response(request)
+
         session_key = request.session.session_key
         current_url = request.path
 
@@ -63,21 +93,89 @@ class UserActivityMiddleware:
         if self.check_exclusion(current_url):
             return self.get_response(request)
 
+        routes = flag_routes.lookup(current_url)
+        if not routes and not self.is_sampled(session_key):
+            # Nothing but the activity log would be written
+            return self.get_response(request)
+        tracking = self.track_request(request, routes)
+
+        response = self.get_response(request)
+
+        if self.is_tracked_status(response.status_code):
+            self.record_activity(request, *tracking)
+        elif DEBUG:
+            print(f"{current_url} not tracked for status {response.status_code}")
+
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        """
+        Handles a request under ASGI without adapting the whole middleware.
+
+        Django's session and auth APIs are sync-only and its async ORM runs
+        every query in a thread of its own, so the sync work is batched into
+        as few sync_to_async() calls as possible: one before the view when
+        flags are routed to the URL, and one to record the activity.
+        """
+        memo.attach(request)
+        if self.check_bot(request):
+            return await self.get_response(request)
+
+        session_key = request.session.session_key
+        current_url = request.path
+
+        if session_key is None or self.check_exclusion(current_url):
+            return await self.get_response(request)
+
+        routes = await flag_routes.alookup(current_url)
+        if not routes and not self.is_sampled(session_key):
+            return await self.get_response(request)
+        tracking = None
+        if routes:
+            # Flags must be decided before the view renders them
+            tracking = await sync_to_async(self.track_request)(request, routes)
+
+        response = await self.get_response(request)
+
+        if self.is_tracked_status(response.status_code):
+            await sync_to_async(self.record_request)(request, tracking)
+        elif DEBUG:
+            print(f"{current_url} not tracked for status {response.status_code}")
+
+        return response
+
+    def record_request(self, request: HttpRequest, tracking: tuple = None) -> None:
+        """Records a request, tracking it first if no flags were routed to it"""
+        if tracking is None:
+            tracking = self.track_request(request, ())
+        self.record_activity(request, *tracking)
+
+    def track_request(self, request: HttpRequest, routes: tuple) -> tuple:
+        """
+        Builds the unsaved activity of a request and decides the flags routed to
+        its URL. Returns the arguments of record_activity() after the request.
+        """
+        session_key = request.session.session_key
+        current_url = request.path
         # If the user is authenticated, add their user instance to the UserActivity
         if request.user.is_authenticated:
-            user_activity = UserActivity.objects.create(
+            user_activity = UserActivity(
                 user=request.user,
                 is_staff=request.user.is_staff,
                 session_key=session_key,
                 url=current_url,
             )
         else:
-            user_activity = UserActivity.objects.create(
-                session_key=session_key, url=current_url
-            )
+            user_activity = UserActivity(session_key=session_key, url=current_url)
+        ua_flags = []
+        # Flags whose source or target page is being visited, recorded once the
+        # response shows the request is worth tracking
+        flag_views = []
+        flag_targets = []
 
         # Checks to see which flags are active on the source page, if any
-        for flag in BanditFlag.objects.all():
+        route_url = normalize_url(current_url)
+        for flag, flag_url in routes:
             if flag.ignore_for_authenticated_users and request.user.is_authenticated:
                 if DEBUG:
                     print(f"Flag {flag.name} ignored for authenticated users")
@@ -88,86 +186,134 @@ class UserActivityMiddleware:
                     and request.user.is_authenticated
                 ):
                     print(f"Flag {flag.name} not ignored for authenticated users")
-            flag_url = FlagUrl.objects.filter(flag=flag).first()
-            if flag_url:
-                if current_url == flag_url.source_url:
+            if route_url == normalize_url(flag_url.source_url):
+                if flag.is_multi_armed:
+                    # arm determines which variant of the feature the user sees
+                    arm = self.flag_arm(request, flag.name)
+                    is_flag_active = bool(arm)
+                else:
                     # is_flag_active determines whether or not the user sees the feature
                     is_flag_active = self.flag_is_active(request, flag.name)
-                    if DEBUG:
-                        print(
-                            f"Checking flag {flag.name} for user {request.user}\nFlag URL: {flag_url.source_url}\nFlag is active: {is_flag_active}"
-                        )
-                    if is_flag_active is not None:
-                        ua_flag = UserActivityFlag.objects.create(
+                    arm = None
+                if DEBUG:
+                    print(
+                        f"Checking flag {flag.name} for user {request.user}\nFlag URL: {flag_url.source_url}\nFlag is active: {is_flag_active}\nArm: {arm}"
+                    )
+                if is_flag_active is not None:
+                    ua_flags.append(
+                        UserActivityFlag(
                             user_activity=user_activity,
                             flag=flag,
                             is_active=is_flag_active,
+                            arm=arm,
                         )
-                        ua_flag.save()
-                        if is_flag_active:
-                            flag_url.active_flag_views += 1
-                        else:
-                            flag_url.inactive_flag_views += 1
-                        flag_url.save()
-
-                # Checks to see if the user has reached the target URL
-                elif current_url == flag_url.target_url:
-                    source_reached = UserActivity.objects.filter(
-                        session_key=session_key, url=flag_url.source_url
-                    ).exists()
-                    if source_reached:
-                        user_activity.target_url_visit = True
-                        user_activity.save()
-                        # Need to see which source flag the user saw before, if any
-                        active_source_flag = self._get_latest_flagged_source_url(
-                            session_key, flag_url.source_url
+                    )
+                    # Repeat views of an assigned arm aren't counted again. The
+                    # arm may have been assigned on an earlier page or response
+                    # that wasn't tracked, so this is checked after deciding.
+                    if not assignments.is_view_counted(request, flag):
+                        flag_views.append(
+                            (flag, flag_url, is_flag_active if arm is None else arm)
                         )
-                        # TODO: Update to handle cases where users didn't see the particular
-                        # landing page or feature flag at all
-                        if DEBUG:
-                            print(
-                                f"User reached target URL {flag_url.target_url}\nActive source flag: {active_source_flag}"
-                            )
-                        if active_source_flag:
-                            flag_url.active_flag_conversions += 1
-                        else:
-                            flag_url.inactive_flag_conversions += 1
-
-                        flag_url.save()
-
-                        # Update bandit stats
-                        for related_set in [
-                            flag.epsilongreedymodel_set,
-                            flag.epsilondecaymodel_set,
-                            flag.ucb1model_set,
-                        ]:
-                            bandit_model_instance = related_set.filter(
-                                is_active=True
-                            ).first()
-                            if bandit_model_instance:
-                                bandit_model_instance.test_arms()
-                                break
 
-        response = self.get_response(request)
+            # Checks to see if the user has reached the target URL
+            elif route_url == normalize_url(flag_url.target_url):
+                flag_targets.append((flag, flag_url))
 
-        if response.status_code == 404:
-            user_activity.delete()
+        return user_activity, ua_flags, flag_views, flag_targets
 
-        return response
+    @staticmethod
+    def is_tracked_status(status_code: int) -> bool:
+        """
+        Returns whether a response with this status code should be recorded.
 
-    def _get_latest_flagged_source_url(
-        self, session_key: str, source_url: str
-    ) -> UserActivityFlag:
+        Defaults to everything except 404s and server errors.
         """
-        Gets the most recent flagged source URL to see whether or not the flagged
-        feature was active.
+        tracked_codes = getattr(settings, "BANDITS_TRACKED_STATUS_CODES", None)
+        if tracked_codes is not None:
+            return status_code in tracked_codes
+        return status_code != 404 and status_code < 500
+
+    @staticmethod
+    def is_sampled(session_key: str) -> bool:
         """
-        source_user_activity = (
-            UserActivity.objects.filter(session_key=session_key, url=source_url)
-            .order_by("-timestamp")
-            .first()
+        Returns whether the session's UserActivity rows are logged.
+
+        Sessions are picked by hash so that a session is either fully logged
+        or not at all, with BANDITS_ACTIVITY_SAMPLE_RATE between 0 and 1
+        (default 1, everything).
+        """
+        rate = getattr(settings, "BANDITS_ACTIVITY_SAMPLE_RATE", 1.0)
+        if rate >= 1:
+            return True
+        return zlib.crc32(session_key.encode()) < rate * 2**32
+
+    def record_activity(
+        self,
+        request: HttpRequest,
+        user_activity: UserActivity,
+        ua_flags: list,
+        flag_views: list,
+        flag_targets: list,
+    ) -> None:
+        """
+        Persists the flag views, conversions and exposures of a tracked request,
+        and its activity rows if the session is sampled
+        """
+        session_key = user_activity.session_key
+
+        self.record_views(flag_views)
+        for flag, _, _ in flag_views:
+            assignments.mark_view_counted(request, flag)
+
+        for flag, flag_url in flag_targets:
+            # Need to see which arm of the flag the user saw before, if any.
+            # Each assignment converts at most once, like it counts one view.
+            source_arm = FlagExposure.claim_conversion(session_key, flag.pk)
+            if self.record_conversion(flag, flag_url, source_arm):
+                user_activity.target_url_visit = True
+
+        # Exposures are needed to attribute conversions in any worker, sampled
+        # or not, so they are written right away even in write-behind mode
+        FlagExposure.record(
+            ((session_key, ua_flag) for ua_flag in ua_flags),
+            new_assignments={flag.pk for flag, _, _ in flag_views},
         )
-        source_uaf = UserActivityFlag.objects.filter(
-            user_activity=source_user_activity
-        ).first()
-        return source_uaf.is_active
+
+        if not self.is_sampled(session_key):
+            return
+        if activity_buffer.is_enabled():
+            # Activity rows are queued instead of being inserted on the
+            # request thread
+            activity_buffer.add(user_activity, ua_flags)
+        else:
+            user_activity.save()
+            UserActivityFlag.objects.bulk_create(ua_flags)
+
+    def record_views(self, flag_views: list) -> None:
+        # The routed FlagUrl is shared by the process, so its counters are
+        # only ever changed in the database
+        for _, flag_url, arm in flag_views:
+            flag_url.record_view(arm)
+
+    def record_conversion(self, flag, flag_url, source_arm) -> bool:
+        """
+        Counts a conversion for the arm of the flag the user saw on the source
+        URL and returns whether one was counted
+        """
+        if DEBUG:
+            print(
+                f"User reached target URL {flag_url.target_url}\nSource arm: {source_arm}"
+            )
+        if source_arm is None:
+            # The user never saw the flag on the source URL
+            return False
+        flag_url.record_conversion(source_arm)
+
+        # Update bandit stats unless a management command or worker runs
+        # the significance tests instead
+        if getattr(settings, "BANDITS_TEST_ARMS_IN_REQUEST", True):
+            bandit_model_instance = flag.get_active_bandit()
+            if bandit_model_instance:
+                bandit_model_instance.maybe_test_arms()
+        return True
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_bandits", "0005_banditflag_ignore_for_authenticated_users"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="banditflag",
+            name="arm_stats_max_age",
+            field=models.FloatField(
+                blank=True,
+                help_text="Seconds the bandit may use cached views and conversions before reloading them. Leave empty to use BANDITS_ARM_STATS_MAX_AGE.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_bandits", "0006_banditflag_arm_stats_max_age"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="epsilondecaymodel",
+            name="significance_test",
+            field=models.CharField(
+                choices=[
+                    ("t", "Student's t-test"),
+                    ("welch", "Welch's t-test"),
+                    ("z", "Two-proportion z-test"),
+                    ("chi2", "Chi-squared test"),
+                    ("fisher", "Fisher's exact test"),
+                ],
+                default="t",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="epsilongreedymodel",
+            name="significance_test",
+            field=models.CharField(
+                choices=[
+                    ("t", "Student's t-test"),
+                    ("welch", "Welch's t-test"),
+                    ("z", "Two-proportion z-test"),
+                    ("chi2", "Chi-squared test"),
+                    ("fisher", "Fisher's exact test"),
+                ],
+                default="t",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="ucb1model",
+            name="significance_test",
+            field=models.CharField(
+                choices=[
+                    ("t", "Student's t-test"),
+                    ("welch", "Welch's t-test"),
+                    ("z", "Two-proportion z-test"),
+                    ("chi2", "Chi-squared test"),
+                    ("fisher", "Fisher's exact test"),
+                ],
+                default="t",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_bandits", "0007_bandit_significance_test"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="epsilondecaymodel",
+            name="last_tested_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="epsilondecaymodel",
+            name="last_tested_conversions",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="epsilondecaymodel",
+            name="last_tested_views",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="epsilongreedymodel",
+            name="last_tested_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="epsilongreedymodel",
+            name="last_tested_conversions",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="epsilongreedymodel",
+            name="last_tested_views",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="ucb1model",
+            name="last_tested_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="ucb1model",
+            name="last_tested_conversions",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="ucb1model",
+            name="last_tested_views",
+            field=models.IntegerField(default=0),
+        ),
+    ]
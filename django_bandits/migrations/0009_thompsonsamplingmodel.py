@@ -0,0 +1,86 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_bandits", "0008_bandit_last_tested"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="bandit",
+            name="name",
+            field=models.CharField(
+                choices=[
+                    ("EG", "Epsilon Greedy"),
+                    ("ED", "Epsilon Decay"),
+                    ("UCB1", "Upper Confidence Bound"),
+                    ("TS", "Thompson Sampling"),
+                ],
+                default="EG",
+                max_length=200,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ThompsonSamplingModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("is_active", models.BooleanField(default=False)),
+                ("significance_level", models.FloatField(default=0.05)),
+                (
+                    "significance_test",
+                    models.CharField(
+                        choices=[
+                            ("t", "Student's t-test"),
+                            ("welch", "Welch's t-test"),
+                            ("z", "Two-proportion z-test"),
+                            ("chi2", "Chi-squared test"),
+                            ("fisher", "Fisher's exact test"),
+                        ],
+                        default="t",
+                        max_length=10,
+                    ),
+                ),
+                ("min_views", models.IntegerField(default=100)),
+                ("winning_arm", models.IntegerField(blank=True, null=True)),
+                ("last_tested_views", models.IntegerField(default=0)),
+                ("last_tested_conversions", models.IntegerField(default=0)),
+                ("last_tested_at", models.DateTimeField(blank=True, null=True)),
+                ("alpha_prior", models.FloatField(default=1.0)),
+                ("beta_prior", models.FloatField(default=1.0)),
+                (
+                    "flag",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="%(class)s_set",
+                        to=settings.WAFFLE_FLAG_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="thompsonsamplingmodel",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_active", True)),
+                fields=("flag", "is_active"),
+                name="unique_active_bandit_thompsonsamplingmodel",
+            ),
+        ),
+    ]
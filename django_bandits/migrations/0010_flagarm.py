@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:19
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_bandits", "0009_thompsonsamplingmodel"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="banditflag",
+            name="number_of_arms",
+            field=models.PositiveSmallIntegerField(
+                default=2,
+                help_text="Number of variants the bandit chooses between. Flags with more than two arms count views and conversions per arm and are read with flag_arm().",
+                validators=[django.core.validators.MinValueValidator(2)],
+            ),
+        ),
+        migrations.AddField(
+            model_name="useractivityflag",
+            name="arm",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="FlagArm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.PositiveSmallIntegerField()),
+                ("name", models.CharField(blank=True, max_length=100)),
+                ("views", models.IntegerField(default=0)),
+                ("conversions", models.IntegerField(default=0)),
+                (
+                    "flag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="arms",
+                        to=settings.WAFFLE_FLAG_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["flag", "index"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="flagarm",
+            constraint=models.UniqueConstraint(
+                fields=("flag", "index"), name="unique_flag_arm_index"
+            ),
+        ),
+    ]
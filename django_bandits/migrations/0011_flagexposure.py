@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_bandits", "0010_flagarm"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FlagExposure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("session_key", models.CharField(max_length=40)),
+                ("arm", models.PositiveSmallIntegerField()),
+                ("timestamp", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="useractivity",
+            index=models.Index(
+                fields=["session_key", "url", "timestamp"],
+                name="useractivity_session_url_ts",
+            ),
+        ),
+        migrations.AddField(
+            model_name="flagexposure",
+            name="flag",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.WAFFLE_FLAG_MODEL,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="flagexposure",
+            constraint=models.UniqueConstraint(
+                fields=("session_key", "flag"), name="unique_session_flag_exposure"
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_bandits", "0011_flagexposure"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FlagCounterShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("arm", models.PositiveSmallIntegerField()),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("views", models.IntegerField(default=0)),
+                ("conversions", models.IntegerField(default=0)),
+                (
+                    "flag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="counter_shards",
+                        to=settings.WAFFLE_FLAG_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="flagcountershard",
+            constraint=models.UniqueConstraint(
+                fields=("flag", "arm", "shard"), name="unique_flag_arm_shard"
+            ),
+        ),
+    ]
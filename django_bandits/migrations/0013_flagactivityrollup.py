@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_bandits", "0012_flagcountershard"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FlagActivityRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("arm", models.PositiveSmallIntegerField()),
+                ("views", models.IntegerField(default=0)),
+                ("conversions", models.IntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["flag", "date", "arm"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="useractivity",
+            index=models.Index(fields=["timestamp"], name="useractivity_timestamp"),
+        ),
+        migrations.AddIndex(
+            model_name="useractivityflag",
+            index=models.Index(
+                fields=["flag", "timestamp"], name="useractivityflag_flag_ts"
+            ),
+        ),
+        migrations.AddField(
+            model_name="flagactivityrollup",
+            name="flag",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="activity_rollups",
+                to=settings.WAFFLE_FLAG_MODEL,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="flagactivityrollup",
+            constraint=models.UniqueConstraint(
+                fields=("flag", "date", "arm"), name="unique_flag_rollup_date_arm"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_bandits", "0013_flagactivityrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flagexposure",
+            name="converted",
+            field=models.BooleanField(default=False),
+        ),
+    ]
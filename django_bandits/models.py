@@ -1,5 +1,6 @@
+import django
 import numpy as np
-from scipy.stats import ttest_ind, norm
+from scipy.stats import norm
 from django.db import models
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -7,10 +8,19 @@ from django.contrib.auth import models as auth_models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from django.utils import timezone
 from abc import ABC, abstractmethod
 
 from waffle.models import Flag  # as WaffleFlag
 from waffle.models import AbstractUserFlag
+from waffle.utils import get_setting
+
+from . import assignments
+from .memo import get_request_decisions
+from .policies import decision_tables, explore_exploit_table
+from .rng import uniforms
+from .significance import get_p_value
 
 DEBUG = settings.DEBUG if hasattr(settings, "DEBUG") else False
 
@@ -18,8 +28,45 @@ BANDIT_ALGORITHMS = [
     ("EG", "Epsilon Greedy"),
     ("ED", "Epsilon Decay"),
     ("UCB1", "Upper Confidence Bound"),
+    ("TS", "Thompson Sampling"),
+]
+
+SIGNIFICANCE_TESTS = [
+    ("t", "Student's t-test"),
+    ("welch", "Welch's t-test"),
+    ("z", "Two-proportion z-test"),
+    ("chi2", "Chi-squared test"),
+    ("fisher", "Fisher's exact test"),
 ]
 
+# Bandit fields written by every significance test
+TESTED_FIELDS = ["last_tested_views", "last_tested_conversions", "last_tested_at"]
+
+# Concrete bandit models, in the order they are checked for an active bandit
+BANDIT_MODELS = []
+
+
+def register_bandit_model(model):
+    """Class decorator that makes a bandit model available to BanditFlag"""
+    if model not in BANDIT_MODELS:
+        BANDIT_MODELS.append(model)
+    return model
+
+
+def increment_counters(model, amounts: dict, **lookup) -> None:
+    """
+    Adds amounts to the counter fields of the model's row matching lookup,
+    creating the row on first use
+    """
+    rows = model.objects.filter(**lookup)
+    updates = {
+        field_name: models.F(field_name) + amount
+        for field_name, amount in amounts.items()
+    }
+    if not rows.update(**updates):
+        model.objects.get_or_create(**lookup)
+        rows.update(**updates)
+
 
 class BanditFlag(AbstractUserFlag):
     # TODO: Are content_type and object_id necessary?
@@ -32,6 +79,20 @@ class BanditFlag(AbstractUserFlag):
         default=False,
         help_text="If checked, the flag will not be active for authenticated users and no stats will be recorded.",
     )
+    arm_stats_max_age = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Seconds the bandit may use cached views and conversions before reloading them. Leave empty to use BANDITS_ARM_STATS_MAX_AGE.",
+    )
+    number_of_arms = models.PositiveSmallIntegerField(
+        default=2,
+        validators=[MinValueValidator(2)],
+        help_text="Number of variants the bandit chooses between. Flags with more than two arms count views and conversions per arm and are read with flag_arm().",
+    )
+
+    @property
+    def is_multi_armed(self) -> bool:
+        return self.number_of_arms > 2
 
     def is_active_for_user(self, user):
         User = get_user_model()
@@ -44,16 +105,7 @@ class BanditFlag(AbstractUserFlag):
                 user = auth_models.AnonymousUser()
 
         # Try to retrieve the active bandit model
-        bandit_model_instance = None
-        for related_set in [
-            self.epsilongreedymodel_set,
-            self.epsilondecaymodel_set,
-            self.ucb1model_set,
-        ]:  # Add more sets as needed
-            bandit_model_instance = related_set.filter(is_active=True).first()
-            if bandit_model_instance:
-                break
-
+        bandit_model_instance = self.get_active_bandit()
         if bandit_model_instance is None:
             return super().is_active_for_user(user)
 
@@ -61,17 +113,161 @@ class BanditFlag(AbstractUserFlag):
         active = bandit_model_instance.pull()
         return active
 
+    def is_active(self, request, *args, **kwargs):
+        decisions = get_request_decisions(request)
+        if decisions is None or not self.pk:
+            return super().is_active(request, *args, **kwargs)
+        if self.name not in decisions.active:
+            decisions.active[self.name] = super().is_active(request, *args, **kwargs)
+        return decisions.active[self.name]
+
+    def get_waffle_override(self, request):
+        """
+        Returns the decision Waffle makes before it asks the bandit, from
+        WAFFLE_OVERRIDE, the flag's everyone setting, testing cookies or
+        languages, or None if the bandit decides
+        """
+        if get_setting("OVERRIDE") and self.name in request.GET:
+            return request.GET[self.name] == "1"
+        if self.everyone is not None:
+            return self.everyone
+        if self.testing:
+            # Same as Waffle's testing mode
+            tc = get_setting("TEST_COOKIE") % self.name
+            th = tc.replace("_", "-")
+            on = None
+            if tc in request.GET:
+                on = request.GET[tc] == "1"
+            elif th in request.headers:
+                on = request.headers[th] == "1"
+            if on is not None:
+                if not hasattr(request, "waffle_tests"):
+                    request.waffle_tests = {}
+                request.waffle_tests[self.name] = on
+                return on
+            if tc in request.COOKIES:
+                return request.COOKIES[tc] == "True"
+        return self._is_active_for_language(request)
+
+    def _is_active_for_user(self, request):
+        bandit_model_instance = self.get_active_bandit(request)
+        if bandit_model_instance is None:
+            return super()._is_active_for_user(request)
+        return bool(self.pull_sticky_arm(request, bandit_model_instance))
+
+    def choose_arm(self, request) -> int:
+        """
+        Returns the index of the variant to show, 0 being the control.
+
+        Flags without an active bandit fall back to Waffle's on/off rules, and
+        Waffle's overrides such as the everyone setting come before the bandit.
+        """
+        bandit_model_instance = self.get_active_bandit(request)
+        if bandit_model_instance is None:
+            return int(bool(self.is_active(request)))
+        override = self.get_waffle_override(request)
+        if override is not None:
+            return int(override)
+        return self.pull_sticky_arm(request, bandit_model_instance)
+
+    def pull_sticky_arm(self, request, bandit_model_instance) -> int:
+        """
+        Returns the arm already assigned to the visitor, pulling the bandit
+        only for new visitors. A winning arm overrides earlier assignments.
+        Within a request the first arm is returned again.
+        """
+        if bandit_model_instance.winning_arm is not None:
+            return bandit_model_instance.winning_arm
+        decisions = get_request_decisions(request)
+        if decisions is not None and self.name in decisions.arms:
+            return decisions.arms[self.name]
+        arm = assignments.get_assigned_arm(request, self)
+        if arm is None or arm >= self.number_of_arms:
+            arm = bandit_model_instance.pull_arm()
+            assignments.assign_arm(request, self, arm)
+        if decisions is not None:
+            decisions.arms[self.name] = arm
+        return arm
+
+    def get_arm_counts(self, arm_rows=None) -> tuple:
+        """
+        Returns arrays of the views and conversions of each arm, including
+        counts the counter backend hasn't written to FlagUrl or FlagArm yet.
+        Flags with more than two arms read their FlagArm rows unless given
+        their (index, views, conversions) as arm_rows.
+        """
+        from .counters import get_counter_backend
+
+        if self.is_multi_armed:
+            counts = np.zeros((2, self.number_of_arms), dtype=np.int64)
+            if arm_rows is None:
+                arm_rows = self.arms.filter(index__lt=self.number_of_arms).values_list(
+                    "index", "views", "conversions"
+                )
+            for index, arm_views, arm_conversions in arm_rows:
+                if index < self.number_of_arms:
+                    counts[:, index] = arm_views, arm_conversions
+        else:
+            flag_url = self.flagurl
+            counts = np.array(
+                [
+                    [flag_url.inactive_flag_views, flag_url.active_flag_views],
+                    [
+                        flag_url.inactive_flag_conversions,
+                        flag_url.active_flag_conversions,
+                    ],
+                ],
+                dtype=np.int64,
+            )
+        counts += get_counter_backend().get_pending(self.pk, self.number_of_arms)
+        return counts[0], counts[1]
+
+    def add_arm_counts(self, counts: dict) -> None:
+        """
+        Adds {(counter, arm): amount} to the stored counts with a single UPDATE
+        per row, where counter is "views" or "conversions"
+        """
+        if self.is_multi_armed:
+            arm_amounts = {}
+            for (counter, arm), amount in counts.items():
+                arm_amounts.setdefault(arm, {})[counter] = amount
+            for arm, amounts in arm_amounts.items():
+                FlagArm.increment(self.pk, arm, **amounts)
+            return
+        updates = {}
+        for (counter, arm), amount in counts.items():
+            field_name = f"{'active' if arm else 'inactive'}_flag_{counter}"
+            updates[field_name] = models.F(field_name) + amount
+        if updates:
+            FlagUrl.objects.filter(flag_id=self.pk).update(**updates)
+
+    def get_active_bandit(self, request=None):
+        """
+        Returns the active bandit of any registered model for this flag, with
+        its arm statistics loaded, or None. Given a request, the bandit is
+        looked up once for the whole request.
+        """
+        from .cache import active_bandits
+
+        decisions = get_request_decisions(request)
+        if decisions is not None:
+            return decisions.get_bandit(self)
+        return active_bandits.lookup(self.pk)
+
 
 class URLSanitizationMixin:
     url_field_names = ["url", "source_url", "target_url"]
 
     def save(self, *args, **kwargs):
+        self.sanitize_urls()
+        super().save(*args, **kwargs)
+
+    def sanitize_urls(self):
         for field_name in self.url_field_names:
             url = getattr(self, field_name, None)
             if url is None:
                 continue
             setattr(self, field_name, self.ensure_trailing_slash(url))
-        super().save(*args, **kwargs)
 
     @staticmethod
     def ensure_trailing_slash(url):
@@ -94,6 +290,75 @@ class FlagUrl(URLSanitizationMixin, models.Model):
     active_flag_conversions = models.IntegerField(default=0)
     inactive_flag_conversions = models.IntegerField(default=0)
 
+    def record_view(self, arm) -> None:
+        """
+        Counts a view of the given arm, where True/1 is the active and False/0
+        the inactive version of a two-armed flag
+        """
+        from .counters import VIEWS, get_counter_backend
+        from .stats import arm_stats
+
+        arm = int(arm)
+        get_counter_backend().increment(self.flag, arm, VIEWS)
+        arm_stats.increment(self.flag_id, arm_stats.VIEWS, arm)
+
+    def record_conversion(self, arm) -> None:
+        """Counts a conversion for the given arm, as with record_view()"""
+        from .counters import CONVERSIONS, get_counter_backend
+        from .stats import arm_stats
+
+        arm = int(arm)
+        get_counter_backend().increment(self.flag, arm, CONVERSIONS)
+        arm_stats.increment(self.flag_id, arm_stats.CONVERSIONS, arm)
+
+
+class FlagArm(models.Model):
+    """Views and conversions of one variant of a flag with more than two arms"""
+
+    flag = models.ForeignKey(BanditFlag, related_name="arms", on_delete=models.CASCADE)
+    index = models.PositiveSmallIntegerField()
+    name = models.CharField(max_length=100, blank=True)
+    views = models.IntegerField(default=0)
+    conversions = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["flag", "index"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["flag", "index"], name="unique_flag_arm_index"
+            )
+        ]
+
+    def __str__(self):
+        return self.name or f"Arm {self.index}"
+
+    @classmethod
+    def increment(cls, flag_id: int, index: int, **amounts) -> None:
+        """Adds to counters of the arm, creating its row on first use"""
+        increment_counters(cls, amounts, flag_id=flag_id, index=index)
+
+
+class FlagCounterShard(models.Model):
+    """
+    One of several rows sharing the counts of an arm, so concurrent increments
+    don't all wait on the same row lock. Used by ShardedCounterBackend.
+    """
+
+    flag = models.ForeignKey(
+        BanditFlag, related_name="counter_shards", on_delete=models.CASCADE
+    )
+    arm = models.PositiveSmallIntegerField()
+    shard = models.PositiveSmallIntegerField()
+    views = models.IntegerField(default=0)
+    conversions = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["flag", "arm", "shard"], name="unique_flag_arm_shard"
+            )
+        ]
+
 
 class UserActivity(URLSanitizationMixin, models.Model):
     user = models.ForeignKey(
@@ -106,12 +371,164 @@ class UserActivity(URLSanitizationMixin, models.Model):
     flags = models.ManyToManyField(BanditFlag, blank=True)
     is_staff = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["session_key", "url", "timestamp"],
+                name="useractivity_session_url_ts",
+            ),
+            # Lets old activity be pruned without scanning the table
+            models.Index(fields=["timestamp"], name="useractivity_timestamp"),
+        ]
+
 
 class UserActivityFlag(models.Model):
     user_activity = models.ForeignKey(UserActivity, on_delete=models.CASCADE)
     flag = models.ForeignKey(BanditFlag, on_delete=models.CASCADE)
     timestamp = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=False, null=True)
+    # Variant shown by a flag with more than two arms
+    arm = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["flag", "timestamp"], name="useractivityflag_flag_ts")
+        ]
+
+    @staticmethod
+    def arm_of(is_active, arm) -> int:
+        """Returns the arm of a view from its is_active and arm fields"""
+        return arm if arm is not None else int(bool(is_active))
+
+    def get_arm(self) -> int:
+        return self.arm_of(self.is_active, self.arm)
+
+
+class FlagExposure(models.Model):
+    """
+    Latest arm of a flag shown to a session, so conversions are attributed
+    with a single indexed lookup instead of scanning the session's activity.
+    converted marks that the current assignment already counted its one
+    conversion.
+    """
+
+    session_key = models.CharField(max_length=40)
+    flag = models.ForeignKey(BanditFlag, on_delete=models.CASCADE)
+    arm = models.PositiveSmallIntegerField()
+    timestamp = models.DateTimeField(auto_now=True)
+    converted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session_key", "flag"], name="unique_session_flag_exposure"
+            )
+        ]
+
+    upsert_options = {
+        "update_conflicts": True,
+        "unique_fields": ["session_key", "flag"],
+        "update_fields": ["arm", "timestamp"],
+    }
+
+    @classmethod
+    def _latest(cls, exposures) -> list:
+        """Returns unsaved rows of the last arm of each (session_key, flag) pair"""
+        latest = {}
+        for session_key, ua_flag in exposures:
+            latest[(session_key, ua_flag.flag_id)] = ua_flag.get_arm()
+        return [
+            cls(session_key=session_key, flag_id=flag_id, arm=arm)
+            for (session_key, flag_id), arm in latest.items()
+        ]
+
+    @classmethod
+    def record(cls, exposures, new_assignments=()) -> None:
+        """
+        Upserts the arms of (session_key, UserActivityFlag) pairs. Exposures
+        of the flag ids in new_assignments start a new assignment, which may
+        convert again.
+        """
+        rows = cls._latest(exposures)
+        if not rows:
+            return
+        new_rows = [row for row in rows if row.flag_id in new_assignments]
+        repeat_rows = [row for row in rows if row.flag_id not in new_assignments]
+        if django.VERSION < (4, 1):
+            # bulk_create() can't upsert before Django 4.1
+            for row in rows:
+                defaults = {"arm": row.arm}
+                if row.flag_id in new_assignments:
+                    defaults["converted"] = False
+                cls.objects.update_or_create(
+                    session_key=row.session_key,
+                    flag_id=row.flag_id,
+                    defaults=defaults,
+                )
+            return
+        if new_rows:
+            options = dict(cls.upsert_options)
+            options["update_fields"] = options["update_fields"] + ["converted"]
+            cls.objects.bulk_create(new_rows, **options)
+        if repeat_rows:
+            cls.objects.bulk_create(repeat_rows, **cls.upsert_options)
+
+    @classmethod
+    def get_arm(cls, session_key: str, flag_id: int) -> int:
+        """Returns the latest arm of the flag shown to the session, or None"""
+        return (
+            cls.objects.filter(session_key=session_key, flag_id=flag_id)
+            .values_list("arm", flat=True)
+            .first()
+        )
+
+    @classmethod
+    def claim_conversion(cls, session_key: str, flag_id: int) -> int:
+        """
+        Marks the session's assignment of the flag as converted and returns
+        its arm, or None if it already converted or the flag was never shown
+        """
+        exposure = (
+            cls.objects.filter(session_key=session_key, flag_id=flag_id)
+            .values_list("pk", "arm", "converted")
+            .first()
+        )
+        if exposure is None or exposure[2]:
+            return None
+        # Only one of concurrent requests gets to update the row
+        if not cls.objects.filter(pk=exposure[0], converted=False).update(
+            converted=True
+        ):
+            return None
+        return exposure[1]
+
+
+class FlagActivityRollup(models.Model):
+    """
+    Daily views and conversions of an arm of a flag, counted from UserActivity
+    rows before they are pruned
+    """
+
+    flag = models.ForeignKey(
+        BanditFlag, related_name="activity_rollups", on_delete=models.CASCADE
+    )
+    date = models.DateField()
+    arm = models.PositiveSmallIntegerField()
+    views = models.IntegerField(default=0)
+    conversions = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["flag", "date", "arm"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["flag", "date", "arm"], name="unique_flag_rollup_date_arm"
+            )
+        ]
+
+    @classmethod
+    def increment(cls, flag_id: int, date, arm: int, **amounts) -> None:
+        """Adds to the counters of the day, creating its row on first use"""
+        increment_counters(cls, amounts, flag_id=flag_id, date=date, arm=arm)
 
 
 class Bandit(models.Model):
@@ -155,10 +572,20 @@ class AbstractBanditModel(models.Model):
     )
     is_active = models.BooleanField(default=False)
     significance_level = models.FloatField(default=0.05)
+    significance_test = models.CharField(
+        max_length=10, choices=SIGNIFICANCE_TESTS, default="t"
+    )
     min_views = models.IntegerField(default=100)
     winning_arm = models.IntegerField(null=True, blank=True)
+    # Counts seen by the last significance test, to skip repeated tests
+    last_tested_views = models.IntegerField(default=0)
+    last_tested_conversions = models.IntegerField(default=0)
+    last_tested_at = models.DateTimeField(null=True, blank=True)
 
-    k = 2  # Number of options
+    _arm_stats = None  # (views, conversions) loaded by load_arm_stats()
+    # Fields pull_arms() decides with, so bandits that share them can pull
+    # together
+    policy_fields = []
 
     class Meta:
         abstract = True
@@ -173,11 +600,64 @@ class AbstractBanditModel(models.Model):
     # def __str__(self):
     #   return self.display_bounds()
 
+    @property
+    def k(self) -> int:
+        """Number of options"""
+        return self.flag.number_of_arms if self.flag_id else 2
+
     @abstractmethod
-    def pull(self):
-        """Determines whether or not the flag is active 0 = False, 1 = True"""
+    def pull_arm(self) -> int:
+        """Returns the index of the option to show, 0 being the control"""
         raise NotImplementedError("Pull method not implemented.")
 
+    def pull(self) -> bool:
+        """Determines whether or not the flag is active 0 = False, 1 = True"""
+        return bool(self.pull_arm())
+
+    def pull_arms(
+        self, views: np.ndarray, conversions: np.ndarray, rng: np.random.Generator
+    ) -> np.ndarray:
+        """
+        Vectorized pull_arm() for simulations. Returns the arm each row of the
+        (runs, arms) count arrays pulls, ignoring winning_arm.
+        """
+        raise NotImplementedError("Vectorized pull not implemented.")
+
+    def get_decision_table(self) -> tuple:
+        """
+        Returns (edges, arms), where a uniform draw below edges[i] and above
+        the previous edge shows arms[i]. Compiled by the models whose pulls
+        only depend on the counts, see django_bandits.policies.
+        """
+        raise NotImplementedError("Decision table not implemented.")
+
+    def get_arm_probabilities(self) -> np.ndarray:
+        """Returns the probability of showing each option on the next pull"""
+        edges, arms = decision_tables.get(self)
+        return np.bincount(
+            arms,
+            weights=np.diff([0.0] + edges),
+            minlength=len(self.get_number_of_views()),
+        )
+
+    @staticmethod
+    def break_ties(rewards: np.ndarray) -> int:
+        """Returns the best option, picking randomly between tied options"""
+        best = np.flatnonzero(rewards == rewards.max())
+        if len(best) == 1:
+            return int(best[0])
+        return int(best[int(uniforms.random() * len(best))])
+
+    @staticmethod
+    def break_ties_rows(rewards: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Returns the best option of each row, picking randomly between ties"""
+        is_best = rewards == rewards.max(axis=1, keepdims=True)
+        return np.argmax(rng.random(rewards.shape) * is_best, axis=1)
+
+    @staticmethod
+    def get_rewards_rows(views: np.ndarray, conversions: np.ndarray) -> np.ndarray:
+        return conversions / np.maximum(views, 1)
+
     def get_rewards(self):
         """Returns the rewards for each option"""
         rewards = self.get_number_of_conversions() / np.maximum(
@@ -187,15 +667,25 @@ class AbstractBanditModel(models.Model):
 
     def get_number_of_views(self):
         """Returns the number of views for each option"""
-        flag_url = self.flag.flagurl
-        return np.array([flag_url.inactive_flag_views, flag_url.active_flag_views])
+        if self._arm_stats is not None:
+            return self._arm_stats[0]
+        return self.flag.get_arm_counts()[0]
 
     def get_number_of_conversions(self):
         """Returns the number of conversions for each option"""
-        flag_url = self.flag.flagurl
-        return np.array(
-            [flag_url.inactive_flag_conversions, flag_url.active_flag_conversions]
-        )
+        if self._arm_stats is not None:
+            return self._arm_stats[1]
+        return self.flag.get_arm_counts()[1]
+
+    def load_arm_stats(self):
+        """
+        Loads views and conversions for each option from the process-wide arm
+        statistics store and uses them for every following call on this
+        instance.
+        """
+        from .stats import arm_stats
+
+        self._arm_stats = arm_stats.get(self.flag_id, self.flag.arm_stats_max_age)
 
     def save(self, *args, **kwargs):
         """Ensure only one bandit is active at a time."""
@@ -209,23 +699,73 @@ class AbstractBanditModel(models.Model):
 
     def test_arms(self):
         """
-        Performs a two-sample t-test on the rewards for each arm
+        Tests the rewards of each arm for a significant difference using the
+        bandit's significance test
         """
         n_views = self.get_number_of_views()
         if n_views.sum() < self.min_views:
             return None
 
-        # Converts outcomes to list of binary outcomes for use with ttest_ind
         n_convs = self.get_number_of_conversions()
-        inactive_results = [1] * n_convs[0] + [0] * (n_views[0] - n_convs[0])
-        active_results = [1] * n_convs[1] + [0] * (n_views[1] - n_convs[1])
-
-        t, p_value = ttest_ind(inactive_results, active_results)
+        # With more than two arms the leader is tested against the runner-up
+        runner_up, leader = np.argsort(self.get_rewards(), kind="stable")[-2:]
+        p_value = get_p_value(
+            self.significance_test,
+            n_views[[runner_up, leader]],
+            n_convs[[runner_up, leader]],
+        )
+        self.last_tested_views = int(n_views.sum())
+        self.last_tested_conversions = int(n_convs.sum())
+        self.last_tested_at = timezone.now()
         if p_value < self.significance_level:
-            self.winning_arm = (
-                0 if np.mean(inactive_results) > np.mean(active_results) else 1
-            )
-            self.save()
+            self.winning_arm = int(leader)
+            # The instance may be a cached copy, so only the fields set here
+            # are written back
+            self.save(update_fields=["winning_arm", *TESTED_FIELDS])
+        else:
+            self.save(update_fields=TESTED_FIELDS)
+
+    def should_test_arms(self) -> bool:
+        """
+        Returns whether the arms are due for a significance test.
+
+        Tests are skipped once a winner is found or when the counts haven't
+        changed, and are throttled to every BANDITS_TEST_ARMS_EVERY_CONVERSIONS
+        conversions and BANDITS_TEST_ARMS_INTERVAL seconds. Counts lower than
+        the last tested ones were reset and start the throttling over.
+        """
+        if self.winning_arm is not None:
+            return False
+        n_views = self.get_number_of_views().sum()
+        n_convs = self.get_number_of_conversions().sum()
+        if n_views < self.min_views:
+            return False
+        if n_views < self.last_tested_views or n_convs < self.last_tested_conversions:
+            # The counts were reset, so the last test no longer applies
+            self.last_tested_views = 0
+            self.last_tested_conversions = 0
+            self.last_tested_at = None
+        if (
+            n_views == self.last_tested_views
+            and n_convs == self.last_tested_conversions
+        ):
+            return False
+        every_conversions = getattr(settings, "BANDITS_TEST_ARMS_EVERY_CONVERSIONS", 1)
+        if n_convs - self.last_tested_conversions < every_conversions:
+            return False
+        interval = getattr(settings, "BANDITS_TEST_ARMS_INTERVAL", 0)
+        if interval and self.last_tested_at is not None:
+            elapsed = (timezone.now() - self.last_tested_at).total_seconds()
+            if elapsed < interval:
+                return False
+        return True
+
+    def maybe_test_arms(self) -> bool:
+        """Runs test_arms() if it is due and returns whether it ran"""
+        if not self.should_test_arms():
+            return False
+        self.test_arms()
+        return True
 
     def get_confidence_intervals(self, arm: int) -> tuple:
         """Gets upper and lower bounds for the given arm"""
@@ -246,38 +786,49 @@ class AbstractBanditModel(models.Model):
         return f"{low:.2f} - {up:.2f}"
 
     def display_confidence_intervals(self):
+        if self.k > 2:
+            return "\n".join(
+                "Arm {}:\t{:.2f} - {:.2f}".format(
+                    arm, *self.get_confidence_intervals(arm)
+                )
+                for arm in range(self.k)
+            )
         inactive = self.get_inactive_flag_confidence_intervals()
         active = self.get_active_flag_confidence_intervals()
         return f"Active Flag:\t{active}\nInactive Flag:\t{inactive}"
 
     def display_conversion_rate(self):
         rewards = self.get_rewards()
+        if len(rewards) > 2:
+            return "\n".join(
+                f"Arm {arm}:\t{reward:.2%}" for arm, reward in enumerate(rewards)
+            )
         return f"Active Flag:\t{rewards[1]:.2%}\nInactive Flag:\t{rewards[0]:.2%}"
 
 
+@register_bandit_model
 class EpsilonGreedyModel(AbstractBanditModel):
     epsilon = models.FloatField(default=0.1)
     prob_flag = models.FloatField(default=0.5)
 
-    def pull(self) -> bool:
+    policy_fields = ["epsilon"]
+
+    def pull_arm(self) -> int:
         if self.winning_arm is not None:
-            return bool(self.winning_arm)
-        p = np.random.random()
-        if p < self.epsilon:
-            if DEBUG:
-                print("Making random choice")
-            flag = np.random.randint(0, self.k)
-        else:
-            rewards = self.get_rewards()
-            if DEBUG:
-                print("Making greedy choice")
-                print(f"Rewards: {rewards}")
-            if rewards[0] == rewards[1]:
-                flag = np.random.randint(0, self.k)
-            else:
-                flag = np.argmax(rewards)
+            return self.winning_arm
+        return decision_tables.pull(self)
 
-        return bool(flag)
+    def get_decision_table(self) -> tuple:
+        rewards = self.get_rewards()
+        if DEBUG:
+            print(f"Rewards: {rewards}")
+        return explore_exploit_table(rewards, self.epsilon)
+
+    def pull_arms(self, views, conversions, rng) -> np.ndarray:
+        n_runs, k = views.shape
+        arms = self.break_ties_rows(self.get_rewards_rows(views, conversions), rng)
+        explore = rng.random(n_runs) < self.epsilon
+        return np.where(explore, rng.integers(0, k, n_runs), arms)
 
     def update(self):
         """
@@ -285,48 +836,91 @@ class EpsilonGreedyModel(AbstractBanditModel):
 
         TODO: Move this to be calculated on admin page
         """
-        rewards = self.get_rewards()
-        if rewards[0] == rewards[1]:
-            self.prob_flag = 0.5
-        else:
-            flag = bool(np.argmax(rewards))
-            if flag:
-                self.prob_flag = 1 - self.epsilon / 2
-            else:
-                self.prob_flag = self.epsilon / 2
+        # Any arm but the control shows the flag
+        self.prob_flag = 1 - float(self.get_arm_probabilities()[0])
 
 
+@register_bandit_model
 class EpsilonDecayModel(AbstractBanditModel):
-    def pull(self) -> bool:
+    def pull_arm(self) -> int:
         if self.winning_arm is not None:
-            return bool(self.winning_arm)
-        p = np.random.random()
-        if p < (1 / (1 + self.get_number_of_views().sum() / self.k)):
-            flag = np.random.randint(0, self.k)
-        else:
-            rewards = self.get_rewards()
-            if rewards[0] == rewards[1]:
-                flag = np.random.randint(0, self.k)
-            else:
-                flag = np.argmax(rewards)
+            return self.winning_arm
+        return decision_tables.pull(self)
 
-        return bool(flag)
+    def get_decision_table(self) -> tuple:
+        n_views = self.get_number_of_views()
+        k = len(n_views)
+        return explore_exploit_table(self.get_rewards(), 1 / (1 + n_views.sum() / k))
+
+    def pull_arms(self, views, conversions, rng) -> np.ndarray:
+        n_runs, k = views.shape
+        arms = self.break_ties_rows(self.get_rewards_rows(views, conversions), rng)
+        explore = rng.random(n_runs) < 1 / (1 + views.sum(axis=1) / k)
+        return np.where(explore, rng.integers(0, k, n_runs), arms)
 
 
+@register_bandit_model
 class UCB1Model(AbstractBanditModel):
     c = models.FloatField(default=2.0)
 
-    def pull(self) -> bool:
+    policy_fields = ["c"]
+
+    def pull_arm(self) -> int:
         """
         Pulls the arm with the highest upper confidence bound
         """
         if self.winning_arm is not None:
-            return bool(self.winning_arm)
+            return self.winning_arm
+        return decision_tables.pull(self)
+
+    def get_decision_table(self) -> tuple:
         rewards = self.get_rewards()
         n_views = self.get_number_of_views()
-        flag = np.argmax(
+        arm = np.argmax(
             rewards
             + self.c
             * np.sqrt(np.log(np.max([n_views.sum(), 1])) / np.maximum(n_views, 1))
         )
-        return bool(flag)
+        # Deterministic, so pulls don't draw at all
+        return [1.0], [int(arm)]
+
+    def pull_arms(self, views, conversions, rng) -> np.ndarray:
+        total = np.maximum(views.sum(axis=1, keepdims=True), 1)
+        bounds = self.get_rewards_rows(views, conversions) + self.c * np.sqrt(
+            np.log(total) / np.maximum(views, 1)
+        )
+        return np.argmax(bounds, axis=1)
+
+
+@register_bandit_model
+class ThompsonSamplingModel(AbstractBanditModel):
+    alpha_prior = models.FloatField(default=1.0)
+    beta_prior = models.FloatField(default=1.0)
+
+    policy_fields = ["alpha_prior", "beta_prior"]
+
+    def get_posterior_parameters(self) -> tuple:
+        """Returns the alpha and beta parameters of each arm's Beta posterior"""
+        n_views = self.get_number_of_views()
+        n_convs = self.get_number_of_conversions()
+        alpha = self.alpha_prior + n_convs
+        beta = self.beta_prior + (n_views - n_convs)
+        return alpha, beta
+
+    def pull_arm(self) -> int:
+        """
+        Pulls the arm whose sampled conversion rate is highest, using a batch
+        of posterior draws shared by every pull in the process
+        """
+        from .sampling import posterior_samples
+
+        if self.winning_arm is not None:
+            return self.winning_arm
+        alpha, beta = self.get_posterior_parameters()
+        key = (type(self), self.pk if self.pk is not None else id(self))
+        return posterior_samples.pop(key, alpha, beta, stream=self.flag_id)
+
+    def pull_arms(self, views, conversions, rng) -> np.ndarray:
+        alpha = self.alpha_prior + conversions
+        beta = self.beta_prior + (views - conversions)
+        return np.argmax(rng.beta(alpha, beta), axis=1)
@@ -0,0 +1,96 @@
+"""
+Precomputed decision tables for bandits whose decisions follow from the counts.
+
+Epsilon greedy and epsilon decay show a random arm with some probability and
+the best arm otherwise, and UCB1 always shows the arm with the highest bound.
+Instead of recomputing rewards, logs and square roots on every pull, these
+models compile their decisions into a table of cumulative probabilities and
+the arm each interval shows. A pull is then one uniform draw and a binary
+search, and a table with a single arm needs no draw at all.
+
+A table is recompiled when the bandit's policy fields change or any view or
+conversion count has changed since it was compiled. UCB1 always shows a single
+arm, so any change of the counts can change its decision. Setting
+``BANDITS_DECISION_TABLE_TOLERANCE`` (relative, default 0) lets epsilon tables
+be reused until a count moves by more than that.
+"""
+import bisect
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .bounds import get_bounds, within_bounds
+from .rng import uniforms
+
+
+class DecisionTableCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # bandit key -> (policy field values, bounds, edges, arms), with the
+        # bounds on the counts the table stays valid for
+        self._tables = {}
+
+    @staticmethod
+    def get_tolerance() -> float:
+        return getattr(settings, "BANDITS_DECISION_TABLE_TOLERANCE", 0)
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+    @staticmethod
+    def _is_stale(table, policy: tuple, counts: list) -> bool:
+        return (
+            table is None or table[0] != policy or not within_bounds(table[1], counts)
+        )
+
+    def get(self, bandit) -> tuple:
+        """Returns the (edges, arms) decision table of the bandit"""
+        key = (type(bandit), bandit.pk if bandit.pk is not None else id(bandit))
+        policy = tuple([getattr(bandit, field) for field in bandit.policy_fields])
+        counts = (
+            np.asarray(bandit.get_number_of_views()).tolist()
+            + np.asarray(bandit.get_number_of_conversions()).tolist()
+        )
+        table = self._tables.get(key)
+        if self._is_stale(table, policy, counts):
+            edges, arms = bandit.get_decision_table()
+            table = (policy, get_bounds(counts, self.get_tolerance()), edges, arms)
+            with self._lock:
+                self._tables[key] = table
+        return table[2], table[3]
+
+    def pull(self, bandit) -> int:
+        """Returns the arm the bandit shows for one uniform draw"""
+        edges, arms = self.get(bandit)
+        if len(arms) == 1:
+            return arms[0]
+        # Rounding can leave the last edge just below 1
+        index = bisect.bisect_right(edges, uniforms.random(bandit.flag_id))
+        return arms[min(index, len(arms) - 1)]
+
+
+def explore_exploit_table(rewards: np.ndarray, epsilon: float) -> tuple:
+    """
+    Returns the decision table of a bandit that shows a random arm with
+    probability epsilon and otherwise one of the best arms. Draws below
+    epsilon explore, in the same order as the random choice they replace.
+    """
+    k = len(rewards)
+    best = np.flatnonzero(rewards == rewards.max()).tolist()
+    epsilon = min(max(float(epsilon), 0.0), 1.0)
+    widths = [epsilon / k] * k + [(1 - epsilon) / len(best)] * len(best)
+    edges = []
+    arms = []
+    edge = 0.0
+    for width, arm in zip(widths, list(range(k)) + best):
+        # Arms that can't be drawn would only slow the search down
+        if width > 0:
+            edge += width
+            edges.append(edge)
+            arms.append(arm)
+    return edges, arms
+
+
+decision_tables = DecisionTableCache()
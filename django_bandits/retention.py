@@ -0,0 +1,246 @@
+"""
+Pruning and rollup of old UserActivity history.
+
+``prune_activity()`` deletes activity older than the retention window in short
+transactions of ``BANDITS_RETENTION_BATCH_SIZE`` rows (default 1000), so no
+lock is held for long. Before a batch is deleted, its flag views and
+conversions are added to the daily ``FlagActivityRollup`` rows of each arm.
+
+Activity is kept for ``BANDITS_ACTIVITY_RETENTION_DAYS`` days (default 90).
+``BANDITS_FLAG_ACTIVITY_RETENTION_DAYS`` maps flag names to a retention of
+their own; ``None`` keeps the activity forever. A visit to a target URL is
+kept as long as the longest retention of the flags converting there. Once
+those visits are gone, the ``FlagExposure`` rows conversions are attributed
+from are deleted too.
+"""
+import collections
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import normalize_url
+from .models import (
+    BanditFlag,
+    FlagActivityRollup,
+    FlagExposure,
+    FlagUrl,
+    UserActivity,
+    UserActivityFlag,
+)
+
+
+def get_retention_days() -> int:
+    return getattr(settings, "BANDITS_ACTIVITY_RETENTION_DAYS", 90)
+
+
+def get_batch_size() -> int:
+    return getattr(settings, "BANDITS_RETENTION_BATCH_SIZE", 1000)
+
+
+def _get_cutoff(days, now):
+    return None if days is None else now - timedelta(days=days)
+
+
+def _date(timestamp):
+    if timezone.is_aware(timestamp):
+        return timezone.localdate(timestamp)
+    return timestamp.date()
+
+
+def _noop(message: str) -> None:
+    pass
+
+
+def prune_flag_views(
+    flag_id: int, cutoff, batch_size: int, pause: float = 0, progress=_noop
+) -> int:
+    """
+    Rolls up and deletes the UserActivityFlag rows of a flag older than cutoff.
+    Returns the number of rows deleted.
+    """
+    queryset = UserActivityFlag.objects.filter(
+        flag_id=flag_id, timestamp__lt=cutoff
+    ).order_by("pk")
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.values_list("pk", "timestamp", "arm", "is_active")[:batch_size]
+            )
+            if not rows:
+                break
+            views = collections.Counter()
+            for _, timestamp, arm, is_active in rows:
+                arm = UserActivityFlag.arm_of(is_active, arm)
+                views[(_date(timestamp), arm)] += 1
+            for (date, arm), count in views.items():
+                FlagActivityRollup.increment(flag_id, date, arm, views=count)
+            UserActivityFlag.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        total += len(rows)
+        progress(f"Deleted {total} flag view(s)")
+        if pause:
+            time.sleep(pause)
+    return total
+
+
+def prune_exposures(
+    flag_id: int, cutoff, batch_size: int, pause: float = 0, progress=_noop
+) -> int:
+    """
+    Deletes the FlagExposure rows of a flag last shown before cutoff. Returns
+    the number of rows deleted.
+    """
+    queryset = FlagExposure.objects.filter(
+        flag_id=flag_id, timestamp__lt=cutoff
+    ).order_by("pk")
+    total = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            FlagExposure.objects.filter(pk__in=pks).delete()
+        total += len(pks)
+        progress(f"Deleted {total} exposure(s)")
+        if pause:
+            time.sleep(pause)
+    return total
+
+
+def prune_activities(
+    cutoff, flag_cutoffs: dict, batch_size: int, pause: float = 0, progress=_noop
+) -> int:
+    """
+    Rolls up the conversions of, and deletes, the UserActivity rows older than
+    cutoff that have no flag views left. Returns the number of rows deleted.
+
+    Conversions are credited to the arm in the session's FlagExposure, which is
+    the arm the middleware attributed them to unless the session has seen
+    another arm of the flag since.
+    """
+    queryset = UserActivity.objects.filter(
+        timestamp__lt=cutoff, useractivityflag__isnull=True
+    ).order_by("pk")
+    targets = collections.defaultdict(list)
+    for flag_id, target_url in FlagUrl.objects.filter(
+        target_url__isnull=False
+    ).values_list("flag_id", "target_url"):
+        url = normalize_url(target_url)
+        targets[url].append(flag_id)
+        flag_cutoff = flag_cutoffs.get(flag_id, cutoff)
+        if flag_cutoff is None:
+            queryset = queryset.exclude(url=url, target_url_visit=True)
+        elif flag_cutoff < cutoff:
+            queryset = queryset.exclude(
+                url=url, target_url_visit=True, timestamp__gte=flag_cutoff
+            )
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.values_list(
+                    "pk", "session_key", "url", "timestamp", "target_url_visit"
+                )[:batch_size]
+            )
+            if not rows:
+                break
+            visits = [
+                (session_key, targets[url], timestamp)
+                for _, session_key, url, timestamp, target_url_visit in rows
+                if target_url_visit and url in targets
+            ]
+            if visits:
+                exposures = FlagExposure.objects.filter(
+                    session_key__in={session_key for session_key, _, _ in visits},
+                    flag_id__in={
+                        flag_id for _, flag_ids, _ in visits for flag_id in flag_ids
+                    },
+                ).values_list("session_key", "flag_id", "arm")
+                arms = {
+                    (session_key, flag_id): arm
+                    for session_key, flag_id, arm in exposures
+                }
+                conversions = collections.Counter()
+                for session_key, flag_ids, timestamp in visits:
+                    for flag_id in flag_ids:
+                        arm = arms.get((session_key, flag_id))
+                        if arm is not None:
+                            conversions[(flag_id, _date(timestamp), arm)] += 1
+                for (flag_id, date, arm), count in conversions.items():
+                    FlagActivityRollup.increment(flag_id, date, arm, conversions=count)
+            UserActivity.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        total += len(rows)
+        progress(f"Deleted {total} activity row(s)")
+        if pause:
+            time.sleep(pause)
+    return total
+
+
+def prune_activity(
+    days: int = None,
+    batch_size: int = None,
+    pause: float = 0,
+    now=None,
+    progress=_noop,
+) -> dict:
+    """
+    Rolls up and deletes activity past its retention window, waiting pause
+    seconds between batches. Returns the numbers of flag views, activities and
+    exposures deleted.
+    """
+    if days is None:
+        days = get_retention_days()
+    if batch_size is None:
+        batch_size = get_batch_size()
+    if now is None:
+        now = timezone.now()
+    flag_days = getattr(settings, "BANDITS_FLAG_ACTIVITY_RETENTION_DAYS", {})
+
+    cutoff = _get_cutoff(days, now)
+    flag_cutoffs = {}
+    flag_names = {}
+    n_flag_views = 0
+    for flag_id, name in BanditFlag.objects.values_list("pk", "name"):
+        flag_names[flag_id] = name
+        flag_cutoff = flag_cutoffs[flag_id] = _get_cutoff(
+            flag_days.get(name, days), now
+        )
+        if flag_cutoff is None:
+            continue
+        n_flag_views += prune_flag_views(
+            flag_id,
+            flag_cutoff,
+            batch_size,
+            pause,
+            lambda message: progress(f"{name}: {message}"),
+        )
+
+    n_activities = 0
+    if cutoff is not None:
+        n_activities = prune_activities(
+            cutoff, flag_cutoffs, batch_size, pause, progress
+        )
+
+    # Exposures attribute the conversions of target URL visits, which are
+    # kept for the longer of the flag's and the default retention
+    n_exposures = 0
+    for flag_id, flag_cutoff in flag_cutoffs.items():
+        if flag_cutoff is None or cutoff is None:
+            continue
+        name = flag_names[flag_id]
+        n_exposures += prune_exposures(
+            flag_id,
+            min(flag_cutoff, cutoff),
+            batch_size,
+            pause,
+            lambda message: progress(f"{name}: {message}"),
+        )
+    return {
+        "flag_views": n_flag_views,
+        "activities": n_activities,
+        "exposures": n_exposures,
+    }
@@ -0,0 +1,71 @@
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .bots import BOT_SETTINGS, reset_bot_filter
+from .cache import active_bandits, flag_routes
+from .exclusions import EXCLUSION_SETTINGS, reset_exclusion_matcher
+from .middleware import UserActivityMiddleware, is_async_enabled
+from .models import BANDIT_MODELS, TESTED_FIELDS, BanditFlag, FlagArm, FlagUrl
+from .stats import arm_stats
+
+# Saves restricted to these fields don't change how URLs are routed
+FLAG_URL_COUNTER_FIELDS = frozenset(
+    [
+        "active_flag_views",
+        "inactive_flag_views",
+        "active_flag_conversions",
+        "inactive_flag_conversions",
+    ]
+)
+
+
+@receiver(post_save, sender=BanditFlag)
+@receiver(post_delete, sender=BanditFlag)
+def invalidate_flag_caches(sender, instance, **kwargs):
+    flag_routes.invalidate()
+    active_bandits.invalidate()
+    arm_stats.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=FlagUrl)
+@receiver(post_delete, sender=FlagUrl)
+def invalidate_flag_url_caches(sender, instance, update_fields=None, **kwargs):
+    # Counters may have been set directly, e.g. from the admin
+    arm_stats.invalidate(instance.flag_id)
+    if update_fields and FLAG_URL_COUNTER_FIELDS.issuperset(update_fields):
+        return
+    flag_routes.invalidate()
+
+
+@receiver(post_save, sender=FlagArm)
+@receiver(post_delete, sender=FlagArm)
+def invalidate_flag_arm_stats(sender, instance, **kwargs):
+    arm_stats.invalidate(instance.flag_id)
+
+
+def invalidate_active_bandits(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(TESTED_FIELDS).issuperset(update_fields):
+        # Significance test bookkeeping doesn't change which bandit is active
+        active_bandits.update_fields(instance, update_fields)
+        return
+    active_bandits.invalidate()
+
+
+for bandit_model in BANDIT_MODELS:
+    post_save.connect(invalidate_active_bandits, sender=bandit_model)
+    post_delete.connect(invalidate_active_bandits, sender=bandit_model)
+
+
+@receiver(setting_changed)
+def reload_exclusions(sender, setting, **kwargs):
+    if setting in EXCLUSION_SETTINGS:
+        reset_exclusion_matcher()
+    if setting in BOT_SETTINGS:
+        reset_bot_filter()
+
+
+@receiver(setting_changed)
+def reload_async_middleware(sender, setting, **kwargs):
+    if setting == "BANDITS_ASYNC_MIDDLEWARE":
+        UserActivityMiddleware.async_capable = is_async_enabled()
@@ -0,0 +1,115 @@
+"""
+Two-arm significance tests computed from view and conversion counts.
+
+Every test takes arrays of views and conversions for the inactive and active
+arm and returns a two-sided p-value, without materializing the individual
+Bernoulli outcomes. Arrays of shape (..., 2) are tested row by row, returning
+an array of p-values, which lets simulations test thousands of runs at once.
+"""
+import numpy as np
+from scipy import stats
+
+
+def _p_value(p):
+    """Returns a float for a single test and the array otherwise"""
+    return float(p) if np.ndim(p) == 0 else p
+
+
+def _bernoulli_moments(views, conversions):
+    n = np.asarray(views, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.asarray(conversions, dtype=float) / n
+        # Unbiased sample variance of a 0/1 sample, as used by ttest_ind
+        var = n * p * (1 - p) / (n - 1)
+    return n, p, var
+
+
+def student_t_test(views, conversions) -> float:
+    """Pooled variance t-test, equal to scipy.stats.ttest_ind on the outcomes"""
+    n, p, var = _bernoulli_moments(views, conversions)
+    df = n.sum(axis=-1) - 2
+    pooled_var = ((n - 1) * var).sum(axis=-1) / df
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (p[..., 0] - p[..., 1]) / np.sqrt(pooled_var * (1 / n).sum(axis=-1))
+    return _p_value(2 * stats.t.sf(np.abs(t), df))
+
+
+def welch_t_test(views, conversions) -> float:
+    """Unequal variance t-test, equal to ttest_ind(..., equal_var=False)"""
+    n, p, var = _bernoulli_moments(views, conversions)
+    se2 = var / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (p[..., 0] - p[..., 1]) / np.sqrt(se2.sum(axis=-1))
+        df = se2.sum(axis=-1) ** 2 / (se2**2 / (n - 1)).sum(axis=-1)
+    return _p_value(2 * stats.t.sf(np.abs(t), df))
+
+
+def z_test(views, conversions) -> float:
+    """Two-proportion z-test with a pooled conversion rate"""
+    n = np.asarray(views, dtype=float)
+    c = np.asarray(conversions, dtype=float)
+    p = c / n
+    pooled = c.sum(axis=-1) / n.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (p[..., 0] - p[..., 1]) / np.sqrt(
+            pooled * (1 - pooled) * (1 / n).sum(axis=-1)
+        )
+    return _p_value(2 * stats.norm.sf(np.abs(z)))
+
+
+def _contingency_table(views, conversions) -> np.ndarray:
+    conversions = np.asarray(conversions, dtype=np.int64)
+    return np.array([conversions, np.asarray(views, dtype=np.int64) - conversions])
+
+
+def chi_squared_test(views, conversions) -> float:
+    """Pearson's chi-squared test on the 2x2 table, without continuity correction"""
+    n = np.asarray(views, dtype=float)
+    c = np.asarray(conversions, dtype=float)
+    # Row sums of the table are conversions and non-conversions, columns arms
+    converted = c.sum(axis=-1)
+    total = n.sum(axis=-1)
+    not_converted = total - converted
+    margins = converted * not_converted * n[..., 0] * n[..., 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chi2 = (
+            total
+            * (
+                c[..., 0] * (n[..., 1] - c[..., 1])
+                - c[..., 1] * (n[..., 0] - c[..., 0])
+            )
+            ** 2
+            / margins
+        )
+    return _p_value(np.where(margins > 0, stats.chi2.sf(chi2, 1), np.nan))
+
+
+def fisher_exact_test(views, conversions) -> float:
+    """Fisher's exact test on the 2x2 table"""
+    views = np.asarray(views)
+    conversions = np.asarray(conversions)
+    if views.ndim > 1:
+        # SciPy only tests one table at a time
+        return np.array(
+            [
+                fisher_exact_test(row_views, row_conversions)
+                for row_views, row_conversions in zip(
+                    views.reshape(-1, 2), conversions.reshape(-1, 2)
+                )
+            ]
+        ).reshape(views.shape[:-1])
+    return float(stats.fisher_exact(_contingency_table(views, conversions))[1])
+
+
+SIGNIFICANCE_TEST_FUNCTIONS = {
+    "t": student_t_test,
+    "welch": welch_t_test,
+    "z": z_test,
+    "chi2": chi_squared_test,
+    "fisher": fisher_exact_test,
+}
+
+
+def get_p_value(test_name: str, views, conversions) -> float:
+    """Returns the p-value of the named test, NaN if it is undefined"""
+    return SIGNIFICANCE_TEST_FUNCTIONS[test_name](views, conversions)
@@ -0,0 +1,203 @@
+"""
+Offline simulation of bandit settings, entirely in memory.
+
+``simulate()`` plays a bandit against synthetic Bernoulli arms and
+``replay()`` against the exposures and conversions recorded for a flag. Both
+advance thousands of independent runs at once with NumPy through the models'
+vectorized ``pull_arms()``, and run the bandit's significance test on every run
+that is due for one, as in ``should_test_arms()``: once it has ``min_views``
+views and every ``BANDITS_TEST_ARMS_EVERY_CONVERSIONS`` conversions after that.
+Runs stop at a winner just as the live bandit does.
+``sweep()`` repeats a simulation over a grid of model parameters.
+
+Every simulation returns a summary with the mean cumulative regret, the share
+of runs that found a winner, the median number of steps they took, and the
+false positive rate: the share of runs that declared a winner that isn't the
+only best arm.
+
+Replays use rejection sampling: a step only counts for the runs whose pull
+matches the arm that was logged, so estimates are unbiased only when the
+logged arms were chosen at random, e.g. while a flag ran without a bandit.
+"""
+import itertools
+
+import numpy as np
+from django.conf import settings
+
+from .models import UserActivity, UserActivityFlag
+from .significance import get_p_value
+
+
+def _run(model, n_steps, n_arms, n_runs, play, rng) -> dict:
+    """
+    Runs the bandit for n_steps steps, where play(step, arms) returns which
+    runs count the step, their rewards and their regret
+    """
+    every_conversions = getattr(settings, "BANDITS_TEST_ARMS_EVERY_CONVERSIONS", 1)
+    rows = np.arange(n_runs)
+    views = np.zeros((n_runs, n_arms), dtype=np.int64)
+    conversions = np.zeros((n_runs, n_arms), dtype=np.int64)
+    winners = np.full(n_runs, -1)
+    steps_to_winner = np.full(n_runs, -1)
+    regret = np.zeros(n_runs)
+    tested_conversions = np.zeros(n_runs, dtype=np.int64)
+
+    for step in range(n_steps):
+        arms = model.pull_arms(views, conversions, rng)
+        arms = np.where(winners >= 0, winners, arms)
+        counted, rewards, step_regret = play(step, arms)
+        # Each run pulls once per step, so no index repeats
+        views[rows[counted], arms[counted]] += 1
+        conversions[rows[counted], arms[counted]] += rewards[counted]
+        regret += np.where(counted, step_regret, 0)
+
+        total_conversions = conversions.sum(axis=1)
+        testing = np.flatnonzero(
+            (winners < 0)
+            & (total_conversions - tested_conversions >= every_conversions)
+            & (views.sum(axis=1) >= model.min_views)
+        )
+        if not len(testing):
+            continue
+        tested_conversions[testing] = total_conversions[testing]
+        test_views = views[testing]
+        test_conversions = conversions[testing]
+        # As in test_arms(), the leader is tested against the runner-up
+        order = np.argsort(
+            model.get_rewards_rows(test_views, test_conversions),
+            axis=1,
+            kind="stable",
+        )[:, -2:]
+        p_values = get_p_value(
+            model.significance_test,
+            np.take_along_axis(test_views, order, axis=1),
+            np.take_along_axis(test_conversions, order, axis=1),
+        )
+        significant = p_values < model.significance_level
+        winners[testing[significant]] = order[significant, 1]
+        steps_to_winner[testing[significant]] = step + 1
+
+    return {
+        "views": views,
+        "conversions": conversions,
+        "winners": winners,
+        "steps_to_winner": steps_to_winner,
+        "regret": regret,
+    }
+
+
+def _summarize(run: dict, rates: np.ndarray) -> dict:
+    winners = run["winners"]
+    found = winners >= 0
+    best = rates == rates.max()
+    # A winner is a false positive unless it is the one best arm
+    false_positive = found & ~(best[winners] & (best.sum() == 1))
+    return {
+        "regret": float(run["regret"].mean()),
+        "significant_rate": float(found.mean()),
+        "steps_to_significance": (
+            float(np.median(run["steps_to_winner"][found])) if found.any() else None
+        ),
+        "false_positive_rate": float(false_positive.mean()),
+        "conversion_rate": float(run["conversions"].sum() / max(run["views"].sum(), 1)),
+    }
+
+
+def simulate(model, rates, n_steps: int, n_runs: int = 1000, seed=None) -> dict:
+    """
+    Plays the bandit n_runs times against Bernoulli arms with the given
+    conversion rates, for n_steps visitors per run
+    """
+    rng = np.random.default_rng(seed)
+    rates = np.asarray(rates, dtype=float)
+    counted = np.ones(n_runs, dtype=bool)
+    regrets = rates.max() - rates
+
+    def play(step, arms):
+        return counted, rng.random(n_runs) < rates[arms], regrets[arms]
+
+    run = _run(model, n_steps, len(rates), n_runs, play, rng)
+    return _summarize(run, rates)
+
+
+def load_replay_log(flag) -> tuple:
+    """
+    Returns the arm shown to each session that saw the flag on its source URL,
+    in order, and whether the session went on to reach the target URL
+    """
+    from .cache import normalize_url
+
+    exposures = {}
+    for session_key, timestamp, arm, is_active in (
+        UserActivityFlag.objects.filter(flag=flag)
+        .order_by("timestamp", "pk")
+        .values_list("user_activity__session_key", "timestamp", "arm", "is_active")
+    ):
+        if session_key not in exposures:
+            exposures[session_key] = (
+                timestamp,
+                UserActivityFlag.arm_of(is_active, arm),
+            )
+
+    converted_at = {}
+    flag_url = getattr(flag, "flagurl", None)
+    if flag_url is not None and flag_url.target_url:
+        for session_key, timestamp in (
+            UserActivity.objects.filter(
+                url=normalize_url(flag_url.target_url),
+                target_url_visit=True,
+                session_key__in=list(exposures),
+            )
+            .order_by("timestamp")
+            .values_list("session_key", "timestamp")
+        ):
+            converted_at.setdefault(session_key, timestamp)
+
+    arms = np.array([arm for _, arm in exposures.values()], dtype=np.int64)
+    rewards = np.array(
+        [
+            session_key in converted_at and converted_at[session_key] >= timestamp
+            for session_key, (timestamp, _) in exposures.items()
+        ],
+        dtype=bool,
+    )
+    return arms, rewards
+
+
+def replay(model, arms, rewards, n_runs: int = 1000, seed=None) -> dict:
+    """
+    Replays logged (arm, reward) pairs through the bandit n_runs times. Regret
+    is measured against the logged conversion rate of each arm.
+    """
+    rng = np.random.default_rng(seed)
+    arms = np.asarray(arms, dtype=np.int64)
+    rewards = np.asarray(rewards, dtype=bool)
+    n_arms = max(int(arms.max()) + 1 if len(arms) else 0, model.k)
+    views = np.bincount(arms, minlength=n_arms)
+    rates = np.bincount(arms, weights=rewards, minlength=n_arms) / np.maximum(views, 1)
+    regrets = rates.max() - rates
+    run_rewards = np.empty(n_runs, dtype=bool)
+
+    def play(step, pulled):
+        run_rewards.fill(rewards[step])
+        return pulled == arms[step], run_rewards, regrets[arms[step]]
+
+    run = _run(model, len(arms), n_arms, n_runs, play, rng)
+    summary = _summarize(run, rates)
+    summary["events_per_run"] = float(run["views"].sum() / n_runs)
+    return summary
+
+
+def sweep(make_model, grid: dict, run=simulate, **kwargs) -> list:
+    """
+    Runs a simulation for every combination of the parameters in grid, e.g.
+    sweep(EpsilonGreedyModel, {"epsilon": [0.05, 0.1]}, rates=[0.05, 0.06],
+    n_steps=5000). Returns the summaries with the parameters they used.
+    """
+    results = []
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        summary = run(make_model(**params), **kwargs)
+        results.append({**params, **summary})
+    return results
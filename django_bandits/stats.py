@@ -0,0 +1,163 @@
+"""
+Per-process store of the views and conversions behind each bandit decision.
+
+Counts are loaded with ``BanditFlag.get_arm_counts()``, incremented locally
+whenever this process records a view or conversion, and reloaded once they
+are older than the flag's ``arm_stats_max_age`` (or
+``BANDITS_ARM_STATS_MAX_AGE``) seconds, which bounds how far behind other
+worker processes they can be. Setting
+``BANDITS_ARM_STATS_CACHE`` to a cache alias shares reloaded counts between
+processes through Django's cache framework.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import BanditFlag, FlagArm, FlagUrl
+
+VIEWS = 0
+CONVERSIONS = 1
+
+
+def get_default_max_age() -> float:
+    return getattr(settings, "BANDITS_ARM_STATS_MAX_AGE", 5)
+
+
+class ArmStatsStore:
+    cache_key = "django_bandits:arm_stats:{}"
+    VIEWS = VIEWS
+    CONVERSIONS = CONVERSIONS
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # flag id -> [counts array of shape (2, k), time loaded]
+        self._stats = {}
+
+    @staticmethod
+    def get_cache():
+        alias = getattr(settings, "BANDITS_ARM_STATS_CACHE", None)
+        return caches[alias] if alias else None
+
+    def invalidate(self, flag_id=None):
+        with self._lock:
+            if flag_id is None:
+                self._stats.clear()
+            else:
+                self._stats.pop(flag_id, None)
+
+    def _load_many_from_db(self, flag_ids) -> dict:
+        """
+        Returns {flag id: counts} with one query for the flags and their
+        FlagUrl, and one for the FlagArm rows of flags with more than two arms
+        """
+        stats = {flag_id: np.zeros((2, 2), dtype=np.int64) for flag_id in flag_ids}
+        flags = list(
+            BanditFlag.objects.filter(pk__in=flag_ids).select_related("flagurl")
+        )
+        arm_rows = {flag.pk: [] for flag in flags if flag.is_multi_armed}
+        if arm_rows:
+            for flag_id, *row in FlagArm.objects.filter(
+                flag_id__in=list(arm_rows)
+            ).values_list("flag_id", "index", "views", "conversions"):
+                arm_rows[flag_id].append(row)
+        for flag in flags:
+            try:
+                views, conversions = flag.get_arm_counts(arm_rows.get(flag.pk))
+            except FlagUrl.DoesNotExist:
+                # A two-armed flag without a FlagUrl yet
+                continue
+            stats[flag.pk] = np.array([views, conversions], dtype=np.int64)
+        return stats
+
+    def _load_many(self, max_ages: dict) -> dict:
+        """
+        Reloads the counts of {flag id: max age}, preferring fresh enough
+        copies in the shared cache
+        """
+        cache = self.get_cache()
+        entries = {}
+        if cache is not None:
+            keys = {self.cache_key.format(flag_id): flag_id for flag_id in max_ages}
+            for key, cached in cache.get_many(list(keys)).items():
+                flag_id = keys[key]
+                age = time.time() - cached[1]
+                if age <= max_ages[flag_id]:
+                    entries[flag_id] = [np.array(cached[0]), time.monotonic() - age]
+        missing = [flag_id for flag_id in max_ages if flag_id not in entries]
+        if not missing:
+            return entries
+        loaded = self._load_many_from_db(missing)
+        shared = {}
+        for flag_id, stats in loaded.items():
+            entries[flag_id] = [stats, time.monotonic()]
+            max_age = max_ages[flag_id]
+            if cache is not None and max_age:
+                shared.setdefault(max_age, {})[self.cache_key.format(flag_id)] = (
+                    stats.tolist(),
+                    time.time(),
+                )
+        for max_age, values in shared.items():
+            cache.set_many(values, timeout=max_age)
+        return entries
+
+    def get(self, flag_id: int, max_age: float = None) -> tuple:
+        """Returns (views, conversions) arrays at most max_age seconds old"""
+        if max_age is None:
+            max_age = get_default_max_age()
+        entry = self._stats.get(flag_id)
+        if entry is None or time.monotonic() - entry[1] > max_age:
+            entry = self._load_many({flag_id: max_age})[flag_id]
+            with self._lock:
+                self._stats[flag_id] = entry
+        stats = entry[0].copy()
+        return stats[0], stats[1]
+
+    def get_many(self, flags) -> dict:
+        """
+        Returns {flag id: (views, conversions)} for the flags like get(),
+        reloading every stale flag together
+        """
+        default_max_age = get_default_max_age()
+        now = time.monotonic()
+        entries = {}
+        max_ages = {}
+        for flag in flags:
+            max_age = flag.arm_stats_max_age
+            if max_age is None:
+                max_age = default_max_age
+            entry = self._stats.get(flag.pk)
+            if entry is None or now - entry[1] > max_age:
+                max_ages[flag.pk] = max_age
+            else:
+                entries[flag.pk] = entry
+        if max_ages:
+            loaded = self._load_many(max_ages)
+            with self._lock:
+                self._stats.update(loaded)
+            entries.update(loaded)
+        stats = {}
+        for flag_id, entry in entries.items():
+            counts = entry[0].copy()
+            stats[flag_id] = (counts[0], counts[1])
+        return stats
+
+    def increment(self, flag_id: int, counter: int, arm: int) -> None:
+        """
+        Mirrors an increment of the VIEWS or CONVERSIONS counter of an arm
+        made by this process
+        """
+        with self._lock:
+            entry = self._stats.get(flag_id)
+            if entry is None:
+                return
+            if arm < entry[0].shape[1]:
+                entry[0][counter, arm] += 1
+            else:
+                # The number of arms changed since the counts were loaded
+                del self._stats[flag_id]
+
+
+arm_stats = ArmStatsStore()
@@ -0,0 +1,29 @@
+from django import template
+
+from .. import decisions
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def flag_arm(context, flag_name):
+    """
+    Stores the variant of a flag to show, e.g.
+
+        {% flag_arm "headline-flag" as arm %}
+        {% if arm == 2 %}...{% elif arm == 1 %}...{% else %}...{% endif %}
+    """
+    return decisions.flag_arm(context["request"], flag_name)
+
+
+@register.simple_tag(takes_context=True)
+def decide_flags(context, *flag_names):
+    """
+    Stores {flag name: variant} for several flags, deciding them together, e.g.
+
+        {% decide_flags "headline_flag" "button_flag" as arms %}
+        {% if arms.headline_flag == 1 %}...{% endif %}
+
+    Only names that are valid template variables can be looked up with dots.
+    """
+    return decisions.decide_flags(context["request"], flag_names)
@@ -0,0 +1,66 @@
+"""
+Background flushing of write-behind state.
+
+A ``FlushTimer`` calls a flush function from a daemon thread some time after
+it is started, and once more at interpreter exit. Forked children start with
+no timer, since the parent's thread doesn't exist in them.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class FlushTimer:
+    def __init__(self, flush, get_interval, description: str):
+        """
+        flush is called get_interval() seconds after start(), and description
+        names what it writes in the log when it fails
+        """
+        self._flush = flush
+        self._get_interval = get_interval
+        self._description = description
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush_on_exit)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def start(self) -> None:
+        """Schedules a flush unless one is already scheduled"""
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self._get_interval(), self._run)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def cancel(self) -> None:
+        """Unschedules the pending flush, if any"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self._flush()
+        except Exception:
+            logger.exception("Failed to flush %s", self._description)
+        finally:
+            # The timer thread owns its own database connection
+            connection.close()
+
+    def flush_on_exit(self):
+        try:
+            self._flush()
+        except Exception:
+            logger.exception("Failed to flush %s at exit", self._description)
@@ -0,0 +1,58 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.test import RequestFactory
+from waffle.utils import get_cache
+
+from django_bandits.cache import clear_caches
+from django_bandits.models import BanditFlag, FlagUrl
+
+
+@pytest.fixture(scope="session")
+def django_db_keepdb():
+    """
+    The test database file is named after the run, so keeping it for
+    --reuse-db would only leave a file behind per run
+    """
+    return False
+
+
+@pytest.fixture(autouse=True)
+def clear_bandit_caches():
+    """
+    Process-local caches outlive the per-test database rollback, and Waffle
+    only flushes its cache once a transaction commits
+    """
+    clear_caches()
+    get_cache().clear()
+    yield
+    clear_caches()
+    get_cache().clear()
+
+
+@pytest.fixture
+def make_request():
+    """Returns a builder of anonymous GET requests with a saved session"""
+
+    def make_request(path="/source/"):
+        request = RequestFactory().get(path)
+        SessionMiddleware(lambda req: HttpResponse()).process_request(request)
+        request.session.save()
+        request.user = AnonymousUser()
+        return request
+
+    return make_request
+
+
+@pytest.fixture
+def session_request(db, make_request):
+    return make_request()
+
+
+@pytest.fixture
+def flag_url(db):
+    flag = BanditFlag.objects.create(name="test_flag")
+    return FlagUrl.objects.create(
+        flag=flag, source_url="/source/", target_url="/target/"
+    )
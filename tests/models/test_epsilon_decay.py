@@ -1,5 +1,6 @@
 import pytest
 from django_bandits.models import EpsilonDecayModel, BanditFlag, FlagUrl
+from django_bandits.rng import uniforms
 
 
 @pytest.fixture
@@ -11,27 +12,29 @@ def setup_data(db):
 
 
 class TestEpsilonDecayModel:
-    @pytest.mark.parametrize("randint_return, expected_output", [(0, False), (1, True)])
+    @pytest.mark.parametrize(
+        "random_return, expected_output", [(0.25, False), (0.75, True)]
+    )
     def test_pull_random_choice(
-        self, setup_data, mocker, randint_return, expected_output
+        self, setup_data, mocker, random_return, expected_output
     ):
-        """Simulate random choice"""
+        """Simulate random choice, always made before any views"""
         _, _, eps_decay_model = setup_data
-        mocker.patch("numpy.random.random", return_value=0.05)
-        mocker.patch("numpy.random.randint", return_value=randint_return)
+        mocker.patch.object(uniforms, "random", return_value=random_return)
 
         active = eps_decay_model.pull()
         assert active == expected_output
 
-    @pytest.mark.parametrize("randint_return, expected_output", [(0, False), (1, True)])
+    @pytest.mark.parametrize(
+        "random_return, expected_output", [(0.15, False), (0.9, True)]
+    )
     def test_pull_greedy_choice_equal_rewards(
-        self, setup_data, mocker, randint_return, expected_output
+        self, setup_data, mocker, random_return, expected_output
     ):
         """Simulate scenario where rewards are equal"""
         _, flag_url, eps_decay_model = setup_data
 
-        mocker.patch("numpy.random.random", return_value=0.15)
-        mocker.patch("numpy.random.randint", return_value=randint_return)
+        mocker.patch.object(uniforms, "random", return_value=random_return)
 
         flag_url.active_flag_views = 100
         flag_url.inactive_flag_views = 100
@@ -50,7 +53,7 @@ class TestEpsilonDecayModel:
     ):
         _, flag_url, eps_decay_model = setup_data
 
-        mocker.patch("numpy.random.random", return_value=1)
+        mocker.patch.object(uniforms, "random", return_value=1)
 
         flag_url.active_flag_views = 100
         flag_url.inactive_flag_views = 100
@@ -1,5 +1,6 @@
 import pytest
 from django_bandits.models import EpsilonGreedyModel, BanditFlag, FlagUrl
+from django_bandits.rng import uniforms
 
 
 @pytest.fixture
@@ -11,14 +12,15 @@ def setup_data(db):
 
 
 class TestEpsilonGreedyModel:
-    @pytest.mark.parametrize("randint_return, expected_output", [(0, False), (1, True)])
+    @pytest.mark.parametrize(
+        "random_return, expected_output", [(0.02, False), (0.07, True)]
+    )
     def test_pull_random_choice(
-        self, setup_data, mocker, randint_return, expected_output
+        self, setup_data, mocker, random_return, expected_output
     ):
-        """Simulate random choice"""
+        """Simulate random choice, draws below epsilon split between the arms"""
         _, _, eps_greedy_model = setup_data
-        mocker.patch("numpy.random.random", return_value=0.05)
-        mocker.patch("numpy.random.randint", return_value=randint_return)
+        mocker.patch.object(uniforms, "random", return_value=random_return)
 
         active = eps_greedy_model.pull()
         assert active == expected_output
@@ -31,7 +33,7 @@ class TestEpsilonGreedyModel:
     ):
         _, flag_url, eps_greedy_model = setup_data
 
-        mocker.patch("numpy.random.random", return_value=1)
+        mocker.patch.object(uniforms, "random", return_value=1)
 
         flag_url.active_flag_views = 100
         flag_url.inactive_flag_views = 100
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pytest
+from django_bandits.models import ThompsonSamplingModel, BanditFlag, FlagUrl
+from django_bandits.sampling import PosteriorSampleBuffer, posterior_samples
+
+
+@pytest.fixture
+def setup_data(db):
+    bandit_flag = BanditFlag.objects.create()
+    flag_url = FlagUrl.objects.create(flag=bandit_flag)
+    model = ThompsonSamplingModel.objects.create(flag=bandit_flag)
+    return bandit_flag, flag_url, model
+
+
+class TestThompsonSamplingModel:
+    @pytest.mark.parametrize("winning_arm", [0, 1])
+    def test_winning_arm(self, setup_data, winning_arm):
+        _, _, ts_model = setup_data
+
+        ts_model.winning_arm = winning_arm
+        ts_model.save()
+        active = ts_model.pull()
+        assert active == bool(winning_arm)
+
+    @pytest.mark.parametrize(
+        "active_flag_conversions, inactive_flag_conversions", [(10, 50), (50, 10)]
+    )
+    def test_exploitation(
+        self, setup_data, active_flag_conversions, inactive_flag_conversions
+    ):
+        _, flag_url, ts_model = setup_data
+
+        flag_url.active_flag_views = 100
+        flag_url.inactive_flag_views = 100
+        flag_url.active_flag_conversions = active_flag_conversions
+        flag_url.inactive_flag_conversions = inactive_flag_conversions
+        flag_url.save()
+
+        pulls = [ts_model.pull() for _ in range(100)]
+        expected_output = active_flag_conversions > inactive_flag_conversions
+        assert all(active == expected_output for active in pulls)
+
+    def test_posterior_parameters(self, setup_data):
+        _, flag_url, ts_model = setup_data
+        ts_model.alpha_prior = 2
+        ts_model.beta_prior = 3
+
+        flag_url.active_flag_views = 100
+        flag_url.inactive_flag_views = 50
+        flag_url.active_flag_conversions = 10
+        flag_url.inactive_flag_conversions = 5
+        flag_url.save()
+
+        alpha, beta = ts_model.get_posterior_parameters()
+        assert alpha.tolist() == [7, 12]
+        assert beta.tolist() == [48, 93]
+
+    def test_explores_without_data(self, setup_data):
+        _, _, ts_model = setup_data
+        pulls = [ts_model.pull() for _ in range(1000)]
+        assert 400 < sum(pulls) < 600
+
+
+class TestPosteriorSampleBuffer:
+    def test_reuses_batch_for_unchanged_counts(self, mocker, settings):
+        settings.BANDITS_THOMPSON_BATCH_SIZE = 10
+        buffer = PosteriorSampleBuffer(np.random.default_rng(0))
+        draw = mocker.spy(buffer, "draw")
+        alpha, beta = np.array([1.0, 1.0]), np.array([1.0, 1.0])
+        for _ in range(10):
+            buffer.pop("bandit", alpha, beta)
+        assert draw.call_count == 1
+        buffer.pop("bandit", alpha, beta)
+        assert draw.call_count == 2
+
+    @pytest.mark.parametrize("tolerance, redraws", [(0, 1), (0.01, 0)])
+    def test_redraws_when_counts_change(self, mocker, settings, tolerance, redraws):
+        settings.BANDITS_THOMPSON_TOLERANCE = tolerance
+        buffer = PosteriorSampleBuffer(np.random.default_rng(0))
+        draw = mocker.spy(buffer, "draw")
+        buffer.pop("bandit", np.array([500.0, 500.0]), np.array([500.0, 500.0]))
+        buffer.pop("bandit", np.array([501.0, 500.0]), np.array([500.0, 500.0]))
+        assert draw.call_count == 1 + redraws
+
+    def test_shared_buffer(self, setup_data):
+        _, _, ts_model = setup_data
+        ts_model.pull()
+        assert posterior_samples._buffers
+        posterior_samples.clear()
+        assert not posterior_samples._buffers
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="Needs os.fork()")
+    def test_forked_children_start_empty(self, setup_data):
+        _, _, ts_model = setup_data
+        ts_model.pull()
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, str(len(posterior_samples._buffers)).encode())
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert os.read(read, 10) == b"0"
+        assert posterior_samples._buffers
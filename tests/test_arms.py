@@ -0,0 +1,179 @@
+import numpy as np
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.template import Context, Engine
+from django.test import RequestFactory
+
+from django_bandits.decisions import flag_arm
+from django_bandits.middleware import UserActivityMiddleware
+from django_bandits.models import (
+    BanditFlag,
+    EpsilonGreedyModel,
+    FlagArm,
+    FlagUrl,
+    ThompsonSamplingModel,
+    UCB1Model,
+    UserActivityFlag,
+)
+from django_bandits.stats import arm_stats
+
+
+@pytest.fixture
+def three_armed_flag(db):
+    flag = BanditFlag.objects.create(name="three_armed", number_of_arms=3)
+    flag_url = FlagUrl.objects.create(
+        flag=flag, source_url="/source/", target_url="/target/"
+    )
+    return flag, flag_url
+
+
+def set_arm_counts(flag, views, conversions):
+    for index, (arm_views, arm_conversions) in enumerate(zip(views, conversions)):
+        FlagArm.objects.update_or_create(
+            flag=flag,
+            index=index,
+            defaults={"views": arm_views, "conversions": arm_conversions},
+        )
+
+
+@pytest.mark.parametrize(
+    "bandit_model", [EpsilonGreedyModel, UCB1Model, ThompsonSamplingModel]
+)
+def test_pull_arm_exploits_best_of_three(three_armed_flag, bandit_model):
+    flag, _ = three_armed_flag
+    set_arm_counts(flag, [1000, 1000, 1000], [100, 500, 10])
+    bandit = bandit_model.objects.create(flag=flag)
+    if bandit_model is EpsilonGreedyModel:
+        bandit.epsilon = 0.0
+
+    pulls = [bandit.pull_arm() for _ in range(50)]
+    assert pulls == [1] * 50
+
+
+def test_pull_arm_explores_all_arms(three_armed_flag):
+    flag, _ = three_armed_flag
+    bandit = EpsilonGreedyModel.objects.create(flag=flag, epsilon=1.0)
+
+    pulls = {bandit.pull_arm() for _ in range(300)}
+    assert pulls == {0, 1, 2}
+
+
+def test_record_view_and_conversion_use_arm_rows(three_armed_flag):
+    flag, flag_url = three_armed_flag
+    flag_url.record_view(2)
+    flag_url.record_view(2)
+    flag_url.record_conversion(2)
+    flag_url.record_view(0)
+
+    views, conversions = flag.get_arm_counts()
+    assert views.tolist() == [1, 0, 2]
+    assert conversions.tolist() == [0, 0, 1]
+    flag_url.refresh_from_db()
+    assert flag_url.active_flag_views == flag_url.inactive_flag_views == 0
+
+
+def test_arm_stats_follow_arm_rows(three_armed_flag):
+    flag, flag_url = three_armed_flag
+    assert arm_stats.get(flag.pk)[0].tolist() == [0, 0, 0]
+
+    flag_url.record_view(1)
+    assert arm_stats.get(flag.pk)[0].tolist() == [0, 1, 0]
+
+    FlagArm.objects.filter(flag=flag, index=1).update(views=10)
+    FlagArm.objects.get(flag=flag, index=1).save()
+    assert arm_stats.get(flag.pk)[0].tolist() == [0, 10, 0]
+
+
+def test_test_arms_compares_leader_with_runner_up(three_armed_flag):
+    flag, _ = three_armed_flag
+    set_arm_counts(flag, [1000, 1000, 1000], [100, 300, 90])
+    bandit = EpsilonGreedyModel.objects.create(flag=flag, significance_test="z")
+
+    bandit.test_arms()
+    bandit.refresh_from_db()
+    assert bandit.winning_arm == 1
+    assert bandit.pull_arm() == 1
+
+
+def test_test_arms_needs_a_clear_leader(three_armed_flag):
+    flag, _ = three_armed_flag
+    # The leader is far ahead of the control but not of the runner-up
+    set_arm_counts(flag, [1000, 1000, 1000], [100, 300, 295])
+    bandit = EpsilonGreedyModel.objects.create(flag=flag, significance_test="z")
+
+    bandit.test_arms()
+    bandit.refresh_from_db()
+    assert bandit.winning_arm is None
+
+
+def test_two_armed_flags_keep_flag_url_counters(db):
+    flag = BanditFlag.objects.create(name="two_armed")
+    flag_url = FlagUrl.objects.create(flag=flag)
+    flag_url.record_view(True)
+    flag_url.record_conversion(False)
+
+    flag_url.refresh_from_db()
+    assert (flag_url.active_flag_views, flag_url.inactive_flag_conversions) == (1, 1)
+    assert not FlagArm.objects.exists()
+    views, conversions = flag.get_arm_counts()
+    assert views.tolist() == [0, 1]
+    assert conversions.tolist() == [1, 0]
+
+
+def test_flag_arm_and_template_tag(three_armed_flag):
+    flag, _ = three_armed_flag
+    EpsilonGreedyModel.objects.create(flag=flag, winning_arm=2, is_active=True)
+    request = RequestFactory().get("/")
+    request.user = AnonymousUser()
+
+    assert flag_arm(request, flag.name) == 2
+    assert flag_arm(request, "missing_flag") == 0
+    engine = Engine(
+        libraries={"bandit_tags": "django_bandits.templatetags.bandit_tags"}
+    )
+    template = engine.from_string(
+        '{% load bandit_tags %}{% flag_arm "three_armed" as arm %}arm={{ arm }}'
+    )
+    assert template.render(Context({"request": request})) == "arm=2"
+
+
+@pytest.mark.parametrize("everyone, arm", [(False, 0), (True, 1)])
+def test_flag_arm_respects_everyone(three_armed_flag, everyone, arm, settings):
+    flag, _ = three_armed_flag
+    flag.everyone = everyone
+    flag.save()
+    UCB1Model.objects.create(flag=flag, is_active=True)
+    # UCB1 would pull the unseen third arm
+    FlagArm.objects.create(flag=flag, index=0, views=100, conversions=90)
+    request = RequestFactory().get("/")
+    request.user = AnonymousUser()
+    assert flag_arm(request, flag.name) == arm
+
+    flag.everyone = None
+    flag.save()
+    settings.WAFFLE_OVERRIDE = True
+    request = RequestFactory().get("/", {flag.name: "1" if everyone else "0"})
+    request.user = AnonymousUser()
+    assert flag_arm(request, flag.name) == arm
+
+
+def test_middleware_records_arm_and_attributes_conversion(three_armed_flag, mocker):
+    flag, flag_url = three_armed_flag
+    mocker.patch.object(UserActivityMiddleware, "flag_arm", return_value=2)
+    request = RequestFactory().get(flag_url.source_url)
+    SessionMiddleware(lambda req: HttpResponse()).process_request(request)
+    request.session.save()
+    request.user = AnonymousUser()
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+
+    middleware(request)
+    request.path = flag_url.target_url
+    middleware(request)
+
+    uaf = UserActivityFlag.objects.get(flag=flag)
+    assert (uaf.arm, uaf.is_active) == (2, True)
+    views, conversions = flag.get_arm_counts()
+    assert np.array_equal(views, [0, 0, 1])
+    assert np.array_equal(conversions, [0, 0, 1])
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+from django.http import HttpResponse
+from django.test import override_settings
+
+from django_bandits import assignments
+from django_bandits.middleware import UserActivityMiddleware
+from django_bandits.models import (
+    BanditFlag,
+    EpsilonGreedyModel,
+    FlagUrl,
+    UserActivityFlag,
+)
+
+
+@pytest.fixture
+def bandit(db):
+    flag = BanditFlag.objects.create(name="sticky_flag")
+    FlagUrl.objects.create(flag=flag, source_url="/source/", target_url="/target/")
+    return EpsilonGreedyModel.objects.create(flag=flag, epsilon=1.0, is_active=True)
+
+
+def test_repeat_views_keep_the_assigned_arm(bandit, make_request, mocker):
+    pull_arm = mocker.spy(EpsilonGreedyModel, "pull_arm")
+    request = make_request()
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+
+    for _ in range(5):
+        middleware(request)
+
+    assert pull_arm.call_count == 1
+    arms = set(UserActivityFlag.objects.values_list("is_active", flat=True))
+    assert len(arms) == 1
+    flag_url = FlagUrl.objects.get()
+    assert flag_url.active_flag_views + flag_url.inactive_flag_views == 1
+
+
+def test_template_decision_matches_middleware(bandit, make_request):
+    request = make_request()
+    decisions = []
+
+    def view(req):
+        decisions.append(bandit.flag.is_active(req))
+        return HttpResponse()
+
+    UserActivityMiddleware(view)(request)
+    uaf = UserActivityFlag.objects.get()
+    assert decisions == [uaf.is_active]
+
+
+def test_assignment_expires(bandit, make_request, mocker):
+    request = make_request()
+    flag = bandit.flag
+    assignments.assign_arm(request, flag, 1)
+    assert assignments.get_assigned_arm(request, flag) == 1
+
+    mocker.patch("time.time", return_value=time.time() + 25 * 60 * 60)
+    assert assignments.get_assigned_arm(request, flag) is None
+
+
+@override_settings(BANDITS_STICKY_ASSIGNMENT_TTL=0)
+def test_disabled_assignments_pull_every_view(bandit, make_request, mocker):
+    pull_arm = mocker.spy(EpsilonGreedyModel, "pull_arm")
+    request = make_request()
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+
+    for _ in range(3):
+        middleware(request)
+
+    assert pull_arm.call_count == 3
+    flag_url = FlagUrl.objects.get()
+    assert flag_url.active_flag_views + flag_url.inactive_flag_views == 3
+
+
+def test_winning_arm_overrides_assignment(bandit, make_request):
+    request = make_request()
+    flag = bandit.flag
+    assignments.assign_arm(request, flag, 0)
+
+    bandit.winning_arm = 1
+    bandit.save()
+    assert flag.choose_arm(request) == 1
+
+
+def counts(flag_url):
+    flag_url.refresh_from_db()
+    return (
+        flag_url.active_flag_views + flag_url.inactive_flag_views,
+        flag_url.active_flag_conversions + flag_url.inactive_flag_conversions,
+    )
+
+
+def test_untracked_source_response_counts_no_view(bandit, make_request):
+    request = make_request()
+    UserActivityMiddleware(lambda req: HttpResponse(status=500))(request)
+    flag_url = FlagUrl.objects.get()
+    assert counts(flag_url) == (0, 0)
+
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+    for path in ["/source/", "/source/", "/target/"]:
+        request.path = path
+        middleware(request)
+    assert counts(flag_url) == (1, 1)
+
+
+def test_flag_decided_before_source_counts_the_source_view(bandit, make_request):
+    request = make_request("/about/")
+
+    def view(req):
+        bandit.flag.is_active(req)
+        return HttpResponse()
+
+    UserActivityMiddleware(view)(request)
+    assert assignments.get_assigned_arm(request, bandit.flag) is not None
+
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+    for path in ["/source/", "/target/"]:
+        request.path = path
+        middleware(request)
+    assert counts(FlagUrl.objects.get()) == (1, 1)
@@ -0,0 +1,87 @@
+import asyncio
+
+import django
+import pytest
+from asgiref.sync import sync_to_async
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from django_bandits.middleware import UserActivityMiddleware
+from django_bandits.models import (
+    FlagExposure,
+    UserActivity,
+    UserActivityFlag,
+)
+
+pytestmark = pytest.mark.skipif(
+    django.VERSION < (4, 2), reason="async middleware needs Django 4.2"
+)
+
+
+@pytest.fixture(autouse=True)
+def async_middleware(settings):
+    settings.BANDITS_ASYNC_MIDDLEWARE = True
+
+
+async def async_view(request):
+    return HttpResponse()
+
+
+def test_async_mode_follows_get_response(settings):
+    assert asyncio.iscoroutinefunction(UserActivityMiddleware(async_view))
+    assert not asyncio.iscoroutinefunction(
+        UserActivityMiddleware(lambda req: HttpResponse())
+    )
+    settings.BANDITS_ASYNC_MIDDLEWARE = False
+    assert not UserActivityMiddleware.async_capable
+    assert not asyncio.iscoroutinefunction(UserActivityMiddleware(async_view))
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_async_view_and_conversion(flag_url, mocker, make_request):
+    mocker.patch.object(UserActivityMiddleware, "flag_is_active", return_value=True)
+    middleware = UserActivityMiddleware(async_view)
+    request = await sync_to_async(make_request)(flag_url.source_url)
+
+    response = await middleware(request)
+    assert response.status_code == 200
+    request.path = flag_url.target_url
+    await middleware(request)
+
+    await flag_url.arefresh_from_db()
+    assert flag_url.active_flag_views == 1
+    assert flag_url.active_flag_conversions == 1
+    assert await UserActivity.objects.acount() == 2
+    assert await UserActivity.objects.filter(target_url_visit=True).aexists()
+    uaf = await UserActivityFlag.objects.aget()
+    assert uaf.is_active
+    exposure = await FlagExposure.objects.aget()
+    assert exposure.arm == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_async_untracked_status(flag_url, mocker, make_request):
+    mocker.patch.object(UserActivityMiddleware, "flag_is_active", return_value=True)
+
+    async def not_found(request):
+        return HttpResponse(status=404)
+
+    request = await sync_to_async(make_request)(flag_url.source_url)
+    await UserActivityMiddleware(not_found)(request)
+
+    assert not await UserActivity.objects.aexists()
+    await flag_url.arefresh_from_db()
+    assert flag_url.active_flag_views == 0
+
+
+@pytest.mark.asyncio
+async def test_async_request_without_session(transactional_db):
+    request = RequestFactory().get("/some_path/")
+    SessionMiddleware(lambda req: HttpResponse()).process_request(request)
+
+    response = await UserActivityMiddleware(async_view)(request)
+    assert response.status_code == 200
+    assert not await UserActivity.objects.aexists()
@@ -0,0 +1,75 @@
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from django_bandits.bots import BotFilter, get_bot_filter
+from django_bandits.middleware import UserActivityMiddleware
+from django_bandits.models import UserActivity
+
+
+class UntouchableSession:
+    @property
+    def session_key(self):
+        raise AssertionError("Session used for a filtered request")
+
+
+@pytest.mark.parametrize(
+    "method, path, user_agent, filtered",
+    [
+        ("get", "/page/", "Mozilla/5.0 (Windows NT 10.0; Win64; x64)", False),
+        ("get", "/page/", "Mozilla/5.0 (compatible; Googlebot/2.1)", True),
+        ("get", "/page/", "Mozilla/5.0 (compatible; bingbot/2.0)", True),
+        ("get", "/page/", "facebookexternalhit/1.1", True),
+        ("get", "/page/", "python-requests/2.31.0", True),
+        ("get", "/page/", "curl/8.4.0", True),
+        ("get", "/page/", "Mozilla/5.0 HeadlessChrome/120.0", True),
+        ("get", "/page/", "", False),
+        ("head", "/page/", "Mozilla/5.0", True),
+        ("options", "/page/", "Mozilla/5.0", True),
+        ("post", "/page/", "Mozilla/5.0", False),
+        ("get", "/favicon.ico", "Mozilla/5.0", True),
+        ("get", "/robots.txt", "Mozilla/5.0", True),
+        ("get", "/assets/site.CSS", "Mozilla/5.0", True),
+        ("get", "/static/logo/", "Mozilla/5.0", True),
+    ],
+)
+def test_filter(method, path, user_agent, filtered):
+    bot_filter = BotFilter(static_prefixes=["/static/"])
+    request = getattr(RequestFactory(), method)(path, HTTP_USER_AGENT=user_agent)
+    assert bot_filter.is_filtered(request) is filtered
+
+
+def test_filter_empty_user_agent():
+    request = RequestFactory().get("/page/")
+    assert BotFilter(filter_empty_user_agent=True).is_filtered(request)
+
+
+def test_filter_disabled():
+    request = RequestFactory().head("/page/", HTTP_USER_AGENT="Googlebot")
+    assert not BotFilter(enabled=False).is_filtered(request)
+
+
+def test_filter_reloads_on_setting_changed(settings):
+    request = RequestFactory().get("/page/", HTTP_USER_AGENT="AcmeProbe/1.0")
+    assert not get_bot_filter().is_filtered(request)
+    settings.BANDITS_BOT_USER_AGENTS = [r"acmeprobe"]
+    assert get_bot_filter().is_filtered(request)
+    settings.BANDITS_FILTER_BOTS = False
+    assert not get_bot_filter().is_filtered(request)
+
+
+def test_static_url_setting(settings):
+    settings.STATIC_URL = "assets/"
+    request = RequestFactory().get("/assets/app/", HTTP_USER_AGENT="Mozilla/5.0")
+    assert get_bot_filter().is_filtered(request)
+
+
+@pytest.mark.django_db
+def test_middleware_skips_bots_before_session_and_orm(django_assert_num_queries):
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+    request = RequestFactory().get("/page/", HTTP_USER_AGENT="Googlebot/2.1")
+    request.session = UntouchableSession()
+    with django_assert_num_queries(0):
+        response = middleware(request)
+    assert response.status_code == 200
+    assert not UserActivity.objects.exists()
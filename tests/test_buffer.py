@@ -0,0 +1,113 @@
+import time
+
+import pytest
+from django.http import HttpResponse
+from django.test import override_settings
+
+from django_bandits.buffer import ActivityBuffer, activity_buffer
+from django_bandits.middleware import UserActivityMiddleware
+from django_bandits.models import (
+    BanditFlag,
+    FlagExposure,
+    FlagUrl,
+    UserActivity,
+    UserActivityFlag,
+)
+
+
+@pytest.fixture
+def buffer():
+    activity_buffer.flush()
+    yield activity_buffer
+    activity_buffer.flush()
+
+
+@pytest.fixture
+def flag(db):
+    flag = BanditFlag.objects.create(name="test_flag")
+    FlagUrl.objects.create(flag=flag, source_url="/source/", target_url="/target/")
+    return flag
+
+
+@pytest.mark.django_db
+def test_flush_writes_activities_and_flags(buffer, flag):
+    for i in range(3):
+        user_activity = UserActivity(session_key=f"session_{i}", url=f"page_{i}")
+        ua_flag = UserActivityFlag(user_activity=user_activity, flag=flag)
+        buffer.add(user_activity, [ua_flag])
+    assert not UserActivity.objects.exists()
+
+    assert buffer.flush() == 3
+    assert len(buffer) == 0
+    assert set(UserActivity.objects.values_list("url", flat=True)) == {
+        "/page_0/",
+        "/page_1/",
+        "/page_2/",
+    }
+    for ua_flag in UserActivityFlag.objects.select_related("user_activity"):
+        assert ua_flag.flag == flag
+        assert ua_flag.user_activity.session_key.startswith("session_")
+
+
+@pytest.mark.django_db
+@override_settings(BANDITS_ACTIVITY_BUFFER_SIZE=5)
+def test_flush_when_batch_is_full(buffer, django_assert_num_queries):
+    for i in range(4):
+        buffer.add(UserActivity(session_key="session", url="/page/"))
+    assert not UserActivity.objects.exists()
+    with django_assert_num_queries(1):
+        buffer.add(UserActivity(session_key="session", url="/page/"))
+    assert UserActivity.objects.count() == 5
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(BANDITS_ACTIVITY_FLUSH_INTERVAL=10)
+def test_flush_after_interval():
+    buffer = ActivityBuffer()
+    buffer.add(UserActivity(session_key="session", url="/page/"))
+    deadline = time.monotonic() + 5
+    while not UserActivity.objects.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert UserActivity.objects.count() == 1
+    assert len(buffer) == 0
+
+
+@pytest.mark.django_db
+@override_settings(BANDITS_ACTIVITY_WRITE_BEHIND=True)
+@pytest.mark.parametrize("active_flag", [True, False])
+def test_middleware_write_behind(buffer, flag, mocker, make_request, active_flag):
+    mocker.patch.object(
+        UserActivityMiddleware, "flag_is_active", return_value=active_flag
+    )
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+    request = make_request("/source/")
+    middleware(request)
+    assert not UserActivity.objects.exists()
+    assert len(buffer) == 1
+    # The exposure is written right away, so any worker can attribute it
+    assert FlagExposure.get_arm(request.session.session_key, flag.pk) == active_flag
+
+    request.path = "/target/"
+    middleware(request)
+    assert len(buffer) == 2
+    buffer.flush()
+
+    flag_url = FlagUrl.objects.get(flag=flag)
+    conversions = (
+        flag_url.active_flag_conversions
+        if active_flag
+        else flag_url.inactive_flag_conversions
+    )
+    assert conversions == 1
+    assert UserActivity.objects.filter(url="/target/", target_url_visit=True).exists()
+    assert UserActivityFlag.objects.filter(
+        user_activity__url="/source/", is_active=active_flag
+    ).exists()
+
+
+@pytest.mark.django_db
+@override_settings(BANDITS_ACTIVITY_WRITE_BEHIND=True)
+def test_middleware_write_behind_skips_404(buffer, make_request):
+    middleware = UserActivityMiddleware(lambda req: HttpResponse(status=404))
+    middleware(make_request("/missing/"))
+    assert len(buffer) == 0
@@ -0,0 +1,141 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from django_bandits.cache import flag_routes, normalize_url
+from django_bandits.middleware import UserActivityMiddleware
+from django_bandits.models import (
+    BANDIT_MODELS,
+    BanditFlag,
+    EpsilonGreedyModel,
+    FlagUrl,
+    UCB1Model,
+)
+
+
+@pytest.fixture
+def routed_flags(db):
+    flags = []
+    for i in range(50):
+        flag = BanditFlag.objects.create(name=f"flag_{i}")
+        FlagUrl.objects.create(
+            flag=flag, source_url=f"/source/{i}/", target_url="/target/"
+        )
+        flags.append(flag)
+    return flags
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [("/source", "/source/"), ("source/", "/source/"), ("/", "/"), (None, None)],
+)
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+@pytest.mark.django_db
+def test_lookup_by_source_and_target(routed_flags):
+    source_pairs = flag_routes.lookup("/source/3")
+    assert [flag.name for flag, _ in source_pairs] == ["flag_3"]
+
+    target_pairs = flag_routes.lookup("/target/")
+    assert len(target_pairs) == len(routed_flags)
+    assert flag_routes.lookup("/untracked/") == ()
+
+
+@pytest.mark.django_db
+def test_lookup_is_served_from_memory(routed_flags, django_assert_num_queries):
+    flag_routes.lookup("/warm-up/")
+    with django_assert_num_queries(0):
+        flag_routes.lookup("/source/1/")
+        flag_routes.lookup("/untracked/")
+
+
+@pytest.mark.django_db
+def test_invalidated_on_flag_url_change(routed_flags):
+    assert flag_routes.lookup("/moved/") == ()
+    flag_url = FlagUrl.objects.get(flag=routed_flags[0])
+    flag_url.source_url = "/moved/"
+    flag_url.save()
+    assert [flag.name for flag, _ in flag_routes.lookup("/moved/")] == ["flag_0"]
+
+    routed_flags[0].delete()
+    assert flag_routes.lookup("/moved/") == ()
+
+
+@pytest.mark.django_db
+def test_counter_saves_keep_index(routed_flags, django_assert_num_queries):
+    flag_routes.lookup("/warm-up/")
+    flag_url = FlagUrl.objects.get(flag=routed_flags[0])
+    flag_url.active_flag_views += 1
+    flag_url.save(update_fields=["active_flag_views"])
+    with django_assert_num_queries(0):
+        flag_routes.lookup("/source/0/")
+
+
+@pytest.mark.django_db
+def test_untracked_url_costs_no_flag_queries(routed_flags, django_assert_num_queries):
+    request = RequestFactory().get("/untracked/")
+    SessionMiddleware(lambda req: HttpResponse()).process_request(request)
+    request.session.save()
+    request.user = AnonymousUser()
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+    middleware(request)
+
+    # Only the UserActivity insert remains once the index is warm
+    with django_assert_num_queries(1):
+        middleware(request)
+
+
+@pytest.fixture
+def bandit_flag(db):
+    flag = BanditFlag.objects.create(name="bandit_flag")
+    FlagUrl.objects.create(
+        flag=flag,
+        source_url="/source/",
+        target_url="/target/",
+        active_flag_views=100,
+        inactive_flag_views=100,
+        active_flag_conversions=50,
+        inactive_flag_conversions=10,
+    )
+    return flag
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("bandit_model", BANDIT_MODELS)
+def test_active_bandit_lookup(bandit_flag, bandit_model, django_assert_num_queries):
+    bandit_model.objects.create(flag=bandit_flag, is_active=False)
+    assert bandit_flag.get_active_bandit() is None
+
+    bandit = bandit_model.objects.create(flag=bandit_flag, is_active=True)
+    bandit_flag.get_active_bandit()
+    # Bandit and arm statistics are both served from memory once warm
+    with django_assert_num_queries(0):
+        active_bandit = bandit_flag.get_active_bandit()
+        assert active_bandit == bandit
+        assert active_bandit.get_number_of_views().tolist() == [100, 100]
+        assert active_bandit.get_number_of_conversions().tolist() == [10, 50]
+        active_bandit.pull()
+
+    bandit.is_active = False
+    bandit.save()
+    assert bandit_flag.get_active_bandit() is None
+
+
+@pytest.mark.django_db
+def test_is_active_for_user_costs_no_queries(bandit_flag, django_assert_num_queries):
+    UCB1Model.objects.create(flag=bandit_flag, is_active=True)
+    bandit_flag.is_active_for_user(AnonymousUser())
+    with django_assert_num_queries(0):
+        assert bandit_flag.is_active_for_user(AnonymousUser())
+
+
+@pytest.mark.django_db
+def test_active_bandit_copies_are_private(bandit_flag):
+    EpsilonGreedyModel.objects.create(flag=bandit_flag, is_active=True)
+    first = bandit_flag.get_active_bandit()
+    first.epsilon = 1.0
+    assert bandit_flag.get_active_bandit().epsilon == 0.1
@@ -0,0 +1,114 @@
+import pytest
+from django.core.cache import caches
+
+from django_bandits import counters
+from django_bandits.counters import (
+    CacheCounterBackend,
+    DatabaseCounterBackend,
+    RedisCounterBackend,
+    ShardedCounterBackend,
+    get_counter_backend,
+)
+from django_bandits.models import FlagArm, FlagCounterShard
+from django_bandits.stats import arm_stats
+
+
+def make_redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCounterBackend(client=fakeredis.FakeRedis())
+
+
+@pytest.fixture(params=[CacheCounterBackend, make_redis_backend, ShardedCounterBackend])
+def backend(request, settings, monkeypatch):
+    caches["default"].clear()
+    # Flush explicitly rather than from a timer thread
+    settings.BANDITS_COUNTER_FLUSH_INTERVAL = 10**9
+    backend = request.param()
+    path = f"django_bandits.counters.{type(backend).__name__}"
+    settings.BANDITS_COUNTER_BACKEND = path
+    monkeypatch.setattr(counters, "_backend", backend)
+    monkeypatch.setattr(counters, "_backend_path", path)
+    yield backend
+    if hasattr(backend, "_timer"):
+        backend._timer.cancel()
+
+
+def test_database_backend_is_the_default(settings):
+    assert isinstance(get_counter_backend(), DatabaseCounterBackend)
+    settings.BANDITS_COUNTER_BACKEND = "django_bandits.counters.CacheCounterBackend"
+    assert isinstance(get_counter_backend(), CacheCounterBackend)
+
+
+def test_increments_are_flushed_to_flag_url(backend, flag_url):
+    for _ in range(3):
+        flag_url.record_view(True)
+    flag_url.record_view(False)
+    flag_url.record_conversion(True)
+
+    flag_url.refresh_from_db()
+    assert flag_url.active_flag_views == 0
+    views, conversions = arm_stats.get(flag_url.flag_id, max_age=0)
+    assert views.tolist() == [1, 3]
+    assert conversions.tolist() == [0, 1]
+
+    assert backend.flush() == 1
+    flag_url.refresh_from_db()
+    assert (flag_url.inactive_flag_views, flag_url.active_flag_views) == (1, 3)
+    assert flag_url.active_flag_conversions == 1
+    assert backend.get_pending(flag_url.flag_id, 2).sum() == 0
+    views, _ = arm_stats.get(flag_url.flag_id, max_age=0)
+    assert views.tolist() == [1, 3]
+    assert backend.flush() == 0
+
+
+def test_multi_armed_increments_are_flushed_to_flag_arms(backend, flag_url):
+    flag = flag_url.flag
+    flag.number_of_arms = 3
+    flag.save()
+    flag_url.flag = flag
+    flag_url.record_view(2)
+    flag_url.record_view(2)
+    flag_url.record_conversion(2)
+
+    backend.flush()
+    arm = FlagArm.objects.get(flag=flag, index=2)
+    assert (arm.views, arm.conversions) == (2, 1)
+
+
+def test_flush_keeps_later_increments(backend, flag_url):
+    flag_url.record_view(True)
+    backend.flush()
+    flag_url.record_view(True)
+    assert backend.get_pending(flag_url.flag_id, 2).tolist() == [[0, 1], [0, 0]]
+
+    backend.flush()
+    flag_url.refresh_from_db()
+    assert flag_url.active_flag_views == 2
+
+
+def test_shards_are_summed_in_one_query(settings, flag_url, django_assert_num_queries):
+    settings.BANDITS_COUNTER_BACKEND = "django_bandits.counters.ShardedCounterBackend"
+    settings.BANDITS_COUNTER_SHARDS = 4
+    for _ in range(40):
+        flag_url.record_view(True)
+
+    shards = FlagCounterShard.objects.filter(flag=flag_url.flag)
+    assert 1 < shards.count() <= 4
+    with django_assert_num_queries(1):
+        pending = get_counter_backend().get_pending(flag_url.flag_id, 2)
+    assert pending.tolist() == [[0, 40], [0, 0]]
+
+
+@pytest.mark.parametrize("backend", [CacheCounterBackend], indirect=True)
+def test_cache_flush_skips_keys_locked_by_another_flush(backend, flag_url):
+    flag_url.record_view(True)
+    lock_key = backend.get_key(flag_url.flag_id, 1, "views") + ":lock"
+    caches["default"].add(lock_key, 1)
+    assert backend.flush() == 0
+    assert backend.get_pending(flag_url.flag_id, 2).tolist() == [[0, 1], [0, 0]]
+
+    caches["default"].delete(lock_key)
+    assert backend.flush() == 1
+    flag_url.refresh_from_db()
+    assert flag_url.active_flag_views == 1
+    assert backend.get_pending(flag_url.flag_id, 2).tolist() == [[0, 0], [0, 0]]
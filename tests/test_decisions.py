@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+import waffle
+from django.db import connection
+from django.http import HttpResponse
+from django.template import Context, Engine
+from django.test.utils import CaptureQueriesContext
+
+from django_bandits.cache import clear_caches
+from django_bandits.decisions import decide_flags, flag_arm, pull_many
+from django_bandits.middleware import UserActivityMiddleware
+from django_bandits.models import (
+    BanditFlag,
+    EpsilonGreedyModel,
+    FlagArm,
+    FlagUrl,
+    ThompsonSamplingModel,
+    UCB1Model,
+)
+from django_bandits.rng import uniforms
+
+
+@pytest.fixture
+def flags(db):
+    names = []
+    for i in range(20):
+        flag = BanditFlag.objects.create(
+            name=f"flag_{i}", number_of_arms=3 if i % 2 else 2
+        )
+        FlagUrl.objects.create(
+            flag=flag,
+            source_url=f"/source_{i}/",
+            target_url=f"/target_{i}/",
+            active_flag_views=100,
+            inactive_flag_views=100,
+        )
+        if flag.is_multi_armed:
+            FlagArm.objects.create(flag=flag, index=2, views=100, conversions=90)
+        bandit_model = [EpsilonGreedyModel, UCB1Model, ThompsonSamplingModel][i % 3]
+        bandit_model.objects.create(flag=flag, is_active=True)
+        names.append(flag.name)
+    return names
+
+
+def test_decide_flags_is_sticky(flags, session_request):
+    arms = decide_flags(session_request, flags)
+    assert list(arms) == flags
+    for i, name in enumerate(flags):
+        assert 0 <= arms[name] < (3 if i % 2 else 2)
+    # Later single and batched decisions keep the assigned arms
+    assert decide_flags(session_request, flags) == arms
+    assert {name: flag_arm(session_request, name) for name in flags} == arms
+
+
+def test_decide_flags_without_bandit_or_flag(db, session_request):
+    BanditFlag.objects.create(name="everyone_flag", everyone=True)
+    EpsilonGreedyModel.objects.create(
+        flag=BanditFlag.objects.create(name="won_flag", number_of_arms=3),
+        winning_arm=2,
+        is_active=True,
+    )
+    arms = decide_flags(session_request, ["everyone_flag", "won_flag", "missing"])
+    assert arms == {"everyone_flag": 1, "won_flag": 2, "missing": 0}
+
+
+@pytest.mark.parametrize("everyone", [False, True])
+def test_decide_flags_respects_everyone(db, session_request, everyone):
+    flag = BanditFlag.objects.create(name="admin_flag", everyone=everyone)
+    FlagUrl.objects.create(
+        flag=flag,
+        source_url="/source/",
+        target_url="/target/",
+        active_flag_views=100,
+        inactive_flag_views=100,
+        # The bandit alone would show the other arm
+        active_flag_conversions=10 if everyone else 90,
+        inactive_flag_conversions=90 if everyone else 10,
+    )
+    UCB1Model.objects.create(flag=flag, is_active=True)
+    assert decide_flags(session_request, ["admin_flag"]) == {"admin_flag": everyone}
+    assert flag_arm(session_request, "admin_flag") == everyone
+
+    seen = []
+
+    def view(request):
+        seen.append(waffle.flag_is_active(request, "admin_flag"))
+        seen.append(decide_flags(request, ["admin_flag"])["admin_flag"])
+        return HttpResponse()
+
+    UserActivityMiddleware(view)(session_request)
+    assert seen == [everyone, everyone]
+
+
+def test_decide_flags_queries(flags, session_request, settings):
+    settings.BANDITS_ARM_STATS_MAX_AGE = 60
+    with CaptureQueriesContext(connection) as cold:
+        decide_flags(session_request, flags)
+    # Flags, active bandits of each model, flags with FlagUrl and FlagArm rows
+    assert len(cold) <= 7
+    with CaptureQueriesContext(connection) as warm:
+        decide_flags(session_request, flags)
+    assert len(warm) == 0
+
+
+def test_pull_many_exploits_each_bandit(flags):
+    bandits = [
+        EpsilonGreedyModel(flag_id=1, epsilon=0),
+        EpsilonGreedyModel(flag_id=2, epsilon=0),
+        UCB1Model(flag_id=3),
+    ]
+    counts = [([1000, 1000], [900, 10]), ([1000, 1000], [10, 900])]
+    counts.append(([1000, 1000, 1000], [10, 10, 900]))
+    for bandit, (views, conversions) in zip(bandits, counts):
+        bandit._arm_stats = (np.array(views), np.array(conversions))
+    assert pull_many(bandits) == [0, 1, 2]
+
+
+def test_decide_flags_matches_single_pulls(flags, make_request):
+    try:
+        uniforms.seed(0)
+        batched = decide_flags(make_request(), flags)
+        clear_caches()
+        uniforms.seed(0)
+        request = make_request()
+        single = {name: flag_arm(request, name) for name in reversed(flags)}
+    finally:
+        uniforms.seed()
+    assert batched == single
+
+
+def test_decide_flags_template_tag(flags, session_request):
+    engine = Engine(
+        libraries={"bandit_tags": "django_bandits.templatetags.bandit_tags"}
+    )
+    template = engine.from_string(
+        '{% load bandit_tags %}{% decide_flags "flag_0" "flag_1" as arms %}'
+        "{{ arms.flag_0 }},{{ arms.flag_1 }}"
+    )
+    output = template.render(Context({"request": session_request}))
+    arms = decide_flags(session_request, ["flag_0", "flag_1"])
+    assert output == f"{arms['flag_0']},{arms['flag_1']}"
@@ -0,0 +1,65 @@
+import random
+import string
+
+import pytest
+
+from django_bandits.exclusions import (
+    ExclusionMatcher,
+    compile_prefixes,
+    get_exclusion_matcher,
+)
+
+
+def test_prefixes_match_like_startswith():
+    rng = random.Random(0)
+    alphabet = "/ab.-*"
+    prefixes = [
+        "/" + "".join(rng.choices(alphabet, k=rng.randint(0, 6))) for _ in range(300)
+    ]
+    pattern = compile_prefixes(prefixes)
+    for _ in range(2000):
+        path = "/" + "".join(rng.choices(alphabet + string.ascii_lowercase, k=8))
+        expected = any(path.startswith(prefix) for prefix in prefixes)
+        assert bool(pattern.match(path)) is expected, path
+
+
+def test_shorter_prefix_wins():
+    pattern = compile_prefixes(["/admin/login", "/admin", "/api/v1"])
+    assert pattern.match("/admin/users/")
+    assert pattern.match("/api/v1/flags/")
+    assert not pattern.match("/api/v2/")
+    assert not pattern.match("/home/admin")
+
+
+@pytest.mark.parametrize(
+    "path, excluded",
+    [
+        ("/admin/", True),
+        ("/static/css/site.css", True),
+        ("/xmlrpc.php", True),
+        ("/blog/wp-login", True),
+        ("/blog/", False),
+        ("/", False),
+    ],
+)
+def test_matcher(path, excluded):
+    matcher = ExclusionMatcher(
+        prefixes=["admin", "/static/"], regex=r"/wp-", globs=["*.php"]
+    )
+    assert matcher.is_excluded(path) is excluded
+
+
+def test_decisions_are_cached():
+    matcher = ExclusionMatcher(prefixes=["/admin"], cache_size=2)
+    for path in ["/admin/", "/page/", "/admin/"]:
+        matcher.is_excluded(path)
+    info = matcher.is_excluded.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+
+def test_matcher_reloads_on_setting_changed(settings):
+    assert not get_exclusion_matcher().is_excluded("/private/")
+    settings.EXCLUDE_FROM_TRACKING = ["/private"]
+    assert get_exclusion_matcher().is_excluded("/private/")
+    settings.EXCLUDE_FROM_TRACKING_GLOBS = ["*.json"]
+    assert get_exclusion_matcher().is_excluded("/api/flags.json")
@@ -0,0 +1,64 @@
+import pytest
+import waffle
+from django.db import connection
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+
+from django_bandits import memo
+from django_bandits.decisions import decide_flags, flag_arm
+from django_bandits.middleware import UserActivityMiddleware
+from django_bandits.models import (
+    BanditFlag,
+    EpsilonGreedyModel,
+    FlagUrl,
+    UserActivityFlag,
+)
+
+
+@pytest.fixture
+def flag(db, settings):
+    # Without sticky assignments every unmemoized check pulls again
+    settings.BANDITS_STICKY_ASSIGNMENT_TTL = 0
+    settings.BANDITS_ARM_STATS_MAX_AGE = 0
+    flag = BanditFlag.objects.create(name="memo_flag", number_of_arms=3)
+    FlagUrl.objects.create(flag=flag, source_url="/source/", target_url="/target/")
+    EpsilonGreedyModel.objects.create(flag=flag, epsilon=1.0, is_active=True)
+    return flag
+
+
+def test_decisions_are_memoized_for_the_request(flag, session_request):
+    memo.attach(session_request)
+    arm = flag_arm(session_request, flag.name)
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(20):
+            assert flag_arm(session_request, flag.name) == arm
+            assert decide_flags(session_request, [flag.name]) == {flag.name: arm}
+            assert waffle.flag_is_active(session_request, flag.name) == bool(arm)
+    assert len(queries) == 0
+
+
+def test_unmemoized_requests_pull_again(flag, session_request):
+    assert len({flag_arm(session_request, flag.name) for _ in range(50)}) > 1
+
+
+def test_memoized_is_active_without_bandit(db, session_request):
+    BanditFlag.objects.create(name="percent_flag", percent=50)
+    memo.attach(session_request)
+    first = waffle.flag_is_active(session_request, "percent_flag")
+    assert all(
+        waffle.flag_is_active(session_request, "percent_flag") == first
+        for _ in range(20)
+    )
+
+
+def test_view_sees_the_recorded_arm(flag, session_request):
+    seen = []
+
+    def view(request):
+        seen.append(flag_arm(request, flag.name))
+        return HttpResponse()
+
+    for _ in range(10):
+        UserActivityMiddleware(view)(session_request)
+    arms = UserActivityFlag.objects.order_by("pk").values_list("arm", flat=True)
+    assert list(arms) == seen
@@ -6,9 +6,11 @@ from django.test import RequestFactory, override_settings
 from django.contrib.auth.models import AnonymousUser, User
 from django.contrib.sessions.middleware import SessionMiddleware
 
+from django_bandits import assignments
 from django_bandits.middleware import UserActivityMiddleware
 from django_bandits.models import (
     BanditFlag,
+    FlagExposure,
     FlagUrl,
     UserActivity,
     UserActivityFlag,
@@ -155,7 +157,7 @@ def test_flag_activity_recording(request_with_session, test_user, flag_and_url,
         print("Mocked function called with:", args, kwargs)
         return True
 
-    UserActivityMiddleware.flag_is_active = print_mock
+    mocker.patch.object(UserActivityMiddleware, "flag_is_active", print_mock)
 
     middleware = UserActivityMiddleware(lambda req: HttpResponse())
     response = middleware(request)
@@ -199,8 +201,8 @@ def test_flag_conversion_recording(
     ), "Expected 200 response code from target_url"
     flag_url.refresh_from_db()
 
-    active_source_flag = middleware_target._get_latest_flagged_source_url(
-        request.session.session_key, flag_url.source_url
+    active_source_flag = bool(
+        FlagExposure.get_arm(request.session.session_key, flag_url.flag_id)
     )
 
     assert (
@@ -292,7 +294,9 @@ def test_bandit_test_arms(
         ("/visit-page/", r"", True),
     ],
 )
-def test_url_exclusion(request_with_session, test_user, path, regex, should_create):
+def test_url_exclusion(
+    request_with_session, test_user, settings, path, regex, should_create
+):
     """Tests to see if URLs on the excluded list or in regex result in the creation of UserActivity objects or not."""
     request = request_with_session
     request.user = test_user
@@ -396,8 +400,8 @@ def test_allauth_conversion_recording(
     ), "Expected 200 response code from target_url"
     flag_url.refresh_from_db()
 
-    active_source_flag = middleware_target._get_latest_flagged_source_url(
-        request.session.session_key, flag_url.source_url
+    active_source_flag = bool(
+        FlagExposure.get_arm(request.session.session_key, flag_url.flag_id)
     )
 
     assert (
@@ -436,3 +440,207 @@ def test_user_activity_deleted_on_404(request_with_session, test_user, success,
         assert not UserActivity.objects.filter(
             url__in=[path, path[:-1]]
         ).exists(), f"Expected {path} in {urls}"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_view_and_conversion_counts(flag_and_url, mocker):
+    """Fires concurrent requests at the middleware and checks no increment is lost"""
+    from concurrent.futures import ThreadPoolExecutor
+    from django.db import connection
+
+    flag, flag_url = flag_and_url
+    mocker.patch.object(
+        UserActivityMiddleware,
+        "flag_is_active",
+        side_effect=lambda request, flag_name: request.session["arm"],
+    )
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+    n_sessions = 700
+
+    def make_request(path, arm):
+        request = RequestFactory().get(path)
+        SessionMiddleware(lambda req: HttpResponse()).process_request(request)
+        request.session["arm"] = arm
+        request.session.save()
+        request.user = AnonymousUser()
+        return request
+
+    def visit(request, path):
+        try:
+            request.path = path
+            middleware(request)
+        finally:
+            connection.close()
+
+    requests = [
+        make_request(flag_url.source_url, i % 2 == 0) for i in range(n_sessions)
+    ]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for path in [flag_url.source_url, flag_url.source_url, flag_url.target_url]:
+            list(executor.map(lambda req: visit(req, path), requests))
+
+    n_active = sum(req.session["arm"] for req in requests)
+    n_inactive = n_sessions - n_active
+    flag_url.refresh_from_db()
+    assert flag_url.active_flag_views == 2 * n_active
+    assert flag_url.inactive_flag_views == 2 * n_inactive
+    assert flag_url.active_flag_conversions == n_active
+    assert flag_url.inactive_flag_conversions == n_inactive
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("code", [404, 500, 503])
+def test_untracked_status_makes_no_writes(
+    request_with_session,
+    test_user,
+    flag_and_url,
+    mocker,
+    django_assert_num_queries,
+    code,
+):
+    """Test to ensure that nothing is written for 404s and server errors."""
+    flag, flag_url = flag_and_url
+    request = request_with_session
+    request.path = flag_url.source_url
+    request.user = test_user
+    mocker.patch.object(UserActivityMiddleware, "flag_is_active", return_value=True)
+
+    middleware = UserActivityMiddleware(lambda req: HttpResponse(status=code))
+    middleware(request)
+    with django_assert_num_queries(0):
+        response = middleware(request)
+
+    assert response.status_code == code
+    flag_url.refresh_from_db()
+    assert flag_url.active_flag_views == 0
+    assert not UserActivity.objects.exists()
+    assert not UserActivityFlag.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "code, should_create", [(200, True), (302, False), (404, False), (500, True)]
+)
+def test_tracked_status_codes_setting(
+    request_with_session, test_user, settings, code, should_create
+):
+    settings.BANDITS_TRACKED_STATUS_CODES = {200, 500}
+    request = request_with_session
+    request.user = test_user
+
+    middleware = UserActivityMiddleware(lambda req: HttpResponse(status=code))
+    middleware(request)
+
+    assert UserActivity.objects.exists() is should_create
+
+
+@pytest.mark.django_db
+def test_exposure_ledger_keeps_latest_arm(request_with_session, flag_and_url, mocker):
+    flag, flag_url = flag_and_url
+    request = request_with_session
+    request.path = flag_url.source_url
+    request.user = AnonymousUser()
+    flag_is_active = mocker.patch.object(
+        UserActivityMiddleware, "flag_is_active", return_value=False
+    )
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+
+    middleware(request)
+    flag_is_active.return_value = True
+    middleware(request)
+
+    exposure = FlagExposure.objects.get()
+    assert (exposure.session_key, exposure.flag, exposure.arm) == (
+        request.session.session_key,
+        flag,
+        1,
+    )
+
+
+def test_sampling_is_deterministic_by_session(settings):
+    settings.BANDITS_ACTIVITY_SAMPLE_RATE = 0.1
+    session_keys = [f"session_{i}" for i in range(10000)]
+    sampled = [UserActivityMiddleware.is_sampled(key) for key in session_keys]
+    assert 0.08 < sum(sampled) / len(sampled) < 0.12
+    assert sampled == [UserActivityMiddleware.is_sampled(key) for key in session_keys]
+
+
+@pytest.mark.django_db
+def test_unsampled_session_still_counts(
+    request_with_session, flag_and_url, mocker, settings
+):
+    settings.BANDITS_ACTIVITY_SAMPLE_RATE = 0
+    flag, flag_url = flag_and_url
+    request = request_with_session
+    request.user = AnonymousUser()
+    mocker.patch.object(UserActivityMiddleware, "flag_is_active", return_value=True)
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+
+    for path in [flag_url.source_url, "/other/", flag_url.target_url]:
+        request.path = path
+        middleware(request)
+
+    assert not UserActivity.objects.exists()
+    assert not UserActivityFlag.objects.exists()
+    assert FlagExposure.objects.get().arm == 1
+    flag_url.refresh_from_db()
+    assert flag_url.active_flag_views == 1
+    assert flag_url.active_flag_conversions == 1
+
+
+@pytest.mark.django_db
+def test_conversion_queries_do_not_grow_with_history(
+    request_with_session, flag_and_url, mocker
+):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    flag, flag_url = flag_and_url
+    request = request_with_session
+    request.user = AnonymousUser()
+    mocker.patch.object(UserActivityMiddleware, "flag_is_active", return_value=True)
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+
+    query_counts = []
+    # The first conversion also warms the caches
+    for n_source_visits in [1, 1, 20]:
+        request.path = flag_url.source_url
+        for _ in range(n_source_visits):
+            middleware(request)
+        request.path = flag_url.target_url
+        with CaptureQueriesContext(connection) as queries:
+            middleware(request)
+        query_counts.append(len(queries))
+
+    assert query_counts[1] == query_counts[2]
+    flag_url.refresh_from_db()
+    assert flag_url.active_flag_conversions == 3
+
+
+@pytest.mark.django_db
+def test_repeated_target_visits_convert_once(request_with_session, flag_and_url):
+    flag, flag_url = flag_and_url
+    EpsilonGreedyModel.objects.create(flag=flag, is_active=True)
+    request = request_with_session
+    request.user = AnonymousUser()
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+
+    for path in [flag_url.source_url] * 2 + [flag_url.target_url] * 4:
+        request.path = path
+        middleware(request)
+
+    flag_url.refresh_from_db()
+    views = flag_url.active_flag_views + flag_url.inactive_flag_views
+    conversions = flag_url.active_flag_conversions + flag_url.inactive_flag_conversions
+    assert (views, conversions) == (1, 1)
+
+    # A new assignment, e.g. after BANDITS_STICKY_ASSIGNMENT_TTL, may convert again
+    del request.session[assignments.SESSION_KEY]
+    for path in [flag_url.source_url, flag_url.target_url, flag_url.target_url]:
+        request.path = path
+        middleware(request)
+
+    flag_url.refresh_from_db()
+    views = flag_url.active_flag_views + flag_url.inactive_flag_views
+    conversions = flag_url.active_flag_conversions + flag_url.inactive_flag_conversions
+    assert (views, conversions) == (2, 2)
@@ -0,0 +1,138 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.utils import timezone
+
+from django_bandits.middleware import UserActivityMiddleware
+from django_bandits.models import BanditFlag, FlagUrl, UCB1Model
+
+
+@pytest.fixture
+def bandit(db):
+    flag = BanditFlag.objects.create(name="throttled_flag")
+    FlagUrl.objects.create(
+        flag=flag,
+        active_flag_views=120,
+        inactive_flag_views=120,
+        active_flag_conversions=60,
+        inactive_flag_conversions=58,
+    )
+    return UCB1Model.objects.create(flag=flag, is_active=True)
+
+
+def add_conversions(bandit, n):
+    flag_url = FlagUrl.objects.get(flag=bandit.flag)
+    for _ in range(n):
+        flag_url.record_conversion(True)
+    bandit.flag.refresh_from_db()
+
+
+@pytest.mark.django_db
+class TestScheduledSignificanceTests:
+    def test_records_tested_counts(self, bandit):
+        assert bandit.maybe_test_arms()
+        bandit.refresh_from_db()
+        assert bandit.winning_arm is None
+        assert bandit.last_tested_views == 240
+        assert bandit.last_tested_conversions == 118
+        assert bandit.last_tested_at is not None
+
+    def test_skips_unchanged_counts(self, bandit):
+        bandit.test_arms()
+        assert not bandit.should_test_arms()
+        add_conversions(bandit, 1)
+        assert bandit.should_test_arms()
+
+    def test_every_n_conversions(self, bandit, settings):
+        settings.BANDITS_TEST_ARMS_EVERY_CONVERSIONS = 5
+        bandit.test_arms()
+        add_conversions(bandit, 4)
+        assert not bandit.should_test_arms()
+        add_conversions(bandit, 1)
+        assert bandit.should_test_arms()
+
+    def test_interval(self, bandit, settings):
+        settings.BANDITS_TEST_ARMS_INTERVAL = 60
+        bandit.test_arms()
+        add_conversions(bandit, 1)
+        assert not bandit.should_test_arms()
+        bandit.last_tested_at = timezone.now() - datetime.timedelta(seconds=61)
+        assert bandit.should_test_arms()
+
+    def test_reset_counts_are_tested(self, bandit, settings):
+        settings.BANDITS_TEST_ARMS_EVERY_CONVERSIONS = 5
+        settings.BANDITS_TEST_ARMS_INTERVAL = 60
+        bandit.test_arms()
+        FlagUrl.objects.filter(flag=bandit.flag).update(
+            active_flag_views=100,
+            inactive_flag_views=100,
+            active_flag_conversions=10,
+            inactive_flag_conversions=10,
+        )
+        bandit.flag.refresh_from_db()
+        assert bandit.should_test_arms()
+        assert bandit.last_tested_conversions == 0
+
+    def test_skips_decided_and_small_bandits(self, bandit):
+        bandit.min_views = 1000
+        assert not bandit.should_test_arms()
+        bandit.min_views = 100
+        bandit.winning_arm = 1
+        assert not bandit.should_test_arms()
+
+    def test_winner_keeps_fields_changed_elsewhere(self, bandit):
+        FlagUrl.objects.filter(flag=bandit.flag).update(active_flag_conversions=100)
+        cached = bandit.flag.get_active_bandit()
+        UCB1Model.objects.filter(pk=bandit.pk).update(min_views=200)
+        cached.test_arms()
+        bandit.refresh_from_db()
+        assert bandit.winning_arm == 1
+        assert bandit.min_views == 200
+
+    def test_cached_bandit_sees_bookkeeping(self, bandit, django_assert_num_queries):
+        flag = bandit.flag
+        flag.get_active_bandit().test_arms()
+        # The cached bandit is updated in place rather than reloaded
+        with django_assert_num_queries(0):
+            assert not flag.get_active_bandit().should_test_arms()
+
+
+@pytest.mark.django_db
+class TestEvaluateBanditsCommand:
+    def test_finds_winner(self, bandit, capsys):
+        FlagUrl.objects.filter(flag=bandit.flag).update(inactive_flag_conversions=20)
+        call_command("evaluate_bandits")
+        bandit.refresh_from_db()
+        assert bandit.winning_arm == 1
+        assert "throttled_flag: arm 1 wins" in capsys.readouterr().out
+
+    def test_skips_unchanged(self, bandit, capsys):
+        call_command("evaluate_bandits")
+        call_command("evaluate_bandits")
+        assert "Evaluated 0 bandit(s)" in capsys.readouterr().out.splitlines()[-1]
+        call_command("evaluate_bandits", force=True)
+        assert "Evaluated 1 bandit(s)" in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+def test_middleware_leaves_tests_to_command(bandit, settings, rf, mocker):
+    settings.BANDITS_TEST_ARMS_IN_REQUEST = False
+    test_arms = mocker.patch.object(UCB1Model, "test_arms")
+    flag_url = FlagUrl.objects.get(flag=bandit.flag)
+    flag_url.source_url, flag_url.target_url = "/source/", "/target/"
+    flag_url.save()
+
+    request = rf.get("/source/")
+    SessionMiddleware(lambda req: HttpResponse()).process_request(request)
+    request.session.save()
+    request.user = AnonymousUser()
+    middleware = UserActivityMiddleware(lambda req: HttpResponse())
+    middleware(request)
+    request.path = "/target/"
+    middleware(request)
+
+    assert not test_arms.called
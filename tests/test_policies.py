@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from django_bandits.models import (
+    BanditFlag,
+    EpsilonDecayModel,
+    EpsilonGreedyModel,
+    FlagArm,
+    UCB1Model,
+)
+from django_bandits.policies import decision_tables, explore_exploit_table
+from django_bandits.rng import uniforms
+
+
+def make_bandit(model, views, conversions, **fields):
+    bandit = model(**fields)
+    bandit._arm_stats = (np.array(views), np.array(conversions))
+    return bandit
+
+
+def test_explore_exploit_table():
+    edges, arms = explore_exploit_table(np.array([0.1, 0.5, 0.5]), 0.3)
+    assert arms == [0, 1, 2, 1, 2]
+    assert np.allclose(np.diff([0.0] + edges), [0.1, 0.1, 0.1, 0.35, 0.35])
+    assert explore_exploit_table(np.array([0.1, 0.5]), 0) == ([1.0], [1])
+
+
+@pytest.mark.parametrize(
+    "conversions, prob_flag", [([10, 10], 0.5), ([10, 50], 0.95), ([50, 10], 0.05)]
+)
+def test_update_prob_flag(conversions, prob_flag):
+    bandit = make_bandit(EpsilonGreedyModel, [100, 100], conversions, epsilon=0.1)
+    bandit.update()
+    assert bandit.prob_flag == pytest.approx(prob_flag)
+
+
+@pytest.mark.django_db
+def test_pulls_follow_the_arm_probabilities():
+    flag = BanditFlag.objects.create(name="three_arms", number_of_arms=3)
+    for index, conversions in enumerate([10, 50, 50]):
+        FlagArm.objects.create(
+            flag=flag, index=index, views=100, conversions=conversions
+        )
+    bandit = EpsilonGreedyModel.objects.create(flag=flag, epsilon=0.3)
+    bandit.load_arm_stats()
+
+    probabilities = bandit.get_arm_probabilities()
+    assert np.allclose(probabilities, [0.1, 0.45, 0.45])
+    pulls = np.bincount([bandit.pull_arm() for _ in range(5000)], minlength=3)
+    assert np.allclose(pulls / 5000, probabilities, atol=0.03)
+
+
+def test_tables_are_recompiled_when_counts_or_fields_change(mocker, settings):
+    settings.BANDITS_DECISION_TABLE_TOLERANCE = 0.01
+    spy = mocker.spy(EpsilonDecayModel, "get_decision_table")
+    bandit = make_bandit(EpsilonDecayModel, [1000, 1000], [100, 200], pk=1)
+    for _ in range(10):
+        bandit.pull_arm()
+    assert spy.call_count == 1
+
+    bandit._arm_stats = (np.array([1005, 1000]), np.array([100, 200]))
+    bandit.pull_arm()
+    assert spy.call_count == 1
+    bandit._arm_stats = (np.array([1020, 1000]), np.array([100, 200]))
+    bandit.pull_arm()
+    assert spy.call_count == 2
+
+    spy = mocker.spy(EpsilonGreedyModel, "get_decision_table")
+    bandit = make_bandit(EpsilonGreedyModel, [1000, 1000], [100, 200], pk=1)
+    bandit.pull_arm()
+    bandit.epsilon = 0.5
+    bandit.pull_arm()
+    assert spy.call_count == 2
+
+
+def test_tables_are_recompiled_on_every_change_by_default(mocker):
+    spy = mocker.spy(UCB1Model, "get_decision_table")
+    bandit = make_bandit(UCB1Model, [1000, 1000], [100, 100], pk=1)
+    bandit.pull_arm()
+    bandit.pull_arm()
+    assert spy.call_count == 1
+    bandit._arm_stats = (np.array([1000, 1000]), np.array([100, 101]))
+    assert bandit.pull_arm() == 1
+    assert spy.call_count == 2
+
+
+def test_deterministic_pulls_dont_draw(mocker):
+    mocker.patch.object(uniforms, "random", side_effect=AssertionError)
+    bandit = make_bandit(UCB1Model, [1000, 1000], [100, 200], c=0.1)
+    assert decision_tables.get(bandit) == ([1.0], [1])
+    assert bandit.pull_arm() == 1
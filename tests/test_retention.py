@@ -0,0 +1,130 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from django_bandits.models import (
+    BanditFlag,
+    FlagActivityRollup,
+    FlagExposure,
+    FlagUrl,
+    UserActivity,
+    UserActivityFlag,
+)
+from django_bandits.retention import prune_activity
+
+
+@pytest.fixture
+def flag(db):
+    flag = BanditFlag.objects.create(name="test_flag")
+    FlagUrl.objects.create(flag=flag, source_url="/source/", target_url="/target/")
+    return flag
+
+
+def add_activity(session_key, url, days_ago, flag=None, arm=None, **kwargs):
+    user_activity = UserActivity.objects.create(
+        session_key=session_key, url=url, **kwargs
+    )
+    timestamp = timezone.now() - timedelta(days=days_ago)
+    UserActivity.objects.filter(pk=user_activity.pk).update(timestamp=timestamp)
+    if flag is not None:
+        ua_flag = UserActivityFlag.objects.create(
+            user_activity=user_activity, flag=flag, is_active=bool(arm), arm=arm
+        )
+        UserActivityFlag.objects.filter(pk=ua_flag.pk).update(timestamp=timestamp)
+        FlagExposure.record([(session_key, ua_flag)])
+        FlagExposure.objects.filter(session_key=session_key, flag=flag).update(
+            timestamp=timestamp
+        )
+    return user_activity
+
+
+def get_rollups(flag):
+    return {
+        (rollup.arm, rollup.views, rollup.conversions)
+        for rollup in FlagActivityRollup.objects.filter(flag=flag)
+    }
+
+
+@pytest.mark.django_db
+def test_prune_rolls_up_old_activity(flag):
+    for i in range(5):
+        add_activity(f"old_{i}", "/source/", 100, flag=flag, arm=i % 2)
+    add_activity("old_1", "/target/", 100, target_url_visit=True)
+    add_activity("old_2", "/other/", 100)
+    add_activity("new", "/source/", 1, flag=flag, arm=1)
+
+    deleted = prune_activity(days=30, batch_size=2)
+
+    assert deleted == {"flag_views": 5, "activities": 7, "exposures": 5}
+    assert list(UserActivity.objects.values_list("session_key", flat=True)) == ["new"]
+    assert get_rollups(flag) == {(0, 3, 0), (1, 2, 1)}
+    assert FlagActivityRollup.objects.get(flag=flag, arm=1).date == (
+        timezone.localdate() - timedelta(days=100)
+    )
+
+
+@pytest.mark.django_db
+def test_prune_adds_to_existing_rollups(flag):
+    add_activity("first", "/source/", 100, flag=flag, arm=1)
+    prune_activity(days=30)
+    add_activity("second", "/source/", 100, flag=flag, arm=1)
+    prune_activity(days=30)
+    assert get_rollups(flag) == {(1, 2, 0)}
+
+
+@pytest.mark.django_db
+def test_per_flag_retention(flag, settings):
+    kept_flag = BanditFlag.objects.create(name="kept_flag")
+    FlagUrl.objects.create(flag=kept_flag, source_url="/kept/", target_url="/goal/")
+    settings.BANDITS_FLAG_ACTIVITY_RETENTION_DAYS = {
+        "test_flag": 10,
+        "kept_flag": None,
+    }
+    add_activity("a", "/source/", 20, flag=flag, arm=1)
+    add_activity("b", "/kept/", 200, flag=kept_flag, arm=1)
+    add_activity("b", "/goal/", 200, target_url_visit=True)
+
+    prune_activity(days=90)
+
+    # The flag view is rolled up but its activity is kept for the default 90 days
+    assert not UserActivityFlag.objects.filter(flag=flag).exists()
+    assert UserActivity.objects.filter(url="/source/").exists()
+    assert UserActivity.objects.filter(url="/kept/").exists()
+    assert UserActivity.objects.filter(url="/goal/").exists()
+    assert get_rollups(kept_flag) == set()
+    # Exposures follow the longer of the flag's and the default retention
+    assert set(FlagExposure.objects.values_list("session_key", flat=True)) == {
+        "a",
+        "b",
+    }
+
+
+@pytest.mark.django_db
+def test_command_reports_progress(flag, capsys):
+    for i in range(3):
+        add_activity(f"old_{i}", "/source/", 100, flag=flag, arm=1)
+    call_command("prune_bandit_activity", days=30, batch_size=2, verbosity=2)
+    output = capsys.readouterr().out
+    assert "test_flag: Deleted 2 flag view(s)" in output
+    assert "Deleted 3 flag view(s), 3 activity row(s) and 3 exposure(s)" in output
+
+
+@pytest.mark.django_db
+def test_prune_deletes_old_exposures(flag, settings):
+    settings.BANDITS_FLAG_ACTIVITY_RETENTION_DAYS = {"test_flag": 120}
+    add_activity("old", "/source/", 150, flag=flag, arm=1)
+    add_activity("old", "/target/", 150, target_url_visit=True)
+    add_activity("recent", "/source/", 100, flag=flag, arm=0)
+    add_activity("new", "/source/", 1, flag=flag, arm=1)
+
+    deleted = prune_activity(days=30, batch_size=1)
+
+    assert deleted["exposures"] == 1
+    # The conversion was rolled up before its exposure was deleted
+    assert (1, 1, 1) in get_rollups(flag)
+    assert set(FlagExposure.objects.values_list("session_key", flat=True)) == {
+        "recent",
+        "new",
+    }
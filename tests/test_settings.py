@@ -1,4 +1,6 @@
 # Settings to run tests for django-bandits
+import os
+import tempfile
 
 DEBUG = True
 
@@ -31,6 +33,19 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": ":memory:",
+        # A file-backed test database lets concurrent tests use several
+        # connections, which in-memory SQLite rejects with "table is locked".
+        # Each run and xdist worker gets a file of its own, so runs sharing a
+        # temporary directory don't collide.
+        "TEST": {
+            "NAME": os.path.join(
+                tempfile.gettempdir(),
+                "django_bandits_test_{}{}.sqlite3".format(
+                    os.getpid(), os.environ.get("PYTEST_XDIST_WORKER", "")
+                ),
+            )
+        },
+        "OPTIONS": {"timeout": 30},
     }
 }
 
@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+import pytest
+from scipy.stats import chi2_contingency, fisher_exact, ttest_ind
+
+from django_bandits.models import BanditFlag, FlagUrl, EpsilonGreedyModel
+from django_bandits.significance import SIGNIFICANCE_TEST_FUNCTIONS, get_p_value
+
+SAMPLES = [
+    ([120, 120], [50, 100]),
+    ([30, 45], [3, 9]),
+    ([200, 150], [20, 20]),
+    ([10, 12], [1, 11]),
+    ([50, 50], [25, 25]),
+]
+
+
+def outcomes(views, conversions):
+    return [
+        [1] * conversions[arm] + [0] * (views[arm] - conversions[arm])
+        for arm in range(2)
+    ]
+
+
+@pytest.mark.parametrize("views, conversions", SAMPLES)
+def test_student_t_matches_ttest_ind(views, conversions):
+    expected = ttest_ind(*outcomes(views, conversions)).pvalue
+    assert get_p_value("t", views, conversions) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("views, conversions", SAMPLES)
+def test_welch_t_matches_ttest_ind(views, conversions):
+    expected = ttest_ind(*outcomes(views, conversions), equal_var=False).pvalue
+    assert get_p_value("welch", views, conversions) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("views, conversions", SAMPLES)
+def test_chi_squared_matches_scipy(views, conversions):
+    table = [conversions, np.subtract(views, conversions)]
+    expected = chi2_contingency(table, correction=False)[1]
+    assert get_p_value("chi2", views, conversions) == pytest.approx(expected)
+    # The uncorrected 2x2 chi-squared test is the square of the z-test
+    assert get_p_value("z", views, conversions) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("views, conversions", SAMPLES)
+def test_fisher_matches_scipy(views, conversions):
+    expected = fisher_exact([conversions, np.subtract(views, conversions)])[1]
+    assert get_p_value("fisher", views, conversions) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("test_name", ["t", "welch", "z", "chi2"])
+def test_no_variance_is_not_significant(test_name):
+    p_value = get_p_value(test_name, [100, 100], [0, 0])
+    assert not p_value < 0.05
+
+
+@pytest.mark.parametrize("test_name", ["t", "welch", "z", "chi2"])
+def test_large_counts_are_constant_time(test_name):
+    start = time.perf_counter()
+    p_value = get_p_value(test_name, [10_000_000, 10_000_000], [500_000, 510_000])
+    assert time.perf_counter() - start < 0.1
+    assert p_value < 0.05
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("test_name", SIGNIFICANCE_TEST_FUNCTIONS)
+@pytest.mark.parametrize(
+    "active_flag_conversions, inactive_flag_conversions, winning_arm",
+    [(100, 50, 1), (50, 100, 0), (60, 60, None)],
+)
+def test_bandit_significance_test(
+    test_name, active_flag_conversions, inactive_flag_conversions, winning_arm
+):
+    flag = BanditFlag.objects.create(name="significance_flag")
+    FlagUrl.objects.create(
+        flag=flag,
+        active_flag_views=120,
+        inactive_flag_views=120,
+        active_flag_conversions=active_flag_conversions,
+        inactive_flag_conversions=inactive_flag_conversions,
+    )
+    bandit = EpsilonGreedyModel.objects.create(flag=flag, significance_test=test_name)
+    bandit.test_arms()
+    bandit.refresh_from_db()
+    assert bandit.winning_arm == winning_arm
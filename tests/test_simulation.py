@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+from django.core.management import call_command
+
+from django_bandits.models import (
+    BanditFlag,
+    EpsilonDecayModel,
+    EpsilonGreedyModel,
+    FlagUrl,
+    ThompsonSamplingModel,
+    UCB1Model,
+    UserActivity,
+    UserActivityFlag,
+)
+from django_bandits.rng import uniforms
+from django_bandits.significance import SIGNIFICANCE_TEST_FUNCTIONS, get_p_value
+from django_bandits.simulation import load_replay_log, replay, simulate, sweep
+
+
+@pytest.fixture
+def counts():
+    rng = np.random.default_rng(0)
+    views = rng.integers(1, 500, size=(50, 3))
+    conversions = rng.binomial(views, 0.1)
+    return views, conversions
+
+
+class ExploitingRng:
+    """Random numbers of 1, so epsilon strategies always exploit"""
+
+    def random(self, size):
+        return np.ones(size)
+
+    def integers(self, low, high, size):
+        return np.zeros(size, dtype=np.int64)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [EpsilonGreedyModel(epsilon=0), EpsilonDecayModel(), UCB1Model(c=1.0)],
+)
+def test_pull_arms_matches_pull_arm(model, counts, mocker):
+    views, conversions = counts
+    views = views * 100
+    # Always exploit, which makes every model deterministic without ties
+    rewards = conversions / views
+    untied = (rewards == rewards.max(axis=1, keepdims=True)).sum(axis=1) == 1
+    views, conversions = views[untied], conversions[untied]
+    mocker.patch.object(uniforms, "random", return_value=1.0)
+    arms = model.pull_arms(views, conversions, ExploitingRng())
+    for row_views, row_conversions, arm in zip(views, conversions, arms):
+        model._arm_stats = (row_views, row_conversions)
+        assert model.pull_arm() == arm
+
+
+def test_thompson_pull_arms_follows_posterior():
+    views = np.array([[1000, 1000]] * 2000)
+    conversions = np.array([[100, 130]] * 2000)
+    arms = ThompsonSamplingModel().pull_arms(
+        views, conversions, np.random.default_rng(0)
+    )
+    assert 0.95 < arms.mean() < 1
+
+
+@pytest.mark.parametrize("test_name", SIGNIFICANCE_TEST_FUNCTIONS)
+def test_p_values_broadcast_over_rows(test_name, counts):
+    views, conversions = counts[0][:, :2], counts[1][:, :2]
+    p_values = get_p_value(test_name, views, conversions)
+    assert p_values.shape == (50,)
+    for row_views, row_conversions, p_value in zip(views, conversions, p_values):
+        assert get_p_value(test_name, row_views, row_conversions) == pytest.approx(
+            p_value, nan_ok=True
+        )
+
+
+def test_simulate_finds_the_better_arm():
+    result = simulate(UCB1Model(c=1.0), [0.02, 0.1], 2000, n_runs=200, seed=0)
+    assert result["significant_rate"] > 0.9
+    assert result["false_positive_rate"] < 0.05
+    assert result["steps_to_significance"] < 2000
+    assert simulate(UCB1Model(c=1.0), [0.02, 0.1], 2000, n_runs=200, seed=0) == result
+
+
+def test_equal_arms_winners_are_false_positives():
+    result = simulate(EpsilonGreedyModel(), [0.1, 0.1], 2000, n_runs=200, seed=0)
+    assert result["regret"] == 0
+    assert result["false_positive_rate"] == result["significant_rate"]
+
+
+def test_sweep():
+    results = sweep(
+        EpsilonGreedyModel,
+        {"epsilon": [0.1, 0.5], "min_views": [100]},
+        rates=[0.05, 0.1],
+        n_steps=500,
+        n_runs=50,
+        seed=0,
+    )
+    assert [(r["epsilon"], r["min_views"]) for r in results] == [(0.1, 100), (0.5, 100)]
+    # Exploring more costs more regret
+    assert results[1]["regret"] > results[0]["regret"]
+
+
+@pytest.fixture
+def recorded_flag(db):
+    flag = BanditFlag.objects.create(name="recorded_flag")
+    FlagUrl.objects.create(flag=flag, source_url="/source/", target_url="/target/")
+    rng = np.random.default_rng(0)
+    for i in range(400):
+        arm = int(rng.integers(0, 2))
+        user_activity = UserActivity.objects.create(
+            session_key=f"session_{i}", url="/source/"
+        )
+        UserActivityFlag.objects.create(
+            user_activity=user_activity, flag=flag, is_active=bool(arm)
+        )
+        if rng.random() < (0.5 if arm else 0.1):
+            UserActivity.objects.create(
+                session_key=f"session_{i}", url="/target/", target_url_visit=True
+            )
+    return flag
+
+
+@pytest.mark.django_db
+def test_replay_recorded_activity(recorded_flag):
+    arms, rewards = load_replay_log(recorded_flag)
+    assert len(arms) == 400
+    assert rewards[arms == 1].mean() > rewards[arms == 0].mean()
+
+    result = replay(EpsilonGreedyModel(min_views=50), arms, rewards, n_runs=100, seed=0)
+    assert 0 < result["events_per_run"] < 400
+    assert result["significant_rate"] > 0.5
+
+
+@pytest.mark.django_db
+def test_command(recorded_flag, capsys):
+    call_command(
+        "simulate_bandits",
+        model="UCB1Model",
+        param=["c=0.5,2"],
+        flag="recorded_flag",
+        runs=20,
+        seed=0,
+    )
+    output = capsys.readouterr().out
+    assert "Replaying 400 exposures of recorded_flag" in output
+    assert len(output.splitlines()) == 4
@@ -0,0 +1,85 @@
+import pytest
+from django.core.cache import caches
+from django.test import override_settings
+
+from django_bandits.models import FlagUrl, UCB1Model
+from django_bandits.stats import ArmStatsStore, arm_stats
+
+
+@pytest.fixture
+def flag_url(flag_url):
+    FlagUrl.objects.filter(pk=flag_url.pk).update(
+        active_flag_views=20,
+        inactive_flag_views=10,
+        active_flag_conversions=4,
+        inactive_flag_conversions=2,
+    )
+    flag_url.refresh_from_db()
+    return flag_url
+
+
+@pytest.mark.django_db
+def test_loads_counts_once(flag_url, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        views, conversions = arm_stats.get(flag_url.flag_id, max_age=60)
+        arm_stats.get(flag_url.flag_id, max_age=60)
+    assert views.tolist() == [10, 20]
+    assert conversions.tolist() == [2, 4]
+
+
+@pytest.mark.django_db
+def test_local_increments(flag_url, django_assert_num_queries):
+    arm_stats.get(flag_url.flag_id, max_age=60)
+    flag_url.record_view(True)
+    flag_url.record_view(False)
+    flag_url.record_conversion(True)
+    with django_assert_num_queries(0):
+        views, conversions = arm_stats.get(flag_url.flag_id, max_age=60)
+    assert views.tolist() == [11, 21]
+    assert conversions.tolist() == [2, 5]
+
+
+@pytest.mark.django_db
+def test_reconciles_after_max_age(flag_url):
+    arm_stats.get(flag_url.flag_id, max_age=60)
+    # Simulates another process recording a view
+    FlagUrl.objects.filter(pk=flag_url.pk).update(active_flag_views=30)
+    assert arm_stats.get(flag_url.flag_id, max_age=60)[0].tolist() == [10, 20]
+    assert arm_stats.get(flag_url.flag_id, max_age=0)[0].tolist() == [10, 30]
+
+
+@pytest.mark.django_db
+def test_invalidated_on_save(flag_url):
+    arm_stats.get(flag_url.flag_id, max_age=60)
+    flag_url.active_flag_views = 0
+    flag_url.save()
+    assert arm_stats.get(flag_url.flag_id, max_age=60)[0].tolist() == [10, 0]
+
+
+@pytest.mark.django_db
+def test_returned_arrays_are_copies(flag_url):
+    views, _ = arm_stats.get(flag_url.flag_id, max_age=60)
+    views[0] = 1000
+    assert arm_stats.get(flag_url.flag_id, max_age=60)[0].tolist() == [10, 20]
+
+
+@pytest.mark.django_db
+def test_flag_max_age(flag_url):
+    flag = flag_url.flag
+    flag.arm_stats_max_age = 0
+    flag.save()
+    UCB1Model.objects.create(flag=flag, is_active=True)
+    assert flag.get_active_bandit().get_number_of_views().tolist() == [10, 20]
+    FlagUrl.objects.filter(pk=flag_url.pk).update(active_flag_views=30)
+    assert flag.get_active_bandit().get_number_of_views().tolist() == [10, 30]
+
+
+@pytest.mark.django_db
+@override_settings(BANDITS_ARM_STATS_CACHE="default")
+def test_shared_cache(flag_url, django_assert_num_queries):
+    caches["default"].clear()
+    ArmStatsStore().get(flag_url.flag_id, max_age=60)
+    # A second process finds the counts in the shared cache
+    with django_assert_num_queries(0):
+        views, _ = ArmStatsStore().get(flag_url.flag_id, max_age=60)
+    assert views.tolist() == [10, 20]